@@ -300,10 +300,20 @@ class Splitters:
         return split_texts
 
     def semantic_chunker(self, model: SemanticChunkerModel) -> List[str]:
+        # Imported here so the core app does not load knowledge_base at import time.
+        from ...knowledge_base.embeddings import (
+            CachedEmbeddings,
+            get_embeddings_service,
+        )
+
         if model.embedding_model is None:
-            model.embedding_model = OpenAIEmbeddings()
+            embedding_model = get_embeddings_service()
+        else:
+            embedding_model = CachedEmbeddings(
+                model.embedding_model, model=model.embedding_model.model
+            )
         text_splitter = SemanticChunker(
-            model.embedding_model,
+            embedding_model,
             breakpoint_threshold_type=model.breakpoint_threshold_type,
         )
         split_texts = text_splitter.split_text(model.text)
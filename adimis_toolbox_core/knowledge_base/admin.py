@@ -1,5 +1,16 @@
 from django.contrib import admin
-from .models import WorkspaceCollection, WorkspaceCollectionDocument
+from .models import (
+    ReembeddingJob,
+    WorkspaceCollection,
+    WorkspaceCollectionDocument,
+    WorkspaceCollectionDocumentChunk,
+    WorkspaceCollectionStats,
+    EmbeddingCacheEntry,
+)
 
 admin.site.register(WorkspaceCollection)
 admin.site.register(WorkspaceCollectionDocument)
+admin.site.register(WorkspaceCollectionDocumentChunk)
+admin.site.register(EmbeddingCacheEntry)
+admin.site.register(ReembeddingJob)
+admin.site.register(WorkspaceCollectionStats)
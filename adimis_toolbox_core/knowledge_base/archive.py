@@ -0,0 +1,214 @@
+import io
+import json
+from typing import BinaryIO, Iterator, List, Optional, TypedDict
+import numpy as np
+import pyarrow as pa
+from .models import WorkspaceCollection
+
+# Collection archives are Arrow IPC streams: a schema carrying the collection
+# settings, then one record batch per ``batch_size`` documents. Vectors are a
+# fixed-size list of float32 (pgvector's own precision), so they round-trip
+# bit for bit without being embedded again.
+ARCHIVE_VERSION = "1"
+ARCHIVE_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+ARCHIVE_COMPRESSION = "zstd"
+
+# Custom metadata of the empty batch that closes a complete archive; an export
+# that failed midway lacks it, so a truncated stream is never imported.
+ARCHIVE_END_KEY = b"documents"
+
+# Exported document columns, in archive order; ``embeddings`` comes last.
+ARCHIVE_FIELDS = (
+    "id",
+    "title",
+    "content",
+    "content_hash",
+    "metadata",
+    "uri",
+    "embedding_model",
+    "created_at",
+    "updated_at",
+)
+
+# Collection settings carried in the schema metadata.
+COLLECTION_FIELDS = (
+    "name",
+    "description",
+    "embedding_model",
+    "vector_precision",
+    "rerank_factor",
+    "chunk_method",
+    "chunk_options",
+)
+
+
+class ArchiveImportReport(TypedDict):
+    collection: str
+    documents: int
+    embedded: int
+    pending: int
+    batches: int
+
+
+def archive_schema(collection: WorkspaceCollection, dimensions: int) -> pa.Schema:
+    timestamp = pa.timestamp("us", tz="UTC")
+    metadata = {
+        "archive_version": ARCHIVE_VERSION,
+        "dimensions": str(dimensions),
+        "collection": json.dumps(
+            {field: getattr(collection, field) for field in COLLECTION_FIELDS}
+        ),
+    }
+    return pa.schema(
+        [
+            pa.field("id", pa.string(), nullable=False),
+            pa.field("title", pa.string(), nullable=False),
+            pa.field("content", pa.large_string(), nullable=False),
+            pa.field("content_hash", pa.string()),
+            # JSON text: metadata has no fixed shape to map onto Arrow types.
+            pa.field("metadata", pa.large_string()),
+            pa.field("uri", pa.string()),
+            pa.field("embedding_model", pa.string()),
+            pa.field("created_at", timestamp),
+            pa.field("updated_at", timestamp),
+            pa.field("embeddings", pa.list_(pa.float32(), dimensions)),
+        ],
+        metadata=metadata,
+    )
+
+
+def record_batch(schema: pa.Schema, rows: List[tuple]) -> pa.RecordBatch:
+    """One record batch from ``ARCHIVE_FIELDS + ("embeddings",)`` rows. The
+    vectors are packed into a single float32 buffer; rows without one (or
+    with one of another dimension) are null."""
+    dimensions = schema.field("embeddings").type.list_size
+    columns = list(zip(*rows))
+    vectors = np.zeros((len(rows), dimensions), dtype=np.float32)
+    missing = np.ones(len(rows), dtype=bool)
+    for index, vector in enumerate(columns[-1]):
+        if vector is not None and len(vector) == dimensions:
+            vectors[index] = vector
+            missing[index] = False
+
+    arrays = []
+    for field, values in zip(ARCHIVE_FIELDS, columns):
+        if field == "id":
+            values = [str(value) for value in values]
+        elif field == "metadata":
+            values = [None if value is None else json.dumps(value) for value in values]
+        arrays.append(pa.array(values, type=schema.field(field).type))
+    # A boolean array's bit-packed data buffer doubles as the validity bitmap.
+    validity = pa.array(~missing).buffers()[1] if missing.any() else None
+    arrays.append(
+        pa.Array.from_buffers(
+            schema.field("embeddings").type,
+            len(rows),
+            [validity],
+            children=[pa.array(vectors.reshape(-1))],
+        )
+    )
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file collecting what the IPC writer emits, so each batch can
+    be handed on as soon as it is encoded."""
+
+    def __init__(self) -> None:
+        self.chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def check_compression(compression: Optional[str]) -> None:
+    """Raises ``ValueError`` for a codec this pyarrow build cannot write."""
+    if compression is not None and not pa.Codec.is_available(compression):
+        raise ValueError(f"Unsupported archive compression: {compression}")
+
+
+def write_archive(
+    schema: pa.Schema,
+    batches: Iterator[List[tuple]],
+    compression: Optional[str] = ARCHIVE_COMPRESSION,
+) -> Iterator[bytes]:
+    """Encodes row batches as an Arrow IPC stream, yielding bytes per batch."""
+    sink = _ChunkSink()
+    options = pa.ipc.IpcWriteOptions(compression=compression)
+    documents = 0
+    with pa.ipc.new_stream(sink, schema, options=options) as writer:
+        yield sink.drain()
+        for rows in batches:
+            writer.write_batch(record_batch(schema, rows))
+            documents += len(rows)
+            yield sink.drain()
+        writer.write_batch(
+            pa.RecordBatch.from_pylist([], schema=schema),
+            custom_metadata={ARCHIVE_END_KEY: str(documents).encode()},
+        )
+    yield sink.drain()
+
+
+def open_archive(stream: BinaryIO) -> tuple[dict, int, pa.ipc.RecordBatchStreamReader]:
+    """Returns ``(collection settings, dimensions, reader)`` for an archive
+    stream. Iterate the reader with ``read_batches``: batches are read (and
+    decompressed) one at a time."""
+    reader = pa.ipc.open_stream(stream)
+    metadata = {
+        key.decode(): value.decode()
+        for key, value in (reader.schema.metadata or {}).items()
+    }
+    if metadata.get("archive_version") != ARCHIVE_VERSION:
+        raise ValueError(
+            f"Unsupported archive version: {metadata.get('archive_version')}"
+        )
+    return json.loads(metadata["collection"]), int(metadata["dimensions"]), reader
+
+
+def read_batches(reader: pa.ipc.RecordBatchStreamReader) -> Iterator[pa.RecordBatch]:
+    """The archive's record batches; raises ``ValueError`` once the stream
+    ends without the closing batch, or with a document count that differs."""
+    documents = 0
+    while True:
+        try:
+            batch, metadata = reader.read_next_batch_with_custom_metadata()
+        except StopIteration:
+            raise ValueError(
+                f"Archive is truncated after {documents} documents"
+            ) from None
+        if metadata is not None and ARCHIVE_END_KEY in metadata:
+            expected = int(metadata[ARCHIVE_END_KEY])
+            if expected != documents:
+                raise ValueError(
+                    f"Archive holds {documents} documents, expected {expected}"
+                )
+            return
+        documents += batch.num_rows
+        yield batch
+
+
+def batch_rows(batch: pa.RecordBatch) -> Iterator[dict]:
+    """Documents of an archive batch as dicts; ``embeddings`` are float32
+    numpy arrays, or ``None``."""
+    columns = {field: batch.column(field).to_pylist() for field in ARCHIVE_FIELDS}
+    embeddings = batch.column("embeddings")
+    dimensions = embeddings.type.list_size
+    # The child values, null slots included, as one (rows, dimensions) array.
+    vectors = embeddings.values.to_numpy(zero_copy_only=False).reshape(
+        -1, dimensions
+    )[embeddings.offset : embeddings.offset + len(embeddings)]
+    valid = embeddings.is_valid().to_numpy(zero_copy_only=False)
+    for index in range(batch.num_rows):
+        row = {field: columns[field][index] for field in ARCHIVE_FIELDS}
+        if row["metadata"] is not None:
+            row["metadata"] = json.loads(row["metadata"])
+        row["embeddings"] = vectors[index] if valid[index] else None
+        yield row
@@ -0,0 +1,22 @@
+from .pool import close_pool
+
+
+class VectorPoolLifespanMiddleware:
+    """Answers ASGI lifespan events (Django's handler rejects them) and closes
+    the knowledge base asyncpg pool on shutdown."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "lifespan":
+            return await self.app(scope, receive, send)
+
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await close_pool()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
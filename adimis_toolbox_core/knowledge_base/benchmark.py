@@ -0,0 +1,148 @@
+import time
+import random
+import asyncio
+import itertools
+from typing import Iterator, List, Optional, TypedDict
+from .services import DocumentService
+
+
+class IngestBenchmark(TypedDict):
+    documents: int
+    seconds: float
+    documents_per_second: float
+
+
+class SearchBenchmark(TypedDict):
+    queries: int
+    concurrency: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    queries_per_second: float
+
+
+def _vocabulary(size: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    syllables = [c + v for c in "bdfgklmnprstvz" for v in "aeiou"]
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(syllables, k=rng.randint(2, 4))))
+    return sorted(words)
+
+
+class SyntheticCorpus:
+    """Reproducible documents and queries drawn from one Zipf-like vocabulary,
+    so queries share words with documents the way real ones do."""
+
+    def __init__(self, seed: int = 0, vocabulary_size: int = 20_000) -> None:
+        self.seed = seed
+        self.vocabulary = _vocabulary(vocabulary_size, seed)
+        # Cumulative once: ``choices`` would re-accumulate plain weights over
+        # the whole vocabulary for every document. Draws are the same.
+        self.cum_weights = list(
+            itertools.accumulate(1 / rank for rank in range(1, vocabulary_size + 1))
+        )
+
+    def _text(self, rng: random.Random, words: int) -> str:
+        return " ".join(rng.choices(self.vocabulary, cum_weights=self.cum_weights, k=words))
+
+    def documents(self, count: int, words: int = 120) -> Iterator[dict]:
+        rng = random.Random(self.seed)
+        for index in range(count):
+            yield {
+                "title": f"doc-{index}",
+                "content": self._text(rng, words),
+                "metadata": {"index": index, "group": index % 10},
+            }
+
+    def queries(self, count: int) -> List[str]:
+        rng = random.Random(self.seed + 1)
+        return [self._text(rng, rng.randint(3, 8)) for _ in range(count)]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def _search_report(
+    latencies: List[float], concurrency: int, elapsed: float
+) -> SearchBenchmark:
+    latencies = sorted(latencies)
+    return {
+        "queries": len(latencies),
+        "concurrency": concurrency,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "queries_per_second": len(latencies) / elapsed if elapsed else 0.0,
+    }
+
+
+def benchmark_ingest(
+    service: DocumentService,
+    documents: Iterator[dict],
+    chunk_size: int = 10_000,
+    batch_size: Optional[int] = None,
+    user=None,
+) -> IngestBenchmark:
+    """Ingests ``documents`` through ``bulk_ingest_documents``, ``chunk_size``
+    at a time so a million synthetic documents never sit in memory at once."""
+    started = time.perf_counter()
+    total = 0
+    chunk: List[dict] = []
+    for document in documents:
+        chunk.append(document)
+        if len(chunk) == chunk_size:
+            service.bulk_ingest_documents(chunk, user, batch_size=batch_size)
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        service.bulk_ingest_documents(chunk, user, batch_size=batch_size)
+        total += len(chunk)
+    elapsed = time.perf_counter() - started
+    return {
+        "documents": total,
+        "seconds": elapsed,
+        "documents_per_second": total / elapsed if elapsed else 0.0,
+    }
+
+
+def benchmark_search(
+    service: DocumentService, method: str, queries: List[str], **options
+) -> SearchBenchmark:
+    """Latency of ``service.<method>(query, **options)`` per query, run one
+    after another; includes the query embedding."""
+    search = getattr(service, method)
+    latencies = []
+    started = time.perf_counter()
+    for query in queries:
+        query_started = time.perf_counter()
+        search(query, **options)
+        latencies.append(time.perf_counter() - query_started)
+    return _search_report(latencies, 1, time.perf_counter() - started)
+
+
+async def abenchmark_search(
+    service: DocumentService,
+    method: str,
+    queries: List[str],
+    concurrency: int = 1,
+    **options,
+) -> SearchBenchmark:
+    """Async counterpart of ``benchmark_search`` with ``concurrency`` queries
+    in flight on the shared pool."""
+    search = getattr(service, f"a{method}")
+    pending = iter(queries)
+    latencies = []
+
+    async def worker():
+        for query in pending:
+            query_started = time.perf_counter()
+            await search(query, **options)
+            latencies.append(time.perf_counter() - query_started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return _search_report(latencies, concurrency, time.perf_counter() - started)
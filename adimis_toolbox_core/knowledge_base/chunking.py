@@ -0,0 +1,158 @@
+from typing import Any, Dict, Iterable, List, Optional
+from django.db import transaction
+from langchain_core.embeddings import Embeddings
+from ..core.loaders_splitters import splitters
+from .conf import kb_setting
+from .embeddings import content_hash, iter_embedding_batches
+from .models import (
+    WorkspaceCollection,
+    WorkspaceCollectionDocument,
+    WorkspaceCollectionDocumentChunk,
+)
+
+# split_document methods, their props model and the field holding the text.
+SPLITTERS = {
+    "html_header_splitter": (splitters.HTMLHeaderSplitterModel, "html_string"),
+    "html_section_splitter": (splitters.HTMLSectionSplitterModel, "html_string"),
+    "character_splitter": (splitters.CharacterSplitterModel, "text"),
+    "code_splitter": (splitters.CodeSplitterModel, "code_string"),
+    "markdown_splitter": (splitters.MarkdownSplitterModel, "markdown_document"),
+    "json_splitter": (splitters.JSONSplitterModel, "json_data"),
+    "recursive_character_splitter": (
+        splitters.RecursiveCharacterSplitterModel,
+        "text",
+    ),
+    "semantic_chunker": (splitters.SemanticChunkerModel, "text"),
+    "split_by_tokens": (splitters.SplitByTokensModel, "text"),
+}
+
+
+def chunking_for(collection: WorkspaceCollection) -> Optional[tuple[str, dict]]:
+    """The ``(method, options)`` a collection's documents are chunked with,
+    or ``None`` when chunking is off."""
+    if collection.chunk_method:
+        return collection.chunk_method, collection.chunk_options or {}
+    method = kb_setting("VECTOR_DB_CHUNK_METHOD")
+    if not method:
+        return None
+    return method, kb_setting("VECTOR_DB_CHUNK_OPTIONS") or {}
+
+
+def split_content(content: str, method: str, options: dict) -> List[str]:
+    if method not in SPLITTERS:
+        raise ValueError(f"Method {method} is not supported.")
+    model_class, text_field = SPLITTERS[method]
+    chunks = splitters.split_document(
+        method, model_class(**{**options, text_field: content})
+    )
+    # Header splitters return langchain Documents rather than strings.
+    texts = [getattr(chunk, "page_content", chunk) for chunk in chunks]
+    return [text for text in texts if text.strip()] or [content]
+
+
+def build_chunks(
+    collection: WorkspaceCollection,
+    documents: Iterable[WorkspaceCollectionDocument],
+    embeddings: Embeddings,
+    batch_size: Optional[int] = None,
+    max_batch_tokens: Optional[int] = None,
+) -> tuple[List[WorkspaceCollectionDocumentChunk], Dict[Any, Exception]]:
+    """Splits ``documents`` (whose content changed) and embeds the chunks in
+    batches, without touching the database. Call it before the transaction
+    that writes the documents, then ``write_chunks`` inside it.
+
+    A chunk holding a document's whole content reuses the document vector
+    when that vector belongs to the current content and model. Returns the
+    chunks of the documents that could be chunked and, per document id, the
+    error of those that could not; a failing embedding batch is retried one
+    document at a time so one bad document does not fail the others.
+    """
+    chunking = chunking_for(collection)
+    if chunking is None:
+        return [], {}
+    method, options = chunking
+
+    by_document: Dict[Any, List[WorkspaceCollectionDocumentChunk]] = {}
+    failures: Dict[Any, Exception] = {}
+    for document in documents:
+        try:
+            texts = split_content(document.content, method, options)
+        except Exception as e:
+            failures[document.id] = e
+            continue
+        vector = (
+            document.embeddings
+            if "embeddings" not in document.get_deferred_fields()
+            and document.embedding_model == collection.embedding_model
+            and document.content_hash == content_hash(document.content)
+            else None
+        )
+        chunks = by_document[document.id] = []
+        for position, text in enumerate(texts):
+            chunk = WorkspaceCollectionDocumentChunk(
+                document=document,
+                collection=collection,
+                position=position,
+                content=text,
+                embedding_model=collection.embedding_model,
+            )
+            if text == document.content and vector is not None:
+                chunk.embeddings = vector
+            chunks.append(chunk)
+
+    batches = iter_embedding_batches(
+        [
+            chunk
+            for chunks in by_document.values()
+            for chunk in chunks
+            if chunk.embeddings is None
+        ],
+        text=lambda chunk: chunk.content,
+        batch_size=batch_size,
+        max_batch_tokens=max_batch_tokens,
+        model=getattr(embeddings, "model", None),
+    )
+    for batch, _ in batches:
+        try:
+            vectors = embeddings.embed_documents([chunk.content for chunk in batch])
+        except Exception:
+            vectors = None
+        if vectors is not None:
+            for chunk, vector in zip(batch, vectors):
+                chunk.embeddings = vector
+            continue
+        for document_id in {chunk.document_id for chunk in batch}:
+            if document_id in failures:
+                continue
+            pending = [chunk for chunk in batch if chunk.document_id == document_id]
+            try:
+                vectors = embeddings.embed_documents(
+                    [chunk.content for chunk in pending]
+                )
+            except Exception as e:
+                failures[document_id] = e
+                continue
+            for chunk, vector in zip(pending, vectors):
+                chunk.embeddings = vector
+
+    chunks = [
+        chunk
+        for document_id, document_chunks in by_document.items()
+        if document_id not in failures
+        for chunk in document_chunks
+    ]
+    return chunks, failures
+
+
+def write_chunks(
+    documents: Iterable[WorkspaceCollectionDocument],
+    chunks: List[WorkspaceCollectionDocumentChunk],
+) -> int:
+    """Replaces the stored chunks of ``documents`` with ``chunks`` (from
+    ``build_chunks``). Run it in the transaction writing the documents."""
+    with transaction.atomic():
+        WorkspaceCollectionDocumentChunk.objects.filter(
+            document__in=[document.id for document in documents]
+        ).delete()
+        WorkspaceCollectionDocumentChunk.objects.bulk_create(chunks)
+    return len(chunks)
@@ -0,0 +1,47 @@
+from django.conf import settings
+
+DEFAULTS = {
+    "VECTOR_DB_EMBEDDINGS_CLASS": None,
+    "VECTOR_DB_EMBEDDING_BATCH_SIZE": 512,
+    "VECTOR_DB_EMBEDDING_BATCH_TOKENS": 250_000,
+    "VECTOR_DB_EMBEDDING_CACHE": True,
+    "VECTOR_DB_EMBEDDING_CACHE_MAX_AGE_DAYS": 90,
+    "VECTOR_DB_EMBEDDING_CACHE_MAX_ENTRIES": None,
+    "VECTOR_DB_QUERY_CACHE": True,
+    "VECTOR_DB_QUERY_CACHE_MAX_ENTRIES": 1024,
+    "VECTOR_DB_QUERY_CACHE_TTL": 3600,
+    "VECTOR_DB_QUERY_CACHE_ALIAS": None,
+    "VECTOR_DB_RESULT_CACHE_ALIAS": None,
+    "VECTOR_DB_RESULT_CACHE_TTL": 300,
+    "VECTOR_DB_RETRIEVER_RELOAD_SECONDS": 60,
+    "VECTOR_DB_EXACT_COUNT_BELOW": 10_000,
+    "VECTOR_DB_DEFER_EMBEDDINGS": False,
+    "VECTOR_DB_EMBEDDING_MAX_ATTEMPTS": 5,
+    "VECTOR_DB_EMBEDDING_RETRY_BACKOFF": 30,
+    "VECTOR_DB_EMBEDDING_RETRY_BACKOFF_MAX": 3600,
+    "VECTOR_DB_EMBEDDING_LEASE_SECONDS": 300,
+    "VECTOR_DB_EMBEDDING_DIMENSIONS": 1536,
+    "VECTOR_DB_REEMBED_REQUESTS_PER_MINUTE": None,
+    "VECTOR_DB_HNSW_EF_SEARCH": None,
+    "VECTOR_DB_IVFFLAT_PROBES": None,
+    "VECTOR_DB_ITERATIVE_SCAN": None,
+    "VECTOR_DB_FILTER_OVERFETCH": 10,
+    "VECTOR_DB_HALF_RERANK_FACTOR": 4,
+    "VECTOR_DB_BINARY_OVERFETCH": 10,
+    "VECTOR_DB_HYBRID_CANDIDATES": 4,
+    "VECTOR_DB_RRF_K": 60,
+    "VECTOR_DB_CHUNK_METHOD": None,
+    "VECTOR_DB_CHUNK_OPTIONS": None,
+    "VECTOR_DB_CHUNK_CANDIDATES": 4,
+    "VECTOR_DB_MMR_FETCH_K": 20,
+    "VECTOR_DB_MMR_LAMBDA": 0.5,
+    "VECTOR_DB_POOL_MIN_SIZE": 1,
+    "VECTOR_DB_POOL_MAX_SIZE": 10,
+    "VECTOR_DB_POOL_MAX_INACTIVE_LIFETIME": 300.0,
+    "VECTOR_DB_POOL_COMMAND_TIMEOUT": None,
+    "VECTOR_DB_POOL_CLOSE_TIMEOUT": 10.0,
+}
+
+
+def kb_setting(name: str):
+    return getattr(settings, name, DEFAULTS[name])
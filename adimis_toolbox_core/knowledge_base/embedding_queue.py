@@ -0,0 +1,233 @@
+from datetime import timedelta
+from typing import Optional, TypedDict
+from django.db import transaction
+from django.utils import timezone
+from .conf import kb_setting
+from .embeddings import content_hash, get_embeddings_service
+from .chunking import build_chunks, write_chunks
+from .models import (
+    EmbeddingStatus,
+    WorkspaceCollection,
+    WorkspaceCollectionDocument,
+)
+from .result_cache import invalidate_collection
+
+
+class DrainReport(TypedDict):
+    batches: int
+    embedded: int
+    failed: int
+
+
+def retry_delay(attempts: int) -> timedelta:
+    backoff = kb_setting("VECTOR_DB_EMBEDDING_RETRY_BACKOFF") * 2 ** (attempts - 1)
+    return timedelta(
+        seconds=min(backoff, kb_setting("VECTOR_DB_EMBEDDING_RETRY_BACKOFF_MAX"))
+    )
+
+
+def _claim_batch(batch_size: int, collection_id=None) -> list[tuple]:
+    """Leases up to ``batch_size`` due rows by pushing their retry time past
+    the lease window, so concurrent workers never embed the same row."""
+    now = timezone.now()
+    queryset = WorkspaceCollectionDocument.objects.filter(
+        embedding_retry_at__lte=now,
+    ).exclude(embedding_status=EmbeddingStatus.READY)
+    if collection_id is not None:
+        queryset = queryset.filter(collection_id=collection_id)
+
+    with transaction.atomic():
+        rows = list(
+            queryset.select_for_update(skip_locked=True)
+            .order_by("embedding_retry_at")
+            .values_list(
+                "id",
+                "content",
+                "embedding_attempts",
+                "collection__embedding_model",
+                "collection_id",
+            )[:batch_size]
+        )
+        if rows:
+            WorkspaceCollectionDocument.objects.filter(
+                id__in=[row[0] for row in rows]
+            ).update(
+                embedding_retry_at=now
+                + timedelta(seconds=kb_setting("VECTOR_DB_EMBEDDING_LEASE_SECONDS"))
+            )
+    return rows
+
+
+def _embed_with(model: str, rows: list[tuple]) -> dict:
+    embeddings = get_embeddings_service(model)
+    try:
+        vectors = embeddings.embed_documents([row[1] for row in rows])
+        return {row[0]: vector for row, vector in zip(rows, vectors)}
+    except Exception:
+        if len(rows) == 1:
+            raise
+    results = {}
+    for row in rows:
+        try:
+            results[row[0]] = embeddings.embed_documents([row[1]])[0]
+        except Exception as e:
+            results[row[0]] = e
+    return results
+
+
+def _embed(rows: list[tuple]) -> dict:
+    """Embeds the batch with one request per collection model, falling back to
+    one request per row when a request fails so a single bad document cannot
+    block the rest."""
+    by_model = {}
+    for row in rows:
+        by_model.setdefault(row[3], []).append(row)
+    results = {}
+    for model, model_rows in by_model.items():
+        results.update(_embed_with(model, model_rows))
+    return results
+
+
+def _build_chunks(rows: list[tuple], results: dict) -> dict:
+    """Chunks the successfully embedded rows before any lock is taken. A
+    document that cannot be chunked gets its error in ``results`` instead of
+    a vector, so it is retried with backoff like a failed embedding.
+    Returns the chunks per document id."""
+    by_collection = {}
+    for row in rows:
+        if not isinstance(results[row[0]], Exception):
+            by_collection.setdefault((row[4], row[3]), []).append(row)
+    collections = WorkspaceCollection.objects.in_bulk(
+        list({collection_id for collection_id, _ in by_collection})
+    )
+    chunks_by_document = {}
+    for (collection_id, model), collection_rows in by_collection.items():
+        collection = collections.get(collection_id)
+        if collection is None or collection.embedding_model != model:
+            # Deleted or switched models: _apply_results skips these rows.
+            continue
+        documents = []
+        for row in collection_rows:
+            document = WorkspaceCollectionDocument(
+                id=row[0], collection=collection, content=row[1]
+            )
+            document.set_embeddings(results[row[0]], model)
+            document.content_hash = content_hash(row[1])
+            documents.append(document)
+        chunks, failures = build_chunks(
+            collection, documents, get_embeddings_service(model)
+        )
+        for document_id, error in failures.items():
+            results[document_id] = ValueError(f"Chunking failed: {error}")
+        for chunk in chunks:
+            chunks_by_document.setdefault(chunk.document_id, []).append(chunk)
+    return chunks_by_document
+
+
+def _apply_results(
+    rows: list[tuple], results: dict, chunks: dict
+) -> tuple[int, int]:
+    embedded = failed = 0
+    now = timezone.now()
+    max_attempts = kb_setting("VECTOR_DB_EMBEDDING_MAX_ATTEMPTS")
+    contents = {row[0]: row[1] for row in rows}
+    models = {row[0]: row[3] for row in rows}
+
+    with transaction.atomic():
+        documents = list(
+            WorkspaceCollectionDocument.objects.select_for_update(of=("self",))
+            .select_related("collection")
+            .filter(id__in=list(contents))
+            .only(
+                "id",
+                "content",
+                "embedding_attempts",
+                "collection",
+                "collection__name",
+                "collection__embedding_model",
+            )
+        )
+        updated = []
+        for document in documents:
+            # Content edited while we were embedding: the row was re-queued by
+            # save(), so leave it for the next pass.
+            if document.content != contents[document.id]:
+                continue
+            # The collection switched models meanwhile: the lease expires and
+            # the next pass embeds the row with the new one.
+            if document.collection.embedding_model != models[document.id]:
+                continue
+            result = results[document.id]
+            if isinstance(result, Exception):
+                document.embedding_attempts += 1
+                document.embedding_error = str(result)
+                document.embedding_status = EmbeddingStatus.FAILED
+                document.embedding_retry_at = (
+                    now + retry_delay(document.embedding_attempts)
+                    if document.embedding_attempts < max_attempts
+                    else None
+                )
+                failed += 1
+            else:
+                document.set_embeddings(result, models[document.id])
+                document.embedding_status = EmbeddingStatus.READY
+                document.embedding_error = None
+                document.embedding_retry_at = None
+                embedded += 1
+            updated.append(document)
+
+        WorkspaceCollectionDocument.objects.bulk_update(
+            updated,
+            [
+                "embeddings",
+                "embedding_model",
+                "embedding_dimensions",
+                "staged_embeddings",
+                "staged_embedding_model",
+                "embedding_status",
+                "embedding_attempts",
+                "embedding_error",
+                "embedding_retry_at",
+            ],
+        )
+        ready = [
+            document
+            for document in updated
+            if document.embedding_status == EmbeddingStatus.READY
+        ]
+        # Chunks were split and embedded before the transaction; only the
+        # rows written here get theirs replaced.
+        write_chunks(
+            ready,
+            [chunk for document in ready for chunk in chunks.get(document.id, [])],
+        )
+        # Newly embedded rows become searchable.
+        invalidate_collection(*{document.collection.name for document in ready})
+    return embedded, failed
+
+
+def drain_pending_embeddings(
+    batch_size: Optional[int] = None,
+    max_batches: Optional[int] = None,
+    collection_id=None,
+) -> DrainReport:
+    """Embeds pending and due failed documents until none are left or
+    ``max_batches`` batches have been processed."""
+    batch_size = batch_size or kb_setting("VECTOR_DB_EMBEDDING_BATCH_SIZE")
+    report: DrainReport = {"batches": 0, "embedded": 0, "failed": 0}
+
+    while max_batches is None or report["batches"] < max_batches:
+        rows = _claim_batch(batch_size, collection_id=collection_id)
+        if not rows:
+            break
+        try:
+            results = _embed(rows)
+        except Exception as e:
+            results = {row[0]: e for row in rows}
+        chunks = _build_chunks(rows, results)
+        embedded, failed = _apply_results(rows, results, chunks)
+        report["batches"] += 1
+        report["embedded"] += embedded
+        report["failed"] += failed
+
+    return report
@@ -0,0 +1,266 @@
+import math
+import hashlib
+import tiktoken
+import threading
+from datetime import timedelta
+from functools import lru_cache
+from django.apps import apps
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from asgiref.sync import sync_to_async
+from typing import Iterator, List, Optional, TypeVar, Callable, Dict
+from langchain_openai import OpenAIEmbeddings
+from langchain_core.embeddings import Embeddings
+from .conf import kb_setting
+
+T = TypeVar("T")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _as_list(vector) -> List[float]:
+    return vector.tolist() if hasattr(vector, "tolist") else list(vector)
+
+
+class EmbeddingCacheStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hits: int, misses: int) -> None:
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def as_dict(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+embedding_cache_stats = EmbeddingCacheStats()
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an embeddings client with the shared ``EmbeddingCacheEntry`` table.
+
+    Document texts are looked up by ``(sha256(text), model)`` before anything is
+    sent to the provider; only misses are embedded and written back.
+    """
+
+    def __init__(self, underlying: Embeddings, model: str) -> None:
+        self.underlying = underlying
+        self.model = model
+
+    @staticmethod
+    def _entries():
+        return apps.get_model("knowledge_base", "EmbeddingCacheEntry").objects
+
+    def _lookup(self, hashes: List[str]) -> Dict[str, List[float]]:
+        rows = self._entries().filter(model=self.model, content_hash__in=hashes)
+        found = {
+            digest: _as_list(vector)
+            for digest, vector in rows.values_list("content_hash", "embeddings")
+        }
+        if found:
+            self._entries().filter(
+                model=self.model, content_hash__in=list(found)
+            ).update(last_used_at=timezone.now(), hits=F("hits") + 1)
+        return found
+
+    def _store(self, vectors: Dict[str, List[float]]) -> None:
+        Entry = apps.get_model("knowledge_base", "EmbeddingCacheEntry")
+        Entry.objects.bulk_create(
+            [
+                Entry(content_hash=digest, model=self.model, embeddings=vector)
+                for digest, vector in vectors.items()
+            ],
+            ignore_conflicts=True,
+        )
+
+    def _misses(
+        self, texts: List[str], hashes: List[str], cached: Dict[str, List[float]]
+    ) -> Dict[str, str]:
+        misses = {
+            digest: text
+            for digest, text in zip(hashes, texts)
+            if digest not in cached
+        }
+        embedding_cache_stats.record(
+            hits=sum(1 for digest in hashes if digest in cached),
+            misses=sum(1 for digest in hashes if digest not in cached),
+        )
+        return misses
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [content_hash(text) for text in texts]
+        cached = self._lookup(list(set(hashes)))
+        misses = self._misses(texts, hashes, cached)
+        if misses:
+            vectors = self.underlying.embed_documents(list(misses.values()))
+            embedded = dict(zip(misses.keys(), vectors))
+            self._store(embedded)
+            cached.update(embedded)
+        return [cached[digest] for digest in hashes]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [content_hash(text) for text in texts]
+        cached = await sync_to_async(self._lookup)(list(set(hashes)))
+        misses = self._misses(texts, hashes, cached)
+        if misses:
+            vectors = await self.underlying.aembed_documents(list(misses.values()))
+            embedded = dict(zip(misses.keys(), vectors))
+            await sync_to_async(self._store)(embedded)
+            cached.update(embedded)
+        return [cached[digest] for digest in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.underlying.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.underlying.aembed_query(text)
+
+
+DETERMINISTIC_MODEL_PREFIX = "deterministic-"
+
+
+class DeterministicEmbeddings(Embeddings):
+    """Offline embeddings for benchmarks and local development.
+
+    Every word is hashed to one signed coordinate and the sum is normalised,
+    so equal texts get equal vectors and texts sharing words are close.
+    Nothing leaves the process.
+    """
+
+    def __init__(self, model: Optional[str] = None, dimensions: Optional[int] = None):
+        self.dimensions = dimensions or kb_setting("VECTOR_DB_EMBEDDING_DIMENSIONS")
+        # Named apart from real models so shared caches never mix their vectors.
+        self.model = f"{DETERMINISTIC_MODEL_PREFIX}{self.dimensions}"
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for word in text.lower().split():
+            value = int.from_bytes(
+                hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little"
+            )
+            vector[value % self.dimensions] += 1.0 if value >> 63 else -1.0
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def embed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """Query vectors in one request. Queries are cached by the query cache,
+    not in the document table of ``CachedEmbeddings``, so only the wrapped
+    client is called."""
+    return getattr(embeddings, "underlying", embeddings).embed_documents(texts)
+
+
+async def aembed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    return await getattr(embeddings, "underlying", embeddings).aembed_documents(texts)
+
+
+@lru_cache(maxsize=None)
+def get_embeddings_service(model: Optional[str] = None) -> Embeddings:
+    """Returns a process-wide embeddings client for ``model``.
+
+    Clients hold an HTTP connection pool, so building one per document or per
+    request throws away keep-alive connections. ``VECTOR_DB_EMBEDDINGS_CLASS``
+    swaps OpenAI for another ``Embeddings`` class taking ``model=``.
+    """
+    model = model or settings.VECTOR_DB_EMBEDDING_MODEL
+    embeddings_class = kb_setting("VECTOR_DB_EMBEDDINGS_CLASS")
+    if embeddings_class:
+        embeddings = import_string(embeddings_class)(model=model)
+    else:
+        embeddings = OpenAIEmbeddings(model=model, api_key=settings.OPENAI_API_KEY)
+    if kb_setting("VECTOR_DB_EMBEDDING_CACHE"):
+        return CachedEmbeddings(embeddings, model=getattr(embeddings, "model", model))
+    return embeddings
+
+
+def evict_embedding_cache(
+    max_age_days: Optional[int] = None, max_entries: Optional[int] = None
+) -> int:
+    """Deletes cache entries not used for ``max_age_days`` and, if the table is
+    still larger than ``max_entries``, the least recently used overflow.
+    Returns the number of deleted rows."""
+    Entry = apps.get_model("knowledge_base", "EmbeddingCacheEntry")
+    max_age_days = max_age_days or kb_setting("VECTOR_DB_EMBEDDING_CACHE_MAX_AGE_DAYS")
+    max_entries = max_entries or kb_setting("VECTOR_DB_EMBEDDING_CACHE_MAX_ENTRIES")
+
+    deleted = 0
+    if max_age_days:
+        cutoff = timezone.now() - timedelta(days=max_age_days)
+        deleted += Entry.objects.filter(last_used_at__lt=cutoff).delete()[0]
+    if max_entries:
+        overflow = Entry.objects.order_by("-last_used_at").values_list(
+            "last_used_at", flat=True
+        )[max_entries : max_entries + 1]
+        cutoff = next(iter(overflow), None)
+        if cutoff is not None:
+            deleted += Entry.objects.filter(last_used_at__lte=cutoff).delete()[0]
+    return deleted
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    model = model or settings.VECTOR_DB_EMBEDDING_MODEL
+    if model.startswith(DETERMINISTIC_MODEL_PREFIX):
+        # Offline embedder: tiktoken would download its encoding, and there is
+        # no provider limit to respect. About four characters per token.
+        return len(text) // 4 + 1
+    encoding = _get_encoding(model)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def iter_embedding_batches(
+    items: List[T],
+    text: Callable[[T], str],
+    batch_size: Optional[int] = None,
+    max_batch_tokens: Optional[int] = None,
+    model: Optional[str] = None,
+) -> Iterator[tuple[List[T], int]]:
+    """Groups ``items`` into embedding requests bounded by count and tokens.
+
+    Yields ``(batch, token_count)`` tuples. A single item larger than the token
+    budget is emitted on its own rather than dropped.
+    """
+    batch_size = batch_size or kb_setting("VECTOR_DB_EMBEDDING_BATCH_SIZE")
+    max_batch_tokens = max_batch_tokens or kb_setting(
+        "VECTOR_DB_EMBEDDING_BATCH_TOKENS"
+    )
+
+    batch: List[T] = []
+    batch_tokens = 0
+    for item in items:
+        tokens = count_tokens(text(item), model=model)
+        if batch and (
+            len(batch) >= batch_size or batch_tokens + tokens > max_batch_tokens
+        ):
+            yield batch, batch_tokens
+            batch, batch_tokens = [], 0
+        batch.append(item)
+        batch_tokens += tokens
+    if batch:
+        yield batch, batch_tokens
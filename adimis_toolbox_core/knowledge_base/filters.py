@@ -0,0 +1,84 @@
+import json
+from typing import Any
+from .vector_sql import SqlParams
+
+RANGE_OPERATORS = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+
+def _contains(key: str, value: Any, params: SqlParams) -> str:
+    # ``@>`` is answered by the GIN index on ``metadata``.
+    return f"metadata @> {params.add(json.dumps({key: value}))}::jsonb"
+
+
+def _absent(key: str, params: SqlParams) -> str:
+    return f"metadata IS NULL OR NOT (metadata ? {params.add(key)})"
+
+
+def _compile_condition(key: str, operator: str, value: Any, params: SqlParams) -> str:
+    if operator == "$eq":
+        return _contains(key, value, params)
+    if operator == "$ne":
+        # Documents without the key are "not equal" too.
+        absent = _absent(key, params)
+        return f"({absent} OR NOT ({_contains(key, value, params)}))"
+    if operator in ("$in", "$nin"):
+        if not isinstance(value, (list, tuple)):
+            raise ValueError(f"{operator} on '{key}' expects a list")
+        if not value:
+            return "FALSE" if operator == "$in" else "TRUE"
+        absent = _absent(key, params) if operator == "$nin" else None
+        matches = " OR ".join(_contains(key, item, params) for item in value)
+        return f"({matches})" if absent is None else f"({absent} OR NOT ({matches}))"
+    if operator == "$exists":
+        return f"metadata ? {params.add(key)}" if value else f"({_absent(key, params)})"
+    if operator in RANGE_OPERATORS:
+        sql_operator = RANGE_OPERATORS[operator]
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError(f"{operator} on '{key}' expects a number or string")
+        if isinstance(value, str):
+            return f"metadata ->> {params.add(key)} {sql_operator} {params.add(value)}"
+        # Non-numeric values compare as NULL instead of failing the cast. Each
+        # placeholder takes its own parameter: "%s" placeholders are positional.
+        return (
+            f"CASE WHEN jsonb_typeof(metadata -> {params.add(key)}) = 'number' "
+            f"THEN (metadata ->> {params.add(key)})::float8 END "
+            f"{sql_operator} {params.add(float(value))}::float8"
+        )
+    raise ValueError(f"Unsupported metadata filter operator: {operator}")
+
+
+def compile_metadata_filter(metadata_filter: dict, params: SqlParams) -> str:
+    """Compiles a metadata filter into a SQL boolean expression.
+
+    Keys are top-level metadata keys mapped either to a value (equality) or to
+    ``{operator: value}`` with ``$eq``, ``$ne``, ``$in``, ``$nin``, ``$gt``,
+    ``$gte``, ``$lt``, ``$lte`` or ``$exists``. ``$and``/``$or`` take a list of
+    filters. Sibling keys are combined with AND. ``$ne``, ``$nin`` and
+    ``{"$exists": False}`` also match documents without the key.
+    """
+    clauses = []
+    for key, condition in metadata_filter.items():
+        if key in ("$and", "$or"):
+            if not condition:
+                raise ValueError(f"{key} expects a non-empty list of filters")
+            joiner = " AND " if key == "$and" else " OR "
+            clauses.append(
+                "("
+                + joiner.join(
+                    compile_metadata_filter(sub_filter, params)
+                    for sub_filter in condition
+                )
+                + ")"
+            )
+        elif condition == {}:
+            raise ValueError(f"Empty condition on '{key}'")
+        elif isinstance(condition, dict) and all(
+            operator.startswith("$") for operator in condition
+        ):
+            clauses.extend(
+                _compile_condition(key, operator, value, params)
+                for operator, value in condition.items()
+            )
+        else:
+            clauses.append(_contains(key, condition, params))
+    return "(" + " AND ".join(clauses or ["TRUE"]) + ")"
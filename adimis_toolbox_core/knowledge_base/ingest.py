@@ -0,0 +1,93 @@
+import gzip
+import json
+from typing import BinaryIO, Iterator, List, Optional, TypedDict
+from django.db import connection
+from .models import WorkspaceCollectionDocument
+from .vector_sql import DOCUMENT_TABLE
+
+
+class LineResult(TypedDict, total=False):
+    line: int
+    id: str
+    error: str
+
+
+class StreamIngestReport(TypedDict):
+    created: int
+    failed: int
+    batches: int
+    results: List[LineResult]
+
+
+def iter_ndjson(stream: BinaryIO, gzipped: bool = False) -> Iterator[tuple]:
+    """Yields ``(line_number, document_or_error)`` for every non-blank line of
+    an NDJSON stream, reading it incrementally. Lines that are not a JSON
+    object with ``title`` and ``content`` yield a ``ValueError``."""
+    if gzipped:
+        stream = gzip.GzipFile(fileobj=stream, mode="rb")
+    for number, raw in enumerate(iter(stream.readline, b""), start=1):
+        if not raw.strip():
+            continue
+        try:
+            document = json.loads(raw)
+        except ValueError as e:
+            yield number, ValueError(f"Invalid JSON: {e}")
+            continue
+        if not isinstance(document, dict):
+            yield number, ValueError("Expected a JSON object")
+        elif not document.get("title") or not isinstance(
+            document.get("content"), str
+        ):
+            yield number, ValueError("'title' and 'content' are required")
+        elif not isinstance(document.get("metadata", {}), dict):
+            yield number, ValueError("'metadata' must be an object")
+        else:
+            yield number, document
+
+
+def copy_documents(
+    documents: List[WorkspaceCollectionDocument],
+    keep_timestamps: bool = False,
+) -> List[WorkspaceCollectionDocument]:
+    """Inserts unsaved documents with ``COPY ... FROM STDIN``.
+
+    Values go through the same ``pre_save``/``get_db_prep_save`` steps as
+    ``bulk_create``, so defaults and ``auto_now`` fields are honoured unless
+    ``keep_timestamps`` writes the documents' own ``created_at``/``updated_at``
+    (e.g. when restoring an archive). Falls back to ``bulk_create`` on drivers
+    without COPY support (psycopg2), which always stamps the current time.
+    """
+    fields = [
+        field
+        for field in WorkspaceCollectionDocument._meta.concrete_fields
+        if not field.generated
+    ]
+    kept = {"created_at", "updated_at"} if keep_timestamps else set()
+
+    def value(field, document):
+        if field.attname in kept:
+            return getattr(document, field.attname)
+        return field.pre_save(document, add=True)
+
+    columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        if not hasattr(cursor.cursor, "copy"):
+            return WorkspaceCollectionDocument.objects.bulk_create(documents)
+        with cursor.copy(f"COPY {DOCUMENT_TABLE} ({columns}) FROM STDIN") as copy:
+            for document in documents:
+                copy.write_row(
+                    [
+                        field.get_db_prep_save(value(field, document), connection)
+                        for field in fields
+                    ]
+                )
+    for document in documents:
+        document._state.adding = False
+        document._state.db = connection.alias
+    return documents
+
+
+def wants_gzip(content_type: Optional[str], content_encoding: Optional[str]) -> bool:
+    return (content_encoding or "").lower() == "gzip" or (content_type or "").split(
+        ";"
+    )[0].strip().lower() in ("application/gzip", "application/x-gzip")
@@ -0,0 +1,118 @@
+import math
+from django.db import connection
+from django.core.management.base import BaseCommand, CommandError
+from ...vector_sql import (
+    CHUNK_INDEX_NAMES,
+    CHUNK_TABLE,
+    DOCUMENT_TABLE,
+    INDEX_NAMES,
+    VECTOR_TYPES,
+    create_index_sql,
+    index_name,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Build or rebuild the pgvector ANN index on document embeddings "
+        "without blocking writes (CREATE INDEX CONCURRENTLY)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--method", choices=list(INDEX_NAMES), default="hnsw")
+        parser.add_argument(
+            "--precision",
+            choices=list(VECTOR_TYPES),
+            default="full",
+            help=(
+                "half indexes embeddings::halfvec, binary their binary_quantize "
+                "bits for quantized_search (both need pgvector >= 0.7.0)."
+            ),
+        )
+        parser.add_argument(
+            "--chunks",
+            action="store_true",
+            help="Index the document chunk table instead (full precision only).",
+        )
+        parser.add_argument("--m", type=int, default=16)
+        parser.add_argument("--ef-construction", type=int, default=64)
+        parser.add_argument(
+            "--lists",
+            type=int,
+            default=None,
+            help="IVFFlat lists; defaults to rows/1000 (sqrt(rows) above 1M rows).",
+        )
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Build a fresh index next to the current one and swap them.",
+        )
+        parser.add_argument("--drop", action="store_true")
+        parser.add_argument(
+            "--maintenance-work-mem",
+            default=None,
+            help="e.g. 2GB; lets HNSW graphs be built in memory.",
+        )
+        parser.add_argument("--parallel-workers", type=int, default=None)
+
+    def _default_lists(self, cursor, table: str) -> int:
+        cursor.execute(f"SELECT count(*) FROM {table} WHERE embeddings IS NOT NULL")
+        rows = cursor.fetchone()[0]
+        lists = rows / 1000 if rows <= 1_000_000 else math.sqrt(rows)
+        return max(1, int(lists))
+
+    def handle(self, *args, **options):
+        if connection.in_atomic_block:
+            raise CommandError("Concurrent index builds cannot run in a transaction.")
+
+        method = options["method"]
+        precision = options["precision"]
+        if options["chunks"]:
+            if precision != "full":
+                raise CommandError("Chunk embeddings are indexed at full precision.")
+            table, name = CHUNK_TABLE, CHUNK_INDEX_NAMES[method]
+        else:
+            table, name = DOCUMENT_TABLE, index_name(method, precision)
+
+        with connection.cursor() as cursor:
+            if options["drop"]:
+                cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+                self.stdout.write(self.style.SUCCESS(f"Dropped {name}."))
+                return
+
+            if options["maintenance_work_mem"]:
+                cursor.execute(
+                    "SELECT set_config('maintenance_work_mem', %s, false)",
+                    [options["maintenance_work_mem"]],
+                )
+            if options["parallel_workers"] is not None:
+                cursor.execute(
+                    "SELECT set_config('max_parallel_maintenance_workers', %s, false)",
+                    [str(options["parallel_workers"])],
+                )
+
+            lists = options["lists"] or (
+                self._default_lists(cursor, table) if method == "ivfflat" else 100
+            )
+            build_name = f"{name}_new" if options["rebuild"] else name
+            if options["rebuild"]:
+                cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {build_name}")
+
+            self.stdout.write(f"Building {build_name} ({method})...")
+            cursor.execute(
+                create_index_sql(
+                    method,
+                    name=build_name,
+                    m=options["m"],
+                    ef_construction=options["ef_construction"],
+                    lists=lists,
+                    precision=precision,
+                    table=table,
+                )
+            )
+
+            if options["rebuild"]:
+                cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+                cursor.execute(f"ALTER INDEX {build_name} RENAME TO {name}")
+
+        self.stdout.write(self.style.SUCCESS(f"Index {name} is ready."))
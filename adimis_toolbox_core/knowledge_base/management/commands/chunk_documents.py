@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from ...chunking import build_chunks, chunking_for, write_chunks
+from ...embeddings import get_embeddings_service
+from ...models import WorkspaceCollection, WorkspaceCollectionDocument
+
+
+class Command(BaseCommand):
+    help = (
+        "(Re)build the chunks of every embedded document in a collection with "
+        "its chunking method, e.g. after enabling or changing it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("collection_name")
+        parser.add_argument("--batch-size", type=int, default=200)
+
+    def handle(self, *args, **options):
+        collection = WorkspaceCollection.objects.get(name=options["collection_name"])
+        if chunking_for(collection) is None:
+            raise CommandError(
+                f"{collection.name} has no chunk_method and VECTOR_DB_CHUNK_METHOD "
+                "is not set."
+            )
+        embeddings = get_embeddings_service(collection.embedding_model)
+        queryset = (
+            WorkspaceCollectionDocument.objects.filter(
+                collection=collection, embeddings__isnull=False
+            )
+            .only("id", "content", "content_hash", "embeddings", "embedding_model")
+            .order_by("id")
+        )
+
+        last_id, documents, chunks, failed = None, 0, 0, 0
+        while True:
+            page = queryset if last_id is None else queryset.filter(id__gt=last_id)
+            batch = list(page[: options["batch_size"]])
+            if not batch:
+                break
+            built, failures = build_chunks(collection, batch, embeddings)
+            for document_id, error in failures.items():
+                self.stderr.write(f"{document_id}: {error}")
+            chunks += write_chunks(
+                [document for document in batch if document.id not in failures],
+                built,
+            )
+            documents += len(batch)
+            failed += len(failures)
+            last_id = batch[-1].id
+            self.stdout.write(f"{documents} documents, {chunks} chunks, {failed} failed")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Chunked {documents} documents of {collection.name} into {chunks} chunks."
+            )
+        )
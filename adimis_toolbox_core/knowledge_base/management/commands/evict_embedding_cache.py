@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from ...embeddings import evict_embedding_cache
+
+
+class Command(BaseCommand):
+    help = "Evict least recently used entries from the shared embedding cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-age-days",
+            type=int,
+            default=None,
+            help="Delete entries not used within this many days.",
+        )
+        parser.add_argument(
+            "--max-entries",
+            type=int,
+            default=None,
+            help="Keep at most this many of the most recently used entries.",
+        )
+
+    def handle(self, *args, **options):
+        deleted = evict_embedding_cache(
+            max_age_days=options["max_age_days"],
+            max_entries=options["max_entries"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Evicted {deleted} cache entries."))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from ...archive import ARCHIVE_COMPRESSION
+from ...services import CollectionService
+
+
+class Command(BaseCommand):
+    help = (
+        "Write a collection, stored vectors included, to an Arrow IPC archive "
+        "that import_collection loads without re-embedding."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("collection_name")
+        parser.add_argument("path")
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument(
+            "--compression",
+            choices=["zstd", "lz4", "none"],
+            default=ARCHIVE_COMPRESSION,
+        )
+
+    def handle(self, *args, **options):
+        compression = options["compression"]
+        try:
+            archive = CollectionService.export_collection(
+                options["collection_name"],
+                batch_size=options["batch_size"],
+                compression=None if compression == "none" else compression,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        written = 0
+        with open(options["path"], "wb") as output:
+            for data in archive:
+                output.write(data)
+                written += len(data)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Exported {options['collection_name']} to {options['path']} "
+                f"({written / 2**20:.1f} MiB)."
+            )
+        )
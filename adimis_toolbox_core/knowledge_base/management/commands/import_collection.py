@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from ...services import CollectionService
+
+
+class Command(BaseCommand):
+    help = (
+        "Load an archive written by export_collection with COPY, keeping its "
+        "vectors. Creates the collection (with the archived settings) when it "
+        "does not exist, otherwise appends to it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--collection-name",
+            default=None,
+            help="Target collection (default: the archived one's name).",
+        )
+        parser.add_argument(
+            "--preserve-ids",
+            action="store_true",
+            help="Keep the archived document ids, e.g. to restore a backup.",
+        )
+
+    def handle(self, *args, **options):
+        with open(options["path"], "rb") as archive:
+            try:
+                report = CollectionService.import_collection(
+                    archive,
+                    None,
+                    collection_name=options["collection_name"],
+                    preserve_ids=options["preserve_ids"],
+                )
+            except ValueError as e:
+                # Nothing was written; the import can be run again as is.
+                raise CommandError(str(e))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {report['documents']} documents into "
+                f"{report['collection']} in {report['batches']} batches: "
+                f"{report['embedded']} with their vectors, {report['pending']} "
+                "queued for embedding."
+            )
+        )
@@ -0,0 +1,141 @@
+import asyncio
+from django.db import connection
+from django.utils.module_loading import import_string
+from django.core.management.base import BaseCommand
+from ...benchmark import (
+    SyntheticCorpus,
+    abenchmark_search,
+    benchmark_ingest,
+    benchmark_search,
+)
+from ...embeddings import get_embeddings_service
+from ...models import WorkspaceCollection
+from ...pool import close_pool, get_pool
+from ...retriever import SEARCH_METHODS
+from ...services import CollectionService, DocumentService
+from ...vector_sql import DOCUMENT_TABLE
+
+SEARCH_TYPES = [
+    search_type
+    for search_type in SEARCH_METHODS
+    if search_type != "similarity_search_with_relevance_scores"
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark ingest throughput and sync/async search latency on synthetic "
+        "collections, with an offline deterministic embedder by default. Build "
+        "the ANN index first (build_vector_index) to measure indexed search."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="*", default=[10_000])
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument(
+            "--search-types",
+            nargs="*",
+            choices=SEARCH_TYPES,
+            default=["similarity_search"],
+        )
+        parser.add_argument("--concurrency", type=int, nargs="*", default=[1, 8])
+        parser.add_argument(
+            "--embeddings",
+            default="adimis_toolbox_core.knowledge_base.embeddings.DeterministicEmbeddings",
+            help='Embeddings class path, or "settings" for get_embeddings_service().',
+        )
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--prefix", default="kb-benchmark")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--reuse",
+            action="store_true",
+            help="Search existing benchmark collections instead of re-ingesting.",
+        )
+        parser.add_argument(
+            "--keep", action="store_true", help="Keep the collections afterwards."
+        )
+
+    def _embeddings(self, path: str):
+        if path == "settings":
+            return get_embeddings_service()
+        return import_string(path)()
+
+    def _service(self, collection, embeddings) -> DocumentService:
+        service = DocumentService(
+            collection_name=collection.name,
+            embeddings=embeddings,
+            defer_embeddings=False,
+            query_cache=False,
+        )
+        service.collection = collection
+        return service
+
+    def _write(self, label: str, report: dict) -> None:
+        self.stdout.write(
+            f"  {label:<40}"
+            f"{report['p50_ms']:>9.2f}{report['p95_ms']:>9.2f}{report['p99_ms']:>9.2f}"
+            f"{report['queries_per_second']:>10.1f}"
+        )
+
+    async def _async_search(self, service, queries, search_type, options, k):
+        service.pool = await get_pool()
+        try:
+            for concurrency in options["concurrency"]:
+                report = await abenchmark_search(
+                    service,
+                    SEARCH_METHODS[search_type],
+                    queries,
+                    concurrency=concurrency,
+                    top_k=k,
+                )
+                self._write(f"{search_type} async x{concurrency}", report)
+        finally:
+            await close_pool()
+
+    def handle(self, *args, **options):
+        embeddings = self._embeddings(options["embeddings"])
+        corpus = SyntheticCorpus(seed=options["seed"])
+        queries = corpus.queries(options["queries"])
+        k = options["k"]
+
+        for size in options["sizes"]:
+            name = f"{options['prefix']}-{size}"
+            collection = WorkspaceCollection.objects.filter(name=name).first()
+            if collection is not None and not options["reuse"]:
+                collection.delete()
+                collection = None
+            if collection is None:
+                collection = CollectionService.create_collection(
+                    name, "Synthetic benchmark collection", None
+                )
+                service = self._service(collection, embeddings)
+                report = benchmark_ingest(
+                    service, corpus.documents(size), batch_size=options["batch_size"]
+                )
+                self.stdout.write(
+                    f"{name}: ingested {report['documents']} documents in "
+                    f"{report['seconds']:.1f}s "
+                    f"({report['documents_per_second']:.0f} docs/s)"
+                )
+                with connection.cursor() as cursor:
+                    cursor.execute(f"ANALYZE {DOCUMENT_TABLE}")
+            else:
+                service = self._service(collection, embeddings)
+                self.stdout.write(f"{name}: reusing existing collection")
+
+            self.stdout.write(
+                f"  {'search':<40}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'qps':>10}"
+            )
+            for search_type in options["search_types"]:
+                report = benchmark_search(
+                    service, SEARCH_METHODS[search_type], queries, top_k=k
+                )
+                self._write(f"{search_type} sync", report)
+                asyncio.run(
+                    self._async_search(service, queries, search_type, options, k)
+                )
+
+            if not options["keep"]:
+                collection.delete()
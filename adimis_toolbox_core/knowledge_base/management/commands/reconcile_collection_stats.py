@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from ...stats import reconcile_collection_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the documents of collections and repair their stats rows where "
+        "they drifted from the trigger-maintained totals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "collection_names", nargs="*", help="Collections to check (default: all)."
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Report drift without fixing it."
+        )
+
+    def handle(self, *args, **options):
+        drift = reconcile_collection_stats(
+            options["collection_names"] or None, fix=not options["dry_run"]
+        )
+        for entry in drift:
+            self.stdout.write(
+                f"{entry['collection']}: {entry['field']} stored={entry['stored']} "
+                f"actual={entry['actual']}"
+            )
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Collection stats are in sync."))
+        elif options["dry_run"]:
+            self.stdout.write(self.style.WARNING(f"{len(drift)} values drifted."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Fixed {len(drift)} drifted values."))
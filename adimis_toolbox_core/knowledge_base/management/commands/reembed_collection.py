@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+from ...embedding_queue import drain_pending_embeddings
+from ...models import ReembeddingJob, ReembeddingStatus, WorkspaceCollection
+from ...reembedding import run_reembedding_job, start_reembedding
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-embed a collection with another model without downtime: vectors are "
+        "staged next to the current ones and swapped in when all are ready. "
+        "Interrupted jobs resume with --resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("collection_name")
+        parser.add_argument("target_model", nargs="?")
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument(
+            "--requests-per-minute",
+            type=int,
+            default=None,
+            help="Cap on embedding requests (VECTOR_DB_REEMBED_REQUESTS_PER_MINUTE).",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Continue the collection's latest unfinished job.",
+        )
+
+    def _progress(self, job: ReembeddingJob) -> None:
+        self.stdout.write(
+            f"[{job.phase}] {job.processed}/{job.total} "
+            f"({min(job.progress, 1.0):.1%}) {job.status}"
+        )
+
+    def handle(self, *args, **options):
+        collection = WorkspaceCollection.objects.get(name=options["collection_name"])
+        if options["resume"]:
+            job = ReembeddingJob.objects.filter(
+                collection=collection, status__in=["pending", "running", "failed"]
+            ).first()
+            if job is None:
+                self.stdout.write("No unfinished job to resume.")
+                return
+        elif not options["target_model"]:
+            raise CommandError("A target model is required unless --resume is given.")
+        else:
+            job = start_reembedding(
+                collection.id,
+                options["target_model"],
+                batch_size=options["batch_size"],
+                requests_per_minute=options["requests_per_minute"],
+            )
+
+        job = run_reembedding_job(job.id, progress=self._progress)
+        if job.status == ReembeddingStatus.COMPLETED:
+            # Documents written with the old model during the swap were reset
+            # to pending; embed them with the new one.
+            report = drain_pending_embeddings(
+                max_batches=None, collection_id=str(collection.id)
+            )
+            if report["embedded"] or report["failed"]:
+                self.stdout.write(
+                    f"Embedded {report['embedded']} pending documents "
+                    f"({report['failed']} failed)."
+                )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{collection.name}: job {job.id} {job.status} "
+                f"({job.processed} vectors)."
+            )
+        )
@@ -0,0 +1,47 @@
+from django.db import connection
+from django.core.management.base import BaseCommand
+from ...models import VectorPrecision, WorkspaceCollection
+from ...services import CollectionService
+from ...vector_sql import PRECISION_INDEX_NAMES
+
+
+class Command(BaseCommand):
+    help = (
+        "Choose whether a collection is searched through the full-precision or "
+        "the half-precision (halfvec) ANN index."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("collection_name")
+        parser.add_argument("precision", choices=VectorPrecision.values)
+        parser.add_argument(
+            "--rerank-factor",
+            type=int,
+            default=None,
+            help="Candidates per result reranked at full precision (0 disables).",
+        )
+
+    def handle(self, *args, **options):
+        precision = options["precision"]
+        expected = list(PRECISION_INDEX_NAMES[precision].values())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM pg_indexes WHERE indexname = ANY(%s)",
+                [expected],
+            )
+            if not cursor.fetchone()[0]:
+                self.stderr.write(
+                    self.style.WARNING(
+                        f"No {precision}-precision index exists yet; searches "
+                        f"will scan sequentially. Run build_vector_index "
+                        f"--precision {precision}."
+                    )
+                )
+
+        collection = WorkspaceCollection.objects.get(name=options["collection_name"])
+        CollectionService.set_vector_precision(
+            collection.id, precision, options["rerank_factor"]
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"{collection.name} now searches at {precision} precision.")
+        )
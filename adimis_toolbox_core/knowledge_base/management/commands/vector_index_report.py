@@ -0,0 +1,183 @@
+import time
+import statistics
+from django.db import connection, transaction
+from django.core.management.base import BaseCommand
+from ...models import WorkspaceCollection
+from ...vector_sql import (
+    DOCUMENT_TABLE,
+    PRECISION_INDEX_NAMES,
+    distance_sql,
+    tuning_statements,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure recall@k and latency of the ANN index for a collection against "
+        "an exact (sequential scan) search, for a range of ef_search/probes, "
+        "and optionally of the half-precision and binary-quantized indexes with "
+        "full-precision rerank."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("collection_name")
+        parser.add_argument("--queries", type=int, default=50)
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--ef-search", type=int, nargs="*", default=[40, 100, 200])
+        parser.add_argument("--probes", type=int, nargs="*", default=[])
+        parser.add_argument(
+            "--half",
+            action="store_true",
+            help="Also measure the halfvec index (see build_vector_index --precision).",
+        )
+        parser.add_argument(
+            "--rerank-factors",
+            type=int,
+            nargs="*",
+            default=[0, 4],
+            help="Half-precision candidates per result reranked exactly (0: none).",
+        )
+        parser.add_argument(
+            "--binary",
+            action="store_true",
+            help="Also measure binary-quantized search with exact rerank.",
+        )
+        parser.add_argument("--overfetch", type=int, nargs="*", default=[4, 10, 20])
+
+    def _sql(self, precision: str, rerank_factor: int) -> str:
+        """Top-k query with parameters (collection_id, query, [query], limit...)."""
+        if precision == "full" or not rerank_factor:
+            return f"""
+                SELECT id FROM {DOCUMENT_TABLE}
+                WHERE collection_id = %s AND embeddings IS NOT NULL
+                ORDER BY {distance_sql("%s", precision=precision)}
+                LIMIT %s
+            """
+        return f"""
+            SELECT id FROM (
+                SELECT id, embeddings FROM {DOCUMENT_TABLE}
+                WHERE collection_id = %s AND embeddings IS NOT NULL
+                ORDER BY {distance_sql("%s", precision=precision)}
+                LIMIT %s
+            ) candidates
+            ORDER BY {distance_sql("%s")}
+            LIMIT %s
+        """
+
+    def _params(self, collection_id, query, k, precision, rerank_factor) -> list:
+        if precision == "full" or not rerank_factor:
+            return [collection_id, query, k]
+        return [collection_id, query, k * rerank_factor, query, k]
+
+    def _search(
+        self, cursor, query, collection_id, k, statements, precision="full", rerank=0
+    ) -> tuple:
+        with transaction.atomic():
+            for statement in statements:
+                cursor.execute(statement)
+            started = time.perf_counter()
+            cursor.execute(
+                self._sql(precision, rerank),
+                self._params(collection_id, query, k, precision, rerank),
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+            return ids, (time.perf_counter() - started) * 1000
+
+    def _measure(self, cursor, queries, truth, collection_id, k, statements, **kwargs):
+        recalls, latencies = [], []
+        for query, expected in zip(queries, truth):
+            ids, elapsed = self._search(
+                cursor, query, collection_id, k, statements, **kwargs
+            )
+            recalls.append(len(set(ids) & set(expected)) / max(len(expected), 1))
+            latencies.append(elapsed)
+        latencies.sort()
+        return (
+            statistics.mean(recalls),
+            latencies[len(latencies) // 2],
+            latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        )
+
+    def handle(self, *args, **options):
+        collection = WorkspaceCollection.objects.get(name=options["collection_name"])
+        k = options["k"]
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT embeddings::text FROM {DOCUMENT_TABLE}
+                WHERE collection_id = %s AND embeddings IS NOT NULL
+                ORDER BY random() LIMIT %s
+                """,
+                [collection.id, options["queries"]],
+            )
+            queries = [row[0] for row in cursor.fetchall()]
+            if not queries:
+                self.stdout.write("Collection has no embedded documents.")
+                return
+
+            exact = ["SET LOCAL enable_indexscan = off"]
+            truth, latencies = [], []
+            for query in queries:
+                ids, elapsed = self._search(cursor, query, collection.id, k, exact)
+                truth.append(ids)
+                latencies.append(elapsed)
+            latencies.sort()
+
+            cursor.execute(
+                "SELECT pg_size_pretty(pg_total_relation_size(%s))", [DOCUMENT_TABLE]
+            )
+            self.stdout.write(f"{DOCUMENT_TABLE} (total): {cursor.fetchone()[0]}")
+            cursor.execute(
+                "SELECT indexrelname, pg_size_pretty(pg_relation_size(indexrelid)) "
+                "FROM pg_stat_user_indexes WHERE indexrelname = ANY(%s)",
+                [
+                    name
+                    for names in PRECISION_INDEX_NAMES.values()
+                    for name in names.values()
+                ],
+            )
+            for index_name, size in cursor.fetchall():
+                self.stdout.write(f"{index_name}: {size}")
+
+            self.stdout.write(
+                f"{'setting':<32}{'recall@' + str(k):>12}{'p50 ms':>10}{'p95 ms':>10}"
+            )
+            self.stdout.write(
+                f"{'exact':<32}{1.0:>12.3f}"
+                f"{latencies[len(latencies) // 2]:>10.2f}"
+                f"{latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]:>10.2f}"
+            )
+            settings_to_try = [
+                (f"ef_search={value}", tuning_statements(ef_search=value), {})
+                for value in options["ef_search"]
+            ] + [
+                (f"probes={value}", tuning_statements(probes=value), {})
+                for value in options["probes"]
+            ]
+            if options["half"]:
+                for rerank in options["rerank_factors"]:
+                    for value in options["ef_search"]:
+                        settings_to_try.append(
+                            (
+                                f"half ef_search={value} rerank={rerank}",
+                                tuning_statements(
+                                    ef_search=max(value, k * max(rerank, 1))
+                                ),
+                                {"precision": "half", "rerank": rerank},
+                            )
+                        )
+            if options["binary"]:
+                for overfetch in options["overfetch"]:
+                    settings_to_try.append(
+                        (
+                            f"binary overfetch={overfetch}",
+                            tuning_statements(ef_search=max(40, k * overfetch)),
+                            {"precision": "binary", "rerank": overfetch},
+                        )
+                    )
+            for label, statements, kwargs in settings_to_try:
+                recall, p50, p95 = self._measure(
+                    cursor, queries, truth, collection.id, k, statements, **kwargs
+                )
+                self.stdout.write(f"{label:<32}{recall:>12.3f}{p50:>10.2f}{p95:>10.2f}")
@@ -0,0 +1,51 @@
+# Generated by Django 5.1 on 2026-10-17 09:12
+
+import django.utils.timezone
+import pgvector.django
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("knowledge_base", "0009_remove_workspacecollection_workspace_id_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EmbeddingCacheEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("content_hash", models.CharField(max_length=64)),
+                ("model", models.CharField(max_length=255)),
+                ("embeddings", pgvector.django.VectorField()),
+                ("hits", models.PositiveBigIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "last_used_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["last_used_at"], name="idx_emb_cache_last_used"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("content_hash", "model"),
+                        name="uniq_emb_cache_hash_model",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1 on 2026-10-17 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("knowledge_base", "0010_embeddingcacheentry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="workspacecollectiondocument",
+            name="embedding_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("ready", "Ready"),
+                    ("failed", "Failed"),
+                ],
+                default="ready",
+                max_length=16,
+            ),
+        ),
+        migrations.AddField(
+            model_name="workspacecollectiondocument",
+            name="embedding_attempts",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="workspacecollectiondocument",
+            name="embedding_error",
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="workspacecollectiondocument",
+            name="embedding_retry_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="workspacecollectiondocument",
+            index=models.Index(
+                condition=models.Q(("embedding_status", "ready"), _negated=True),
+                fields=["embedding_retry_at"],
+                name="idx_ws_coll_doc_embed_queue",
+            ),
+        ),
+    ]
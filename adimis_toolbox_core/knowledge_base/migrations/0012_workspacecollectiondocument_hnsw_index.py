@@ -0,0 +1,39 @@
+# Generated by Django 5.1 on 2026-10-17 10:05
+
+from django.conf import settings
+from django.db import migrations
+
+INDEX_NAME = "idx_ws_coll_doc_embed_hnsw"
+TABLE = "knowledge_base_workspacecollectiondocument"
+
+# pgvector cannot index more than 2000 dimensions with HNSW/IVFFlat; larger
+# models are handled by the build_vector_index command (e.g. on halfvec).
+MAX_INDEXABLE_DIMENSIONS = 2000
+
+
+def create_hnsw_index(apps, schema_editor):
+    dimensions = getattr(settings, "VECTOR_DB_EMBEDDING_DIMENSIONS", 1536)
+    if dimensions > MAX_INDEXABLE_DIMENSIONS:
+        return
+    schema_editor.execute(
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} ON {TABLE} "
+        f"USING hnsw ((embeddings::vector({dimensions})) vector_l2_ops) "
+        "WITH (m = 16, ef_construction = 64)"
+    )
+
+
+def drop_hnsw_index(apps, schema_editor):
+    schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("knowledge_base", "0011_workspacecollectiondocument_embedding_status"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_hnsw_index, drop_hnsw_index),
+    ]
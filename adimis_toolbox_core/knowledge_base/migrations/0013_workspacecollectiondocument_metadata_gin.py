@@ -0,0 +1,23 @@
+# Generated by Django 5.1 on 2026-10-17 11:20
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("knowledge_base", "0012_workspacecollectiondocument_hnsw_index"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="workspacecollectiondocument",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["metadata"], name="idx_ws_coll_doc_metadata"
+            ),
+        ),
+    ]
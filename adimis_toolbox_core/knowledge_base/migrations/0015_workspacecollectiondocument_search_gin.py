@@ -0,0 +1,23 @@
+# Generated by Django 5.1 on 2026-10-17 11:56
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("knowledge_base", "0014_workspacecollectiondocument_search_vector"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="workspacecollectiondocument",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="idx_ws_coll_doc_search"
+            ),
+        ),
+    ]
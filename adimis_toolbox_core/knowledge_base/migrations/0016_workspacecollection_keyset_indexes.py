@@ -0,0 +1,29 @@
+# Generated by Django 5.1 on 2026-10-17 12:40
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("knowledge_base", "0015_workspacecollectiondocument_search_gin"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="workspacecollection",
+            index=models.Index(
+                fields=["updated_at", "id"], name="idx_ws_coll_keyset"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="workspacecollectiondocument",
+            index=models.Index(
+                fields=["collection", "updated_at", "id"],
+                name="idx_ws_coll_doc_keyset",
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1 on 2026-10-17 13:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("knowledge_base", "0016_workspacecollection_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="workspacecollectiondocument",
+            name="content_hash",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.RunSQL(
+            sql=(
+                "UPDATE knowledge_base_workspacecollectiondocument "
+                "SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex') "
+                "WHERE content_hash IS NULL"
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
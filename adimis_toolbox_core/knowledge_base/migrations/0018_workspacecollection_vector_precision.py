@@ -0,0 +1,27 @@
+# Generated by Django 5.1 on 2026-10-17 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("knowledge_base", "0017_workspacecollectiondocument_content_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="workspacecollection",
+            name="vector_precision",
+            field=models.CharField(
+                choices=[("full", "Full (vector)"), ("half", "Half (halfvec)")],
+                default="full",
+                max_length=8,
+            ),
+        ),
+        migrations.AddField(
+            model_name="workspacecollection",
+            name="rerank_factor",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.1 on 2026-10-17 15:05
+
+import uuid
+import django.db.models.deletion
+import pgvector.django
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("knowledge_base", "0018_workspacecollection_vector_precision"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="workspacecollection",
+            name="chunk_method",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name="workspacecollection",
+            name="chunk_options",
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name="WorkspaceCollectionDocumentChunk",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("position", models.PositiveIntegerField()),
+                ("content", models.TextField()),
+                (
+                    "embeddings",
+                    pgvector.django.VectorField(blank=True, null=True),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "collection",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="workspace_collection_chunks",
+                        to="knowledge_base.workspacecollection",
+                    ),
+                ),
+                (
+                    "document",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="chunks",
+                        to="knowledge_base.workspacecollectiondocument",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["document", "position"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("document", "position"),
+                        name="uniq_ws_coll_chunk_position",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,148 @@
+# Generated by Django 5.1 on 2026-10-17 16:20
+
+import uuid
+import django.db.models.deletion
+import pgvector.django
+from django.db import migrations, models
+import adimis_toolbox_core.knowledge_base.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("knowledge_base", "0019_workspacecollectiondocumentchunk"),
+    ]
+
+    operations = [
+        # Existing collections get the model configured today, which is the
+        # one their stored vectors came from.
+        migrations.AddField(
+            model_name="workspacecollection",
+            name="embedding_model",
+            field=models.CharField(
+                default=adimis_toolbox_core.knowledge_base.models.default_embedding_model,
+                max_length=255,
+            ),
+        ),
+        migrations.AddField(
+            model_name="workspacecollectiondocument",
+            name="embedding_model",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name="workspacecollectiondocument",
+            name="embedding_dimensions",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="workspacecollectiondocument",
+            name="staged_embeddings",
+            field=pgvector.django.VectorField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="workspacecollectiondocument",
+            name="staged_embedding_model",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name="workspacecollectiondocumentchunk",
+            name="embedding_model",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name="workspacecollectiondocumentchunk",
+            name="staged_embeddings",
+            field=pgvector.django.VectorField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="workspacecollectiondocumentchunk",
+            name="staged_embedding_model",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.RunSQL(
+            sql=[
+                "UPDATE knowledge_base_workspacecollectiondocument d "
+                "SET embedding_model = c.embedding_model, "
+                "embedding_dimensions = vector_dims(d.embeddings) "
+                "FROM knowledge_base_workspacecollection c "
+                "WHERE c.id = d.collection_id AND d.embeddings IS NOT NULL",
+                "UPDATE knowledge_base_workspacecollectiondocumentchunk ch "
+                "SET embedding_model = c.embedding_model "
+                "FROM knowledge_base_workspacecollection c "
+                "WHERE c.id = ch.collection_id AND ch.embeddings IS NOT NULL",
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.CreateModel(
+            name="ReembeddingJob",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("target_model", models.CharField(max_length=255)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("completed", "Completed"),
+                            ("failed", "Failed"),
+                            ("cancelled", "Cancelled"),
+                        ],
+                        default="pending",
+                        max_length=16,
+                    ),
+                ),
+                (
+                    "phase",
+                    models.CharField(
+                        choices=[
+                            ("documents", "Documents"),
+                            ("chunks", "Chunks"),
+                            ("swap", "Swap"),
+                        ],
+                        default="documents",
+                        max_length=16,
+                    ),
+                ),
+                ("last_id", models.UUIDField(blank=True, null=True)),
+                ("batch_size", models.PositiveIntegerField(blank=True, null=True)),
+                (
+                    "requests_per_minute",
+                    models.PositiveIntegerField(blank=True, null=True),
+                ),
+                ("total", models.PositiveBigIntegerField(default=0)),
+                ("processed", models.PositiveBigIntegerField(default=0)),
+                ("error", models.TextField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "collection",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reembedding_jobs",
+                        to="knowledge_base.workspacecollection",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(status__in=["pending", "running"]),
+                        fields=("collection",),
+                        name="uniq_reembed_active_job",
+                    )
+                ],
+            },
+        ),
+    ]
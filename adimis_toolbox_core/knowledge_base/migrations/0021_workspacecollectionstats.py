@@ -0,0 +1,161 @@
+# Generated by Django 5.1 on 2026-10-17 17:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+TABLE = "knowledge_base_workspacecollectiondocument"
+STATS_TABLE = "knowledge_base_workspacecollectionstats"
+FUNCTION = "knowledge_base_collection_stats"
+
+# One function behind three statement-level triggers: each statement folds
+# its transition table into the totals with a single grouped UPDATE/upsert,
+# however many rows it touched. Deletes only update, so the cascade of a
+# collection delete never re-creates the row it is removing. Stats rows are
+# locked in collection_id order on every path, so statements touching the
+# same collections queue up instead of deadlocking, and updates that change
+# no totals (title or metadata edits) do not write the stats row at all.
+CREATE_TRIGGERS = f"""
+CREATE OR REPLACE FUNCTION {FUNCTION}() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM 1
+        FROM {STATS_TABLE}
+        WHERE collection_id IN (SELECT collection_id FROM old_rows)
+        ORDER BY collection_id
+        FOR UPDATE;
+
+        UPDATE {STATS_TABLE} AS s
+        SET document_count = s.document_count - d.documents,
+            content_bytes = s.content_bytes - d.bytes,
+            embedded_count = s.embedded_count - d.embedded,
+            updated_at = now()
+        FROM (
+            SELECT collection_id,
+                   count(*) AS documents,
+                   coalesce(sum(octet_length(content)), 0) AS bytes,
+                   count(embeddings) AS embedded
+            FROM old_rows
+            GROUP BY collection_id
+        ) AS d
+        WHERE s.collection_id = d.collection_id;
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO {STATS_TABLE} AS s
+            (collection_id, document_count, content_bytes, embedded_count, updated_at)
+        SELECT collection_id,
+               count(*),
+               coalesce(sum(octet_length(content)), 0),
+               count(embeddings),
+               now()
+        FROM new_rows
+        GROUP BY collection_id
+        ORDER BY collection_id
+        ON CONFLICT (collection_id) DO UPDATE
+        SET document_count = s.document_count + EXCLUDED.document_count,
+            content_bytes = s.content_bytes + EXCLUDED.content_bytes,
+            embedded_count = s.embedded_count + EXCLUDED.embedded_count,
+            updated_at = EXCLUDED.updated_at;
+        RETURN NULL;
+    END IF;
+
+    -- UPDATE: add the new rows and subtract the old ones, which also covers
+    -- documents moved between collections.
+    INSERT INTO {STATS_TABLE} AS s
+        (collection_id, document_count, content_bytes, embedded_count, updated_at)
+    SELECT collection_id, sum(documents), sum(bytes), sum(embedded), now()
+    FROM (
+        SELECT collection_id,
+               1 AS documents,
+               coalesce(octet_length(content), 0) AS bytes,
+               (embeddings IS NOT NULL)::int AS embedded
+        FROM new_rows
+        UNION ALL
+        SELECT collection_id,
+               -1,
+               -coalesce(octet_length(content), 0),
+               -(embeddings IS NOT NULL)::int
+        FROM old_rows
+    ) AS d
+    GROUP BY collection_id
+    HAVING sum(documents) <> 0 OR sum(bytes) <> 0 OR sum(embedded) <> 0
+    ORDER BY collection_id
+    ON CONFLICT (collection_id) DO UPDATE
+    SET document_count = s.document_count + EXCLUDED.document_count,
+        content_bytes = s.content_bytes + EXCLUDED.content_bytes,
+        embedded_count = s.embedded_count + EXCLUDED.embedded_count,
+        updated_at = EXCLUDED.updated_at;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER kb_doc_stats_insert AFTER INSERT ON {TABLE}
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION {FUNCTION}();
+CREATE TRIGGER kb_doc_stats_update AFTER UPDATE ON {TABLE}
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION {FUNCTION}();
+CREATE TRIGGER kb_doc_stats_delete AFTER DELETE ON {TABLE}
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION {FUNCTION}();
+"""
+
+DROP_TRIGGERS = f"""
+DROP TRIGGER IF EXISTS kb_doc_stats_insert ON {TABLE};
+DROP TRIGGER IF EXISTS kb_doc_stats_update ON {TABLE};
+DROP TRIGGER IF EXISTS kb_doc_stats_delete ON {TABLE};
+DROP FUNCTION IF EXISTS {FUNCTION}();
+"""
+
+BACKFILL = f"""
+INSERT INTO {STATS_TABLE}
+    (collection_id, document_count, content_bytes, embedded_count, updated_at)
+SELECT c.id,
+       count(d.id),
+       coalesce(sum(octet_length(d.content)), 0),
+       count(d.embeddings),
+       now()
+FROM knowledge_base_workspacecollection AS c
+LEFT JOIN {TABLE} AS d ON d.collection_id = c.id
+GROUP BY c.id
+ON CONFLICT (collection_id) DO NOTHING
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("knowledge_base", "0020_embedding_model_versioning"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WorkspaceCollectionStats",
+            fields=[
+                (
+                    "collection",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="knowledge_base.workspacecollection",
+                    ),
+                ),
+                ("document_count", models.BigIntegerField(default=0)),
+                ("content_bytes", models.BigIntegerField(default=0)),
+                ("embedded_count", models.BigIntegerField(default=0)),
+                (
+                    "updated_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+            ],
+        ),
+        # Same transaction: creating the triggers locks the document table
+        # against writes until commit, so the backfill counts a stable table.
+        migrations.RunSQL(sql=CREATE_TRIGGERS, reverse_sql=DROP_TRIGGERS),
+        migrations.RunSQL(sql=BACKFILL, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1 on 2026-10-17 18:10
+
+from django.db import migrations
+
+TASK = "adimis_toolbox_core.knowledge_base.tasks.embed_pending_documents"
+NAME = "knowledge_base: embed pending documents"
+
+# Failed documents wait for their backoff; this sweep picks them up (and any
+# pending ones whose task was lost) even when no write schedules the queue.
+SWEEP_SECONDS = 60
+
+
+def create_sweep(apps, schema_editor):
+    IntervalSchedule = apps.get_model("django_celery_beat", "IntervalSchedule")
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+    schedule, _ = IntervalSchedule.objects.get_or_create(
+        every=SWEEP_SECONDS, period="seconds"
+    )
+    PeriodicTask.objects.update_or_create(
+        name=NAME, defaults={"task": TASK, "interval": schedule, "enabled": True}
+    )
+
+
+def delete_sweep(apps, schema_editor):
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+    PeriodicTask.objects.filter(name=NAME).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("knowledge_base", "0021_workspacecollectionstats"),
+        ("django_celery_beat", "__latest__"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_sweep, delete_sweep),
+    ]
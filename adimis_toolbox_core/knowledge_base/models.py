@@ -1,20 +1,52 @@
 import uuid
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from pgvector.django import VectorField
-from langchain_openai import OpenAIEmbeddings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.contrib.auth import get_user_model
 from django.utils.text import slugify
+from .conf import kb_setting
+from .embeddings import content_hash as compute_content_hash, get_embeddings_service
+from .vector_sql import TEXT_SEARCH_CONFIG
 
 User = get_user_model()
 
 
+class VectorPrecision(models.TextChoices):
+    FULL = "full", "Full (vector)"
+    HALF = "half", "Half (halfvec)"
+
+
+def default_embedding_model() -> str:
+    return settings.VECTOR_DB_EMBEDDING_MODEL
+
+
 class WorkspaceCollection(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(
         max_length=255, unique=True, null=False, blank=False, db_index=True
     )
     description = models.TextField(blank=True, null=True)
+    # Precision of the ANN index searched for this collection. Stored vectors
+    # stay full precision so "half" results can be reranked exactly.
+    vector_precision = models.CharField(
+        max_length=8,
+        choices=VectorPrecision.choices,
+        default=VectorPrecision.FULL,
+    )
+    # Half-precision searches fetch top_k * rerank_factor candidates and
+    # reorder them by full-precision distance; 0 disables the rerank, None
+    # uses VECTOR_DB_HALF_RERANK_FACTOR.
+    rerank_factor = models.PositiveSmallIntegerField(null=True, blank=True)
+    # core.loaders_splitters.splitters.split_document method (and its options,
+    # minus the text) used to chunk documents; None uses VECTOR_DB_CHUNK_METHOD.
+    chunk_method = models.CharField(max_length=64, null=True, blank=True)
+    chunk_options = models.JSONField(null=True, blank=True)
+    # Model whose vectors the collection is searched with. Changing it goes
+    # through a ReembeddingJob, never by editing this field directly.
+    embedding_model = models.CharField(max_length=255, default=default_embedding_model)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(
@@ -34,6 +66,9 @@ class WorkspaceCollection(models.Model):
 
     class Meta:
         ordering = ["name"]
+        indexes = [
+            models.Index(fields=["updated_at", "id"], name="idx_ws_coll_keyset"),
+        ]
 
     def save(self, *args, **kwargs):
         self.name = slugify(self.name)
@@ -43,6 +78,12 @@ class WorkspaceCollection(models.Model):
         return self.name
 
 
+class EmbeddingStatus(models.TextChoices):
+    PENDING = "pending", "Pending"
+    READY = "ready", "Ready"
+    FAILED = "failed", "Failed"
+
+
 class WorkspaceCollectionDocument(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     collection = models.ForeignKey(
@@ -52,9 +93,32 @@ class WorkspaceCollectionDocument(models.Model):
     )
     title = models.CharField(max_length=255)
     content = models.TextField()
+    # sha256 of ``content`` the stored embedding was computed from.
+    content_hash = models.CharField(max_length=64, null=True, blank=True)
     metadata = models.JSONField(null=True, blank=True)
     embeddings = VectorField(null=True, blank=True)
+    # Model and dimension that produced ``embeddings``.
+    embedding_model = models.CharField(max_length=255, null=True, blank=True)
+    embedding_dimensions = models.PositiveIntegerField(null=True, blank=True)
+    # Vectors of the model a running ReembeddingJob migrates to; swapped into
+    # ``embeddings`` when the job completes. Cleared when the content changes.
+    staged_embeddings = VectorField(null=True, blank=True)
+    staged_embedding_model = models.CharField(max_length=255, null=True, blank=True)
+    embedding_status = models.CharField(
+        max_length=16,
+        choices=EmbeddingStatus.choices,
+        default=EmbeddingStatus.READY,
+    )
+    embedding_attempts = models.PositiveSmallIntegerField(default=0)
+    embedding_error = models.TextField(null=True, blank=True)
+    embedding_retry_at = models.DateTimeField(null=True, blank=True)
     uri = models.URLField(null=True, blank=True)
+    search_vector = models.GeneratedField(
+        expression=SearchVector("title", weight="A", config=TEXT_SEARCH_CONFIG)
+        + SearchVector("content", weight="B", config=TEXT_SEARCH_CONFIG),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(
@@ -74,20 +138,56 @@ class WorkspaceCollectionDocument(models.Model):
 
     class Meta:
         ordering = ["title"]
+        indexes = [
+            models.Index(
+                fields=["embedding_retry_at"],
+                condition=~models.Q(embedding_status=EmbeddingStatus.READY),
+                name="idx_ws_coll_doc_embed_queue",
+            ),
+            GinIndex(fields=["metadata"], name="idx_ws_coll_doc_metadata"),
+            GinIndex(fields=["search_vector"], name="idx_ws_coll_doc_search"),
+            models.Index(
+                fields=["collection", "updated_at", "id"],
+                name="idx_ws_coll_doc_keyset",
+            ),
+        ]
 
-    def save(self, *args, **kwargs):
+    def set_embeddings(self, vector, model: str) -> None:
+        self.embeddings = vector
+        self.embedding_model = model
+        self.embedding_dimensions = len(vector)
+        self.staged_embeddings = None
+        self.staged_embedding_model = None
+
+    def mark_embedding_pending(self):
+        self.embeddings = None
+        self.embedding_model = None
+        self.embedding_dimensions = None
+        self.staged_embeddings = None
+        self.staged_embedding_model = None
+        self.embedding_status = EmbeddingStatus.PENDING
+        self.embedding_attempts = 0
+        self.embedding_error = None
+        self.embedding_retry_at = timezone.now()
+
+    def save(self, *args, defer_embedding=None, **kwargs):
+        if defer_embedding is None:
+            defer_embedding = kb_setting("VECTOR_DB_DEFER_EMBEDDINGS")
         self.title = slugify(self.title)
-        if self._state.adding or "content" in self.get_dirty_fields(
-            check_relationship=True
-        ):
+        digest = compute_content_hash(self.content)
+        if self._state.adding or digest != self.content_hash:
+            self.content_hash = digest
+            if defer_embedding:
+                self.mark_embedding_pending()
+                return super(WorkspaceCollectionDocument, self).save(*args, **kwargs)
             try:
-                embeddings_service = OpenAIEmbeddings(
-                    model=settings.VECTOR_DB_EMBEDDING_MODEL,
-                    api_key=settings.OPENAI_API_KEY,
+                model = self.collection.embedding_model
+                embeddings = get_embeddings_service(model).embed_documents(
+                    [self.content]
                 )
-                embeddings = embeddings_service.embed_documents([self.content])
                 if embeddings and len(embeddings) == 1:
-                    self.embeddings = embeddings[0]
+                    self.set_embeddings(embeddings[0], model)
+                    self.embedding_status = EmbeddingStatus.READY
                 else:
                     raise ValueError(
                         "Failed to generate embeddings or returned incorrect format."
@@ -99,3 +199,158 @@ class WorkspaceCollectionDocument(models.Model):
 
     def __str__(self):
         return self.title
+
+
+class WorkspaceCollectionDocumentChunk(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    document = models.ForeignKey(
+        WorkspaceCollectionDocument,
+        related_name="chunks",
+        on_delete=models.CASCADE,
+    )
+    # Denormalised from the document so chunk searches filter without a join.
+    collection = models.ForeignKey(
+        WorkspaceCollection,
+        related_name="workspace_collection_chunks",
+        on_delete=models.CASCADE,
+    )
+    position = models.PositiveIntegerField()
+    content = models.TextField()
+    embeddings = VectorField(null=True, blank=True)
+    embedding_model = models.CharField(max_length=255, null=True, blank=True)
+    staged_embeddings = VectorField(null=True, blank=True)
+    staged_embedding_model = models.CharField(max_length=255, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["document", "position"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["document", "position"], name="uniq_ws_coll_chunk_position"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.document_id}#{self.position}"
+
+
+class WorkspaceCollectionStats(models.Model):
+    """Running totals over a collection's documents.
+
+    Kept up to date by statement-level triggers on the document table (see
+    migration 0021), so every write path, COPY ingest included, is counted
+    in the same transaction as the rows it changed. ``reconcile_collection_stats``
+    recomputes them should they drift (e.g. after a TRUNCATE).
+    """
+
+    collection = models.OneToOneField(
+        WorkspaceCollection,
+        primary_key=True,
+        related_name="stats",
+        on_delete=models.CASCADE,
+    )
+    document_count = models.BigIntegerField(default=0)
+    # octet_length(content), i.e. UTF-8 bytes rather than characters.
+    content_bytes = models.BigIntegerField(default=0)
+    embedded_count = models.BigIntegerField(default=0)
+    # Written by the triggers, hence not auto_now.
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    @property
+    def pending_count(self) -> int:
+        return self.document_count - self.embedded_count
+
+    def __str__(self):
+        return f"{self.collection_id}: {self.document_count} documents"
+
+
+class ReembeddingStatus(models.TextChoices):
+    PENDING = "pending", "Pending"
+    RUNNING = "running", "Running"
+    COMPLETED = "completed", "Completed"
+    FAILED = "failed", "Failed"
+    CANCELLED = "cancelled", "Cancelled"
+
+
+class ReembeddingPhase(models.TextChoices):
+    DOCUMENTS = "documents", "Documents"
+    CHUNKS = "chunks", "Chunks"
+    SWAP = "swap", "Swap"
+
+
+class ReembeddingJob(models.Model):
+    """Moves a collection to another embedding model without downtime.
+
+    New vectors are written to the staging columns of documents and chunks,
+    walking each table in id order from ``last_id`` so an interrupted job
+    resumes where it stopped. Searches keep using the active model until the
+    final swap, which moves every staged vector into place in one transaction.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    collection = models.ForeignKey(
+        WorkspaceCollection,
+        related_name="reembedding_jobs",
+        on_delete=models.CASCADE,
+    )
+    target_model = models.CharField(max_length=255)
+    status = models.CharField(
+        max_length=16,
+        choices=ReembeddingStatus.choices,
+        default=ReembeddingStatus.PENDING,
+    )
+    phase = models.CharField(
+        max_length=16,
+        choices=ReembeddingPhase.choices,
+        default=ReembeddingPhase.DOCUMENTS,
+    )
+    last_id = models.UUIDField(null=True, blank=True)
+    batch_size = models.PositiveIntegerField(null=True, blank=True)
+    # Embedding requests per minute; None sends them back to back.
+    requests_per_minute = models.PositiveIntegerField(null=True, blank=True)
+    total = models.PositiveBigIntegerField(default=0)
+    processed = models.PositiveBigIntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["collection"],
+                condition=models.Q(status__in=["pending", "running"]),
+                name="uniq_reembed_active_job",
+            ),
+        ]
+
+    @property
+    def progress(self) -> float:
+        return self.processed / self.total if self.total else 0.0
+
+    def __str__(self):
+        return f"{self.collection_id} -> {self.target_model} ({self.status})"
+
+
+class EmbeddingCacheEntry(models.Model):
+    content_hash = models.CharField(max_length=64)
+    model = models.CharField(max_length=255)
+    embeddings = VectorField()
+    hits = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["content_hash", "model"], name="uniq_emb_cache_hash_model"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["last_used_at"], name="idx_emb_cache_last_used"),
+        ]
+
+    def __str__(self):
+        return f"{self.model}:{self.content_hash}"
@@ -0,0 +1,155 @@
+import time
+import asyncio
+import asyncpg
+import weakref
+from typing import Dict, List
+from django.conf import settings
+from contextlib import asynccontextmanager
+from .conf import kb_setting
+
+
+class ManagedPool:
+    """An asyncpg pool plus the counters needed to monitor it.
+
+    ``acquire()`` has the same shape as ``asyncpg.Pool.acquire()`` so callers
+    can use either interchangeably.
+    """
+
+    def __init__(self, pool: asyncpg.Pool) -> None:
+        self.pool = pool
+        self.in_use = 0
+        self.waiting = 0
+        self.acquires = 0
+        self.acquire_seconds_total = 0.0
+        self.acquire_seconds_max = 0.0
+
+    @asynccontextmanager
+    async def acquire(self):
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            conn = await self.pool.acquire()
+        finally:
+            self.waiting -= 1
+        elapsed = time.perf_counter() - started
+        self.acquires += 1
+        self.acquire_seconds_total += elapsed
+        self.acquire_seconds_max = max(self.acquire_seconds_max, elapsed)
+
+        self.in_use += 1
+        try:
+            yield conn
+        finally:
+            self.in_use -= 1
+            await self.pool.release(conn)
+
+    async def check(self) -> bool:
+        try:
+            async with self.acquire() as conn:
+                return await conn.fetchval("SELECT 1") == 1
+        except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+            return False
+
+    async def close(self) -> None:
+        try:
+            await asyncio.wait_for(
+                self.pool.close(), timeout=kb_setting("VECTOR_DB_POOL_CLOSE_TIMEOUT")
+            )
+        except asyncio.TimeoutError:
+            self.pool.terminate()
+
+    def is_closing(self) -> bool:
+        return self.pool.is_closing()
+
+    def stats(self) -> dict:
+        return {
+            "size": self.pool.get_size(),
+            "idle": self.pool.get_idle_size(),
+            "min_size": self.pool.get_min_size(),
+            "max_size": self.pool.get_max_size(),
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "acquires": self.acquires,
+            "acquire_ms_avg": (
+                self.acquire_seconds_total / self.acquires * 1000
+                if self.acquires
+                else 0.0
+            ),
+            "acquire_ms_max": self.acquire_seconds_max * 1000,
+        }
+
+
+# asyncpg connections are bound to the loop that created them, so there is one
+# pool per running event loop rather than one per process.
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, ManagedPool]" = (
+    weakref.WeakKeyDictionary()
+)
+_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _connect_options() -> dict:
+    database = settings.DATABASES["default"]
+    return {
+        "user": database.get("USER"),
+        "password": database.get("PASSWORD"),
+        "host": database.get("HOST") or None,
+        "port": database.get("PORT") or None,
+        "database": database.get("NAME"),
+    }
+
+
+async def _create_pool() -> ManagedPool:
+    pool = await asyncpg.create_pool(
+        **_connect_options(),
+        min_size=kb_setting("VECTOR_DB_POOL_MIN_SIZE"),
+        max_size=kb_setting("VECTOR_DB_POOL_MAX_SIZE"),
+        max_inactive_connection_lifetime=kb_setting(
+            "VECTOR_DB_POOL_MAX_INACTIVE_LIFETIME"
+        ),
+        command_timeout=kb_setting("VECTOR_DB_POOL_COMMAND_TIMEOUT"),
+        statement_cache_size=0,
+    )
+    return ManagedPool(pool)
+
+
+async def get_pool() -> ManagedPool:
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is not None and not pool.is_closing():
+        return pool
+
+    lock = _locks.setdefault(loop, asyncio.Lock())
+    async with lock:
+        pool = _pools.get(loop)
+        if pool is None or pool.is_closing():
+            pool = _pools[loop] = await _create_pool()
+    return pool
+
+
+async def close_pool() -> None:
+    """Closes the pool owned by the running event loop, if any."""
+    pool = _pools.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        await pool.close()
+
+
+def pool_stats() -> List[Dict]:
+    return [pool.stats() for pool in list(_pools.values())]
+
+
+async def check_database(timeout: float = 5.0) -> bool:
+    """``SELECT 1`` over one short-lived connection, closed afterwards. Unlike
+    ``ManagedPool.check`` it never creates a pool, so it is safe to call from
+    a throwaway event loop (e.g. ``async_to_sync`` under WSGI)."""
+    try:
+        conn = await asyncpg.connect(**_connect_options(), timeout=timeout)
+    except (OSError, asyncio.TimeoutError, asyncpg.PostgresError):
+        return False
+    try:
+        return await conn.fetchval("SELECT 1", timeout=timeout) == 1
+    except (OSError, asyncio.TimeoutError, asyncpg.PostgresError):
+        return False
+    finally:
+        await conn.close()
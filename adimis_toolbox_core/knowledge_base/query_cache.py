@@ -0,0 +1,250 @@
+import time
+import asyncio
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+from django.core.cache import caches
+from .conf import kb_setting
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", query).split())
+
+
+class QueryEmbeddingCache:
+    """Query embeddings keyed by ``(model, normalized query)``.
+
+    Lookups go to an in-process LRU first and then, when
+    ``VECTOR_DB_QUERY_CACHE_ALIAS`` names a Django cache (Redis, diskcache,
+    ...), to that shared cache. Concurrent async lookups of the same missing
+    key share a single embedding request.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, tuple[float, List[float]]]" = OrderedDict()
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def _ttl() -> int:
+        return kb_setting("VECTOR_DB_QUERY_CACHE_TTL")
+
+    @staticmethod
+    def _shared():
+        alias = kb_setting("VECTOR_DB_QUERY_CACHE_ALIAS")
+        return caches[alias] if alias else None
+
+    @staticmethod
+    def _shared_key(key: tuple) -> str:
+        model, query = key
+        return f"kb:query-embedding:{model}:{hashlib.sha256(query.encode()).hexdigest()}"
+
+    def _get_local(self, key: tuple) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, vector = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def _set_local(self, key: tuple, vector: List[float]) -> None:
+        max_entries = kb_setting("VECTOR_DB_QUERY_CACHE_MAX_ENTRIES")
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self._ttl(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def _count(self, counter: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + n)
+
+    def get(self, model: str, query: str, embed: Callable[[str], List[float]]):
+        key = (model, normalize_query(query))
+        vector = self._get_local(key)
+        if vector is not None:
+            return vector
+
+        shared = self._shared()
+        if shared is not None:
+            vector = shared.get(self._shared_key(key))
+            if vector is not None:
+                self._count("shared_hits")
+                self._set_local(key, vector)
+                return vector
+
+        self._count("misses")
+        vector = list(embed(query))
+        self._set_local(key, vector)
+        if shared is not None:
+            shared.set(self._shared_key(key), vector, timeout=self._ttl())
+        return vector
+
+    def _lookup_many(self, keys: List[tuple], queries: List[str]) -> tuple:
+        """Cached vectors of ``keys`` found locally, and the distinct missing
+        keys with their query texts, in order."""
+        found: Dict[tuple, List[float]] = {}
+        missing: Dict[tuple, str] = {}
+        for key, query in zip(keys, queries):
+            if key in found or key in missing:
+                continue
+            vector = self._get_local(key)
+            if vector is None:
+                missing[key] = query
+            else:
+                found[key] = vector
+        return found, missing
+
+    def _keep_shared_hits(self, found: dict, missing: dict, hits: dict) -> None:
+        for key in list(missing):
+            vector = hits.get(self._shared_key(key))
+            if vector is not None:
+                self._count("shared_hits")
+                self._set_local(key, vector)
+                found[key] = vector
+                del missing[key]
+
+    def _keep_embedded(self, missing: dict, vectors) -> Dict[tuple, List[float]]:
+        self._count("misses", len(missing))
+        embedded = {key: list(vector) for key, vector in zip(missing, vectors)}
+        for key, vector in embedded.items():
+            self._set_local(key, vector)
+        return embedded
+
+    def get_many(
+        self,
+        model: str,
+        queries: List[str],
+        embed_many: Callable[[List[str]], List[List[float]]],
+    ) -> List[List[float]]:
+        """Vectors of ``queries`` in order; the misses are embedded with a
+        single ``embed_many`` call."""
+        keys = [(model, normalize_query(query)) for query in queries]
+        shared = self._shared()
+        found, missing = self._lookup_many(keys, queries)
+        if missing and shared is not None:
+            hits = shared.get_many([self._shared_key(key) for key in missing])
+            self._keep_shared_hits(found, missing, hits)
+        if missing:
+            embedded = self._keep_embedded(missing, embed_many(list(missing.values())))
+            if shared is not None:
+                shared.set_many(
+                    {self._shared_key(key): v for key, v in embedded.items()},
+                    timeout=self._ttl(),
+                )
+            found.update(embedded)
+        return [found[key] for key in keys]
+
+    async def aget_many(
+        self,
+        model: str,
+        queries: List[str],
+        embed_many: Callable[[List[str]], Awaitable[List[List[float]]]],
+    ) -> List[List[float]]:
+        keys = [(model, normalize_query(query)) for query in queries]
+        shared = self._shared()
+        found, missing = self._lookup_many(keys, queries)
+        if missing and shared is not None:
+            hits = await shared.aget_many([self._shared_key(key) for key in missing])
+            self._keep_shared_hits(found, missing, hits)
+        if missing:
+            embedded = self._keep_embedded(
+                missing, await embed_many(list(missing.values()))
+            )
+            if shared is not None:
+                await shared.aset_many(
+                    {self._shared_key(key): v for key, v in embedded.items()},
+                    timeout=self._ttl(),
+                )
+            found.update(embedded)
+        return [found[key] for key in keys]
+
+    async def aget(
+        self, model: str, query: str, embed: Callable[[str], Awaitable[List[float]]]
+    ):
+        key = (model, normalize_query(query))
+        vector = self._get_local(key)
+        if vector is not None:
+            return vector
+
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        while (inflight := self._inflight.get(flight_key)) is not None:
+            self._count("coalesced")
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # The leader was cancelled, not this waiter: the first waiter
+                # to resume takes over the request, the others follow it.
+                if not inflight.cancelled() or asyncio.current_task().cancelling():
+                    raise
+            vector = self._get_local(key)
+            if vector is not None:
+                return vector
+
+        future = self._inflight[flight_key] = loop.create_future()
+        try:
+            vector = await self._afetch(key, query, embed)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; don't warn about an unread error.
+            future.exception()
+            raise
+        else:
+            future.set_result(vector)
+            return vector
+        finally:
+            del self._inflight[flight_key]
+
+    async def _afetch(self, key: tuple, query: str, embed) -> List[float]:
+        shared = self._shared()
+        if shared is not None:
+            vector = await shared.aget(self._shared_key(key))
+            if vector is not None:
+                self._count("shared_hits")
+                self._set_local(key, vector)
+                return vector
+
+        self._count("misses")
+        vector = list(await embed(query))
+        self._set_local(key, vector)
+        if shared is not None:
+            await shared.aset(self._shared_key(key), vector, timeout=self._ttl())
+        return vector
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.coalesced + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": (lookups - self.misses) / lookups if lookups else 0.0,
+            }
+
+
+query_embedding_cache = QueryEmbeddingCache()
+
+
+def embedding_model_name(embeddings) -> str:
+    return getattr(embeddings, "model", None) or type(embeddings).__name__
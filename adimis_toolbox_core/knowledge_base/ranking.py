@@ -0,0 +1,45 @@
+import numpy as np
+from typing import Sequence
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def maximal_marginal_relevance(
+    query_embedding: Sequence[float],
+    embeddings: Sequence[Sequence[float]],
+    k: int,
+    lambda_mult: float = 0.5,
+) -> list[int]:
+    """Indexes of the ``k`` rows of ``embeddings`` picked by maximal marginal
+    relevance, in selection order.
+
+    Each step picks the candidate maximising
+    ``lambda_mult * sim(query, c) - (1 - lambda_mult) * max(sim(c, selected))``
+    with cosine similarity: 1 favours relevance, 0 favours diversity. Pairwise
+    similarities come from a single matrix product, and the running maximum
+    similarity to the selected set is updated one row at a time.
+    """
+    if not 0 <= lambda_mult <= 1:
+        raise ValueError("lambda_mult must be between 0 and 1")
+    if k <= 0 or len(embeddings) == 0:
+        return []
+    matrix = _normalize(np.asarray(embeddings, dtype=np.float32))
+    query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+    relevance = matrix @ query
+    similarity = matrix @ matrix.T
+
+    selected = [int(np.argmax(relevance))]
+    redundancy = similarity[selected[0]].copy()
+    available = np.ones(len(matrix), dtype=bool)
+    available[selected[0]] = False
+    for _ in range(min(k, len(matrix)) - 1):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return selected
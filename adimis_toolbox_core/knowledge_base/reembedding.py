@@ -0,0 +1,290 @@
+import time
+from typing import Callable, Optional
+from django.db import IntegrityError, transaction
+from django.db.models import F, Func, IntegerField, Q
+from django.utils import timezone
+from .conf import kb_setting
+from .embeddings import get_embeddings_service, iter_embedding_batches
+from .models import (
+    EmbeddingStatus,
+    ReembeddingJob,
+    ReembeddingPhase,
+    ReembeddingStatus,
+    WorkspaceCollection,
+    WorkspaceCollectionDocument,
+    WorkspaceCollectionDocumentChunk,
+)
+from .result_cache import invalidate_collection
+
+# Catch-up rounds before the swap gives up waiting for writers to pause and
+# leaves the last stragglers to the embedding queue.
+SWAP_ATTEMPTS = 3
+
+PHASE_MODELS = {
+    ReembeddingPhase.DOCUMENTS: WorkspaceCollectionDocument,
+    ReembeddingPhase.CHUNKS: WorkspaceCollectionDocumentChunk,
+}
+
+
+class RateLimiter:
+    """Spaces calls at least ``60 / per_minute`` seconds apart."""
+
+    def __init__(self, per_minute: Optional[int]) -> None:
+        self.interval = 60 / per_minute if per_minute else 0.0
+        self.next_at = 0.0
+
+    def wait(self) -> None:
+        now = time.monotonic()
+        if now < self.next_at:
+            time.sleep(self.next_at - now)
+            now = self.next_at
+        self.next_at = now + self.interval
+
+
+def start_reembedding(
+    collection_id,
+    target_model: str,
+    batch_size: Optional[int] = None,
+    requests_per_minute: Optional[int] = None,
+) -> ReembeddingJob:
+    collection = WorkspaceCollection.objects.get(id=collection_id)
+    if collection.embedding_model == target_model:
+        raise ValueError(f"{collection.name} already uses {target_model}.")
+    total = (
+        WorkspaceCollectionDocument.objects.filter(
+            collection=collection, embeddings__isnull=False
+        ).count()
+        + WorkspaceCollectionDocumentChunk.objects.filter(
+            collection=collection, embeddings__isnull=False
+        ).count()
+    )
+    try:
+        return ReembeddingJob.objects.create(
+            collection=collection,
+            target_model=target_model,
+            batch_size=batch_size,
+            requests_per_minute=(
+                requests_per_minute
+                or kb_setting("VECTOR_DB_REEMBED_REQUESTS_PER_MINUTE")
+            ),
+            total=total,
+        )
+    except IntegrityError:
+        raise ValueError(f"{collection.name} already has a re-embedding job running.")
+
+
+def cancel_reembedding(job_id) -> None:
+    """Stops a job after its current batch. Staged vectors are left in place
+    and overwritten by the next job."""
+    ReembeddingJob.objects.filter(
+        id=job_id,
+        status__in=[ReembeddingStatus.PENDING, ReembeddingStatus.RUNNING],
+    ).update(status=ReembeddingStatus.CANCELLED, finished_at=timezone.now())
+
+
+def _stage(job: ReembeddingJob, model, rows: list, embeddings, limiter) -> None:
+    """Embeds ``rows`` with the target model into the staging columns. Rows
+    edited meanwhile are skipped; the final catch-up picks them up."""
+    dimensions = kb_setting("VECTOR_DB_EMBEDDING_DIMENSIONS")
+    vectors = {}
+    batches = iter_embedding_batches(
+        rows,
+        text=lambda row: row.content,
+        batch_size=job.batch_size,
+        model=getattr(embeddings, "model", None),
+    )
+    for batch, _ in batches:
+        limiter.wait()
+        for row, vector in zip(
+            batch, embeddings.embed_documents([row.content for row in batch])
+        ):
+            if len(vector) != dimensions:
+                raise ValueError(
+                    f"{job.target_model} returned {len(vector)} dimensions; the "
+                    f"ANN indexes are built for {dimensions} "
+                    "(VECTOR_DB_EMBEDDING_DIMENSIONS)."
+                )
+            vectors[row.id] = (row.content, vector)
+
+    with transaction.atomic():
+        current = model.objects.select_for_update().filter(id__in=list(vectors)).only(
+            "id", "content"
+        )
+        staged = []
+        for row in current:
+            content, vector = vectors[row.id]
+            if row.content == content:
+                row.staged_embeddings = vector
+                row.staged_embedding_model = job.target_model
+                staged.append(row)
+        model.objects.bulk_update(
+            staged, ["staged_embeddings", "staged_embedding_model"]
+        )
+
+
+def _stragglers(job: ReembeddingJob, model, limit: int) -> list:
+    """Embedded rows without a vector of the target model: written or edited
+    after the cursor passed them."""
+    return list(
+        model.objects.filter(collection_id=job.collection_id, embeddings__isnull=False)
+        .exclude(staged_embedding_model=job.target_model)
+        .only("id", "content")[:limit]
+    )
+
+
+def _reset_stale(collection: WorkspaceCollection, target_model: str) -> int:
+    """Marks pending the documents still embedded with another model once the
+    staged vectors are live, and drops their chunks.
+
+    A synchronous write that commits after the last catch-up clears its staged
+    vector and keeps the old model, so the swap UPDATE skips it; so do rows
+    still unstaged after the last catch-up. The embedding queue re-embeds these (and rebuilds their chunks) with the new model.
+    """
+    stale_chunks = (
+        WorkspaceCollectionDocumentChunk.objects.filter(collection=collection)
+        .exclude(embedding_model=target_model)
+        .values("document_id")
+    )
+    stale = list(
+        WorkspaceCollectionDocument.objects.filter(collection=collection)
+        .filter(
+            (Q(embeddings__isnull=False) & ~Q(embedding_model=target_model))
+            | Q(id__in=stale_chunks)
+        )
+        .values_list("id", flat=True)
+    )
+    if not stale:
+        return 0
+    WorkspaceCollectionDocumentChunk.objects.filter(document_id__in=stale).delete()
+    return WorkspaceCollectionDocument.objects.filter(id__in=stale).update(
+        embeddings=None,
+        embedding_model=None,
+        embedding_dimensions=None,
+        staged_embeddings=None,
+        staged_embedding_model=None,
+        embedding_status=EmbeddingStatus.PENDING,
+        embedding_attempts=0,
+        embedding_error=None,
+        embedding_retry_at=timezone.now(),
+    )
+
+
+def _catch_up(job: ReembeddingJob, embeddings, limiter, batch_size: int) -> None:
+    for model in PHASE_MODELS.values():
+        while rows := _stragglers(job, model, batch_size):
+            _stage(job, model, rows, embeddings, limiter)
+
+
+def _swap(job: ReembeddingJob, embeddings, limiter, batch_size: int) -> None:
+    # Stragglers are embedded with no lock held: document inserts wait on the
+    # collection row lock, so it is only held for the (local) swap itself.
+    for attempt in range(SWAP_ATTEMPTS):
+        _catch_up(job, embeddings, limiter, batch_size)
+        with transaction.atomic():
+            collection = WorkspaceCollection.objects.select_for_update().get(
+                id=job.collection_id
+            )
+            # Writers that slipped in after the catch-up: embed them unlocked
+            # and try again. On the last attempt, _reset_stale queues them.
+            if attempt < SWAP_ATTEMPTS - 1 and any(
+                _stragglers(job, model, 1) for model in PHASE_MODELS.values()
+            ):
+                continue
+            _swap_locked(job, collection)
+            return
+
+
+def _swap_locked(job: ReembeddingJob, collection: WorkspaceCollection) -> None:
+    """Moves the staged vectors live and switches the collection's model;
+    runs in the transaction holding the collection row lock."""
+    WorkspaceCollectionDocument.objects.filter(
+        collection=collection, staged_embedding_model=job.target_model
+    ).update(
+        embeddings=F("staged_embeddings"),
+        embedding_model=F("staged_embedding_model"),
+        embedding_dimensions=Func(
+            F("staged_embeddings"),
+            function="vector_dims",
+            output_field=IntegerField(),
+        ),
+        staged_embeddings=None,
+        staged_embedding_model=None,
+    )
+    WorkspaceCollectionDocumentChunk.objects.filter(
+        collection=collection, staged_embedding_model=job.target_model
+    ).update(
+        embeddings=F("staged_embeddings"),
+        embedding_model=F("staged_embedding_model"),
+        staged_embeddings=None,
+        staged_embedding_model=None,
+    )
+    _reset_stale(collection, job.target_model)
+    collection.embedding_model = job.target_model
+    collection.save(update_fields=["embedding_model"])
+    job.status = ReembeddingStatus.COMPLETED
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "finished_at", "updated_at"])
+    invalidate_collection(collection.name)
+
+
+def run_reembedding_job(
+    job_id,
+    max_batches: Optional[int] = None,
+    progress: Optional[Callable[[ReembeddingJob], None]] = None,
+) -> ReembeddingJob:
+    """Advances a job by up to ``max_batches`` batches (all of them when
+    ``None``); call again to resume. The cursor is committed with every
+    batch, so a crash loses at most the batch in flight."""
+    job = ReembeddingJob.objects.get(id=job_id)
+    if job.status in (ReembeddingStatus.COMPLETED, ReembeddingStatus.CANCELLED):
+        return job
+    job.status = ReembeddingStatus.RUNNING
+    job.started_at = job.started_at or timezone.now()
+    job.error = None
+    job.save(update_fields=["status", "started_at", "error", "updated_at"])
+
+    embeddings = get_embeddings_service(job.target_model)
+    limiter = RateLimiter(job.requests_per_minute)
+    batch_size = job.batch_size or kb_setting("VECTOR_DB_EMBEDDING_BATCH_SIZE")
+    batches = 0
+    try:
+        while job.phase != ReembeddingPhase.SWAP:
+            if max_batches is not None and batches >= max_batches:
+                return job
+            job.refresh_from_db(fields=["status"])
+            if job.status == ReembeddingStatus.CANCELLED:
+                return job
+
+            model = PHASE_MODELS[job.phase]
+            queryset = model.objects.filter(
+                collection_id=job.collection_id, embeddings__isnull=False
+            ).order_by("id")
+            if job.last_id is not None:
+                queryset = queryset.filter(id__gt=job.last_id)
+            rows = list(queryset.only("id", "content")[:batch_size])
+
+            if rows:
+                _stage(job, model, rows, embeddings, limiter)
+                job.last_id = rows[-1].id
+                job.processed += len(rows)
+            else:
+                job.phase = (
+                    ReembeddingPhase.CHUNKS
+                    if job.phase == ReembeddingPhase.DOCUMENTS
+                    else ReembeddingPhase.SWAP
+                )
+                job.last_id = None
+            job.save(update_fields=["phase", "last_id", "processed", "updated_at"])
+            batches += 1
+            if progress is not None:
+                progress(job)
+
+        _swap(job, embeddings, limiter, batch_size)
+    except Exception as e:
+        job.status = ReembeddingStatus.FAILED
+        job.error = str(e)
+        job.save(update_fields=["status", "error", "updated_at"])
+        raise
+    if progress is not None:
+        progress(job)
+    return job
@@ -0,0 +1,113 @@
+import json
+import time
+import hashlib
+from typing import Any, Awaitable, Callable, Optional
+from django.core.cache import caches
+from django.db import transaction
+from .conf import kb_setting
+
+
+def _cache():
+    alias = kb_setting("VECTOR_DB_RESULT_CACHE_ALIAS")
+    return caches[alias] if alias else None
+
+
+def _version_key(collection_name: str) -> str:
+    return f"kb:collection-version:{collection_name}"
+
+
+def _result_key(collection_name: str, version: int, params: dict) -> str:
+    digest = hashlib.sha256(
+        json.dumps(params, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return f"kb:results:{collection_name}:{version}:{digest}"
+
+
+def collection_version(cache, collection_name: str) -> int:
+    key = _version_key(collection_name)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock rather than 1 so an evicted counter can never
+        # come back to a version that older cached results were stored under.
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def acollection_version(cache, collection_name: str) -> int:
+    key = _version_key(collection_name)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def current_collection_version(collection_name: str) -> Optional[int]:
+    """The collection's version, or ``None`` when no result cache is set."""
+    cache = _cache()
+    return None if cache is None else collection_version(cache, collection_name)
+
+
+async def acurrent_collection_version(collection_name: str) -> Optional[int]:
+    cache = _cache()
+    if cache is None:
+        return None
+    return await acollection_version(cache, collection_name)
+
+
+def bump_collection_version(collection_name: str) -> None:
+    cache = _cache()
+    if cache is None:
+        return
+    try:
+        cache.incr(_version_key(collection_name))
+    except ValueError:
+        cache.set(_version_key(collection_name), time.time_ns(), timeout=None)
+
+
+def invalidate_collection(*collection_names: str) -> None:
+    """Bumps the versions of ``collection_names`` once the surrounding
+    transaction commits, so readers never cache pre-commit results under the
+    new version."""
+    if not collection_names or _cache() is None:
+        return
+    transaction.on_commit(
+        lambda: [bump_collection_version(name) for name in collection_names]
+    )
+
+
+def cached_results(collection_name: str, params: dict, compute: Callable[[], Any]):
+    """Returns the cached result for ``params`` in the current version of the
+    collection, computing and storing it on a miss.
+
+    The version is read before ``compute`` runs: a write committed meanwhile
+    bumps the version, and the result lands under the old one, never read again.
+    """
+    cache = _cache()
+    if cache is None:
+        return compute()
+    version = collection_version(cache, collection_name)
+    key = _result_key(collection_name, version, params)
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.set(key, result, timeout=kb_setting("VECTOR_DB_RESULT_CACHE_TTL"))
+    return result
+
+
+async def acached_results(
+    collection_name: str, params: dict, compute: Callable[[], Awaitable[Any]]
+):
+    cache = _cache()
+    if cache is None:
+        return await compute()
+    version = await acollection_version(cache, collection_name)
+    key = _result_key(collection_name, version, params)
+    result = await cache.aget(key)
+    if result is None:
+        result = await compute()
+        await cache.aset(
+            key, result, timeout=kb_setting("VECTOR_DB_RESULT_CACHE_TTL")
+        )
+    return result
@@ -1,191 +1,313 @@
+import time
+import logging
+from .conf import kb_setting
+from .pool import get_pool
 from .services import DocumentService
-from .serializers import WorkspaceCollectionDocumentSerializer
+from .result_cache import (
+    acached_results,
+    acurrent_collection_version,
+    cached_results,
+    current_collection_version,
+)
 from asgiref.sync import sync_to_async
 from typing import Optional, List, Literal
 from langchain_core.documents import Document
+from langchain_core.pydantic_v1 import PrivateAttr
 from langchain_core.retrievers import BaseRetriever
 from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from .models import WorkspaceCollectionDocument
+
+logger = logging.getLogger(__name__)
+
+# DocumentService method behind each search type; the async one is "a" + name.
+SEARCH_METHODS = {
+    "similarity_search": "similarity_search_with_relevance_scores",
+    "similarity_search_with_relevance_scores": "similarity_search_with_relevance_scores",
+    "hybrid_search": "hybrid_search_with_relevance_scores",
+    "quantized_search": "quantized_search_with_relevance_scores",
+    "mmr_search": "mmr_search_with_relevance_scores",
+    "chunk_search": "chunk_search_with_relevance_scores",
+    "parent_document_search": "parent_document_search_with_relevance_scores",
+}
+
+
+def _isoformat(value) -> Optional[str]:
+    return value.isoformat() if value is not None else None
 
 
 class PgVectorRetriever(BaseRetriever):
     collection_name: str
     k: Optional[int] = 50
     search_type: Optional[
-        Literal["similarity_search", "similarity_search_with_relevance_scores"]
+        Literal[
+            "similarity_search",
+            "similarity_search_with_relevance_scores",
+            "hybrid_search",
+            "quantized_search",
+            "mmr_search",
+            "chunk_search",
+            "parent_document_search",
+        ]
     ] = "similarity_search"
+    include_pending: bool = False
+    ef_search: Optional[int] = None
+    probes: Optional[int] = None
+    metadata_filter: Optional[dict] = None
+    # Metadata carries the lean document form unless the full one (with the
+    # embedding vector and the whole collection) is asked for.
+    full_metadata: bool = False
+    # quantized_search: binary-quantized candidates per result that get an
+    # exact rerank (VECTOR_DB_BINARY_OVERFETCH when unset).
+    overfetch: Optional[int] = None
+    # mmr_search: candidates to diversify and the relevance/diversity trade-off
+    # (VECTOR_DB_MMR_FETCH_K / VECTOR_DB_MMR_LAMBDA when unset).
+    fetch_k: Optional[int] = None
+    lambda_mult: Optional[float] = None
+    # Reuse results for identical requests while the collection is unchanged
+    # (needs VECTOR_DB_RESULT_CACHE_ALIAS).
+    cache_results: bool = True
 
-    def _get_relevant_documents(
-        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
-    ) -> List[Document]:
-        if self.search_type == "similarity_search":
-            return self._similarity_search(query, run_manager=run_manager)
-        elif self.search_type == "similarity_search_with_relevance_scores":
-            return self._similarity_search_with_relevance_scores(
-                query, run_manager=run_manager
-            )
-        else:
-            raise ValueError("Invalid search type")
+    # Built on first use and kept while the collection is unchanged, so a
+    # query costs one embedding call and one SQL statement rather than a
+    # collection lookup and a new service.
+    _service: Optional[DocumentService] = PrivateAttr(default=None)
+    _service_version: Optional[int] = PrivateAttr(default=None)
+    _service_expires_at: float = PrivateAttr(default=0.0)
 
-    async def _aget_relevant_documents(
-        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
-    ) -> List[Document]:
-        if self.search_type == "similarity_search":
-            return await self._asimilarity_search(query, run_manager=run_manager)
-        elif self.search_type == "similarity_search_with_relevance_scores":
-            return await self._asimilarity_search_with_relevance_scores(
-                query, run_manager=run_manager
-            )
-        else:
-            raise ValueError("Invalid search type")
+    def _service_stale(self, version: Optional[int]) -> bool:
+        """Whether the collection may have changed (a re-embedding swap, a
+        new vector precision) since the service was built: its result-cache
+        version moved or, without a result cache, the reload interval ran
+        out. Neither check queries the database."""
+        if self._service is None:
+            return True
+        if version is not None:
+            return version != self._service_version
+        return time.monotonic() >= self._service_expires_at
 
-    def _similarity_search(
-        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
-    ) -> List[Document]:
-        try:
-            print(f"Starting similarity search for query: {query}")
+    def _keep_service(self, service: DocumentService, version: Optional[int]):
+        self._service = service
+        self._service_version = version
+        self._service_expires_at = time.monotonic() + kb_setting(
+            "VECTOR_DB_RETRIEVER_RELOAD_SECONDS"
+        )
 
-            document_service = DocumentService.from_default_settings(
-                collection_name=self.collection_name
-            )
-            print(
-                f"DocumentService initialized with collection: {self.collection_name}"
+    def _get_service(self) -> DocumentService:
+        version = current_collection_version(self.collection_name)
+        if self._service_stale(version):
+            self._keep_service(
+                DocumentService.from_default_settings(
+                    collection_name=self.collection_name,
+                    ef_search=self.ef_search,
+                    probes=self.probes,
+                ),
+                version,
             )
+        return self._service
 
-            response = document_service.similarity_search(
-                query=query,
-                top_k=self.k,
+    async def _aget_service(self) -> DocumentService:
+        version = await acurrent_collection_version(self.collection_name)
+        if self._service_stale(version):
+            self._keep_service(
+                await DocumentService.afrom_default_settings(
+                    collection_name=self.collection_name,
+                    ef_search=self.ef_search,
+                    probes=self.probes,
+                ),
+                version,
             )
-            print("Similarity search completed. Processing response documents.")
-
-            serialized_docs = WorkspaceCollectionDocumentSerializer(
-                response, many=True
-            ).data
-
-            documents = [
-                Document(
-                    page_content=doc["content"],
-                    metadata=doc,
-                )
-                for doc in serialized_docs
-            ]
-            print(f"Processed {len(documents)} documents from response.")
-
-            run_manager.on_retriever_end(documents=documents)
-            return documents
-
-        except Exception as e:
-            print(f"Error occurred during similarity search: {e}")
-            run_manager.on_retriever_error(error=e)
-            raise e
+        else:
+            # Pools belong to an event loop; get_pool() returns this loop's.
+            self._service.pool = await get_pool()
+        return self._service
 
-    def _similarity_search_with_relevance_scores(
-        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
-    ) -> List[Document]:
-        try:
-            document_service = DocumentService.from_default_settings(
-                collection_name=self.collection_name
-            )
-            response = document_service.similarity_search_with_relevance_scores(
-                query=query,
-                top_k=self.k,
-            )
+    def reset_service(self) -> None:
+        """Drops the cached service so the next query reloads the collection."""
+        self._service = None
 
-            serialized_docs = [
-                {
-                    **WorkspaceCollectionDocumentSerializer(doc).data,
-                    "relevance_score": score,
-                }
-                for doc, score in response
-            ]
+    def _cache_params(self, query: str) -> dict:
+        return {
+            "query": query,
+            "k": self.k,
+            "search_type": self.search_type,
+            "include_pending": self.include_pending,
+            "ef_search": self.ef_search,
+            "probes": self.probes,
+            "metadata_filter": self.metadata_filter,
+            "full_metadata": self.full_metadata,
+            "overfetch": self.overfetch,
+            "fetch_k": self.fetch_k,
+            "lambda_mult": self.lambda_mult,
+        }
 
-            documents = [
-                Document(
-                    page_content=doc["content"],
-                    metadata=doc,
-                )
-                for doc in serialized_docs
-            ]
+    def _search_method(self) -> str:
+        if self.search_type not in SEARCH_METHODS:
+            raise ValueError("Invalid search type")
+        return SEARCH_METHODS[self.search_type]
 
-            run_manager.on_retriever_end(documents=documents)
-            return documents
+    def _search_options(self) -> dict:
+        if self.search_type == "chunk_search":
+            return {"top_k": self.k, "metadata_filter": self.metadata_filter}
+        if self.search_type == "parent_document_search":
+            return {
+                "top_k": self.k,
+                "include_embeddings": self.full_metadata,
+                "metadata_filter": self.metadata_filter,
+            }
+        options = {
+            "top_k": self.k,
+            "include_pending": self.include_pending,
+            "include_embeddings": self.full_metadata,
+            "metadata_filter": self.metadata_filter,
+        }
+        if self.search_type == "quantized_search":
+            options["overfetch"] = self.overfetch
+        elif self.search_type == "mmr_search":
+            options["fetch_k"] = self.fetch_k
+            options["lambda_mult"] = self.lambda_mult
+        return options
 
-        except Exception as e:
-            run_manager.on_retriever_error(error=e)
-            raise e
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        if not self.cache_results:
+            return self._search(query)
+        return cached_results(
+            self.collection_name,
+            self._cache_params(query),
+            lambda: self._search(query),
+        )
 
-    async def _asimilarity_search(
+    async def _aget_relevant_documents(
         self, query: str, *, run_manager: CallbackManagerForRetrieverRun
     ) -> List[Document]:
+        if not self.cache_results:
+            return await self._asearch(query)
+        return await acached_results(
+            self.collection_name,
+            self._cache_params(query),
+            lambda: self._asearch(query),
+        )
+
+    def _search(self, query: str) -> List[Document]:
+        method = self._search_method()
+        logger.debug("%s on %s", self.search_type, self.collection_name)
+        service = self._get_service()
         try:
-            print(f"Starting async similarity search for query: {query}")
+            hits = getattr(service, method)(query, **self._search_options())
+        except Exception:
+            # The collection may have changed under the service; reload it.
+            self.reset_service()
+            raise
+        documents = self._to_documents(service, hits)
+        logger.debug("%s returned %d documents", self.search_type, len(documents))
+        return documents
 
-            document_service = await DocumentService.afrom_default_settings(
-                collection_name=self.collection_name
-            )
-            print(
-                f"DocumentService initialized with collection: {self.collection_name}"
-            )
+    async def _asearch(self, query: str) -> List[Document]:
+        method = f"a{self._search_method()}"
+        logger.debug("async %s on %s", self.search_type, self.collection_name)
+        service = await self._aget_service()
+        try:
+            hits = await getattr(service, method)(query, **self._search_options())
+        except Exception:
+            self.reset_service()
+            raise
+        if self.full_metadata and self.search_type != "chunk_search":
+            documents = await sync_to_async(self._to_documents)(service, hits)
+        else:
+            documents = self._to_documents(service, hits)
+        logger.debug("%s returned %d documents", self.search_type, len(documents))
+        return documents
 
-            response = await document_service.asimilarity_search(
-                query=query,
-                top_k=self.k,
-            )
-            print("Async similarity search completed. Processing response documents.")
+    @staticmethod
+    def _lean_metadata(
+        service: DocumentService, document: WorkspaceCollectionDocument
+    ) -> dict:
+        """Metadata read straight off the selected columns: no serializer and
+        no user lookups. The content is the ``Document``'s page_content."""
+        return {
+            "id": str(document.id),
+            "collection": {
+                "id": str(service.collection.id),
+                "name": service.collection.name,
+            },
+            "title": document.title,
+            "metadata": document.metadata,
+            "embedding_status": document.embedding_status,
+            "uri": document.uri,
+            "created_at": _isoformat(document.created_at),
+            "updated_at": _isoformat(document.updated_at),
+            "created_by": document.created_by_id,
+            "updated_by": document.updated_by_id,
+        }
 
-            serialized_docs = await sync_to_async(
-                lambda: WorkspaceCollectionDocumentSerializer(response, many=True).data
-            )()
+    @staticmethod
+    def _chunk_documents(service: DocumentService, hits) -> List[Document]:
+        return [
+            Document(
+                page_content=chunk.content,
+                metadata={
+                    "id": str(chunk.id),
+                    "document_id": str(chunk.document_id),
+                    "position": chunk.position,
+                    "collection": {
+                        "id": str(service.collection.id),
+                        "name": service.collection.name,
+                    },
+                    "relevance_score": score,
+                },
+            )
+            for chunk, score in hits
+        ]
 
-            documents = [
-                Document(
-                    page_content=doc["content"],
-                    metadata=doc,
-                )
-                for doc in serialized_docs
+    def _to_documents(
+        self, document_service: DocumentService, hits
+    ) -> List[Document]:
+        if self.search_type == "chunk_search":
+            return self._chunk_documents(document_service, hits)
+        with_scores = self.search_type != "similarity_search"
+        if self.full_metadata:
+            serialized = document_service.serialize_documents(
+                [document for document, _ in hits], full=True
+            )
+        else:
+            serialized = [
+                self._lean_metadata(document_service, document)
+                for document, _ in hits
             ]
-            print(f"Processed {len(documents)} documents from response asynchronously.")
-
-            await run_manager.on_retriever_end(documents=documents)
-            return documents
+        documents = []
+        for metadata, (document, score) in zip(serialized, hits):
+            metadata = dict(metadata)
+            if with_scores:
+                metadata["relevance_score"] = score
+            documents.append(Document(page_content=document.content, metadata=metadata))
+        return documents
 
-        except Exception as e:
-            print(f"Error occurred during async similarity search: {e}")
-            await run_manager.on_retriever_error(error=e)
-            raise e
+    def batch_search(self, queries: List[str]) -> List[List[Document]]:
+        """Retrieves for many queries with one embedding call and one query."""
+        document_service = self._get_service()
+        results = document_service.batch_similarity_search_with_relevance_scores(
+            queries=queries,
+            top_k=self.k,
+            include_pending=self.include_pending,
+            include_embeddings=self.full_metadata,
+            metadata_filter=self.metadata_filter,
+        )
+        return [self._to_documents(document_service, hits) for hits in results]
 
-    async def _asimilarity_search_with_relevance_scores(
-        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
-    ) -> List[Document]:
-        try:
-            document_service = await DocumentService.afrom_default_settings(
-                collection_name=self.collection_name
-            )
-            response = await document_service.asimilarity_search_with_relevance_scores(
-                query=query,
+    async def abatch_search(self, queries: List[str]) -> List[List[Document]]:
+        document_service = await self._aget_service()
+        results = (
+            await document_service.abatch_similarity_search_with_relevance_scores(
+                queries=queries,
                 top_k=self.k,
+                include_pending=self.include_pending,
+                include_embeddings=self.full_metadata,
+                metadata_filter=self.metadata_filter,
             )
-
-            serialized_docs = await sync_to_async(
-                lambda: [
-                    {
-                        **WorkspaceCollectionDocumentSerializer(doc).data,
-                        "relevance_score": score,
-                    }
-                    for doc, score in response
-                ]
+        )
+        if self.full_metadata:
+            return await sync_to_async(
+                lambda: [self._to_documents(document_service, hits) for hits in results]
             )()
-
-            documents = [
-                Document(
-                    page_content=doc["content"],
-                    metadata=doc,
-                )
-                for doc in serialized_docs
-            ]
-
-            await run_manager.on_retriever_end(documents=documents)
-            return documents
-
-        except Exception as e:
-            await run_manager.on_retriever_error(error=e)
-            raise e
+        return [self._to_documents(document_service, hits) for hits in results]
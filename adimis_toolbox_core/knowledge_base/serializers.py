@@ -1,5 +1,9 @@
 from rest_framework import serializers
-from .models import WorkspaceCollection, WorkspaceCollectionDocument
+from .models import (
+    WorkspaceCollection,
+    WorkspaceCollectionDocument,
+    WorkspaceCollectionStats,
+)
 
 
 class WorkspaceCollectionSerializer(serializers.ModelSerializer):
@@ -12,6 +16,11 @@ class WorkspaceCollectionSerializer(serializers.ModelSerializer):
             "id",
             "name",
             "description",
+            "vector_precision",
+            "rerank_factor",
+            "chunk_method",
+            "chunk_options",
+            "embedding_model",
             "created_at",
             "updated_at",
             "created_by",
@@ -35,6 +44,37 @@ class WorkspaceCollectionSerializer(serializers.ModelSerializer):
         return None
 
 
+class WorkspaceCollectionStatsSerializer(serializers.ModelSerializer):
+    pending_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = WorkspaceCollectionStats
+        fields = [
+            "document_count",
+            "content_bytes",
+            "embedded_count",
+            "pending_count",
+            "updated_at",
+        ]
+
+
+class WorkspaceCollectionDetailSerializer(WorkspaceCollectionSerializer):
+    """Collection with its document stats. Expects ``stats`` to be selected
+    along (``select_related("stats")``) when serializing many collections."""
+
+    stats = serializers.SerializerMethodField()
+
+    class Meta(WorkspaceCollectionSerializer.Meta):
+        fields = WorkspaceCollectionSerializer.Meta.fields + ["stats"]
+
+    def get_stats(self, obj):
+        try:
+            stats = obj.stats
+        except WorkspaceCollectionStats.DoesNotExist:
+            stats = WorkspaceCollectionStats(collection=obj, updated_at=None)
+        return WorkspaceCollectionStatsSerializer(stats).data
+
+
 class WorkspaceCollectionDocumentSerializer(serializers.ModelSerializer):
     collection = WorkspaceCollectionSerializer()
     created_by = serializers.SerializerMethodField()
@@ -48,6 +88,7 @@ class WorkspaceCollectionDocumentSerializer(serializers.ModelSerializer):
             "content",
             "metadata",
             "embeddings",
+            "embedding_status",
             "uri",
             "created_at",
             "updated_at",
@@ -71,3 +112,25 @@ class WorkspaceCollectionDocumentSerializer(serializers.ModelSerializer):
                 "username": obj.updated_by.username,
             }
         return None
+
+
+class WorkspaceCollectionSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WorkspaceCollection
+        fields = ["id", "name"]
+
+
+class WorkspaceCollectionDocumentListSerializer(WorkspaceCollectionDocumentSerializer):
+    """Lean form used by list endpoints and search results: no embedding
+    vector and the collection as ``{id, name}``. Expects ``collection``,
+    ``created_by`` and ``updated_by`` to be loaded up front (see
+    ``DocumentService.serialize_documents``)."""
+
+    collection = WorkspaceCollectionSummarySerializer()
+
+    class Meta(WorkspaceCollectionDocumentSerializer.Meta):
+        fields = [
+            field
+            for field in WorkspaceCollectionDocumentSerializer.Meta.fields
+            if field != "embeddings"
+        ]
@@ -1,18 +1,75 @@
+import time
 import uuid
 import asyncpg
+from contextlib import nullcontext
 from django.db import connection
-from django.conf import settings
+from django.db.models import Sum, prefetch_related_objects
 from django.db import transaction
+from django.utils import timezone
 from django.utils.text import slugify
 from asgiref.sync import sync_to_async
-from django.db.models import Case, When
-from typing import Optional, TypedDict, List
-from langchain_openai import OpenAIEmbeddings
+from typing import (
+    Optional,
+    TypedDict,
+    List,
+    Union,
+    Sequence,
+    Callable,
+    BinaryIO,
+    Iterator,
+)
 from langchain_core.embeddings import Embeddings
-from .models import WorkspaceCollectionDocument, WorkspaceCollection
+from .archive import (
+    ARCHIVE_COMPRESSION,
+    ARCHIVE_FIELDS,
+    ArchiveImportReport,
+    archive_schema,
+    batch_rows,
+    check_compression,
+    open_archive,
+    read_batches,
+    write_archive,
+)
+from .conf import kb_setting
+from .chunking import SPLITTERS, build_chunks, chunking_for, write_chunks
+from .embeddings import (
+    aembed_queries,
+    content_hash,
+    embed_queries,
+    get_embeddings_service,
+    iter_embedding_batches,
+)
+from .models import (
+    EmbeddingStatus,
+    ReembeddingJob,
+    VectorPrecision,
+    WorkspaceCollectionDocument,
+    WorkspaceCollectionDocumentChunk,
+    WorkspaceCollection,
+    WorkspaceCollectionStats,
+)
+from .pool import ManagedPool, get_pool
+from .tasks import embed_pending_documents, reembed_collection
+from .filters import compile_metadata_filter
+from .ingest import StreamIngestReport, copy_documents, iter_ndjson
+from .pagination import CountMode, Page, keyset_page
+from .reembedding import start_reembedding
+from .ranking import maximal_marginal_relevance
+from .query_cache import embedding_model_name, query_embedding_cache
+from .result_cache import invalidate_collection
+from .vector_sql import (
+    CHUNK_TABLE,
+    DOCUMENT_TABLE,
+    TEXT_SEARCH_CONFIG,
+    SqlParams,
+    distance_sql,
+    tuning_statements,
+    vector_literal,
+)
 from .serializers import (
-    WorkspaceCollectionSerializer,
+    WorkspaceCollectionDetailSerializer,
     WorkspaceCollectionDocumentSerializer,
+    WorkspaceCollectionDocumentListSerializer,
 )
 
 
@@ -21,6 +78,113 @@ class DocumentResponse(TypedDict):
     response: List[WorkspaceCollectionDocument]
 
 
+class BatchTiming(TypedDict):
+    batch: int
+    size: int
+    tokens: int
+    embed_seconds: float
+    write_seconds: float
+
+
+class BulkIngestReport(TypedDict):
+    documents: List[WorkspaceCollectionDocument]
+    batches: List[BatchTiming]
+    total_seconds: float
+
+
+class BulkUpdateReport(TypedDict):
+    documents: List[WorkspaceCollectionDocument]
+    reembedded: int
+    metadata_only: int
+
+
+SEARCH_FIELDS = (
+    "id",
+    "collection_id",
+    "title",
+    "content",
+    "metadata",
+    "embedding_status",
+    "uri",
+    "created_at",
+    "updated_at",
+    "created_by_id",
+    "updated_by_id",
+)
+
+# Projection behind WorkspaceCollectionDocumentListSerializer.
+LIST_FIELDS = (
+    "id",
+    "title",
+    "content",
+    "metadata",
+    "embedding_status",
+    "uri",
+    "created_at",
+    "updated_at",
+    "collection",
+    "collection__id",
+    "collection__name",
+    "created_by",
+    "created_by__id",
+    "created_by__username",
+    "updated_by",
+    "updated_by__id",
+    "updated_by__username",
+)
+
+
+def search_columns(
+    fields: Optional[Sequence[str]] = None, include_embeddings: bool = False
+) -> list[str]:
+    """Columns selected by similarity search, in model field order.
+
+    ``id`` is always selected; ``embeddings`` only when asked for, since the
+    vector is usually the largest value in the row.
+    """
+    wanted = {"id", *(fields or SEARCH_FIELDS)}
+    if include_embeddings:
+        wanted.add("embeddings")
+    columns = [
+        field.attname
+        for field in WorkspaceCollectionDocument._meta.concrete_fields
+        if field.attname in wanted
+    ]
+    unknown = wanted - set(columns)
+    if unknown:
+        raise ValueError(f"Unknown document fields: {', '.join(sorted(unknown))}")
+    return columns
+
+
+def documents_from_row(
+    columns: list[str], row: tuple
+) -> tuple[WorkspaceCollectionDocument, float]:
+    """Builds a document from a raw ``columns + distance`` row. Columns that
+    were not selected are left deferred on the instance."""
+    values = [
+        (
+            field.from_db_value(value, None, connection)
+            if hasattr(field, "from_db_value")
+            else value
+        )
+        for field, value in zip(
+            (WorkspaceCollectionDocument._meta.get_field(c) for c in columns), row
+        )
+    ]
+    document = WorkspaceCollectionDocument.from_db(connection.alias, columns, values)
+    return document, row[len(columns)]
+
+
+CHUNK_COLUMNS = ("id", "document_id", "position", "content")
+
+
+def chunk_from_row(row: tuple) -> tuple[WorkspaceCollectionDocumentChunk, float]:
+    chunk = WorkspaceCollectionDocumentChunk.from_db(
+        connection.alias, list(CHUNK_COLUMNS), list(row[: len(CHUNK_COLUMNS)])
+    )
+    return chunk, row[len(CHUNK_COLUMNS)]
+
+
 class CollectionService:
     @staticmethod
     def create_collection(name: str, description: str, user) -> WorkspaceCollection:
@@ -31,66 +195,62 @@ class CollectionService:
                 created_by=user,
                 updated_by=user,
             )
+            WorkspaceCollectionStats.objects.create(collection=collection)
+            invalidate_collection(collection.name)
             return collection
 
     @staticmethod
     async def acreate_collection(
         name: str, description: str, user
     ) -> WorkspaceCollection:
-        async with transaction.atomic():
-            collection = await WorkspaceCollection.objects.acreate(
-                name=slugify(name),
-                description=description,
-                created_by=user,
-                updated_by=user,
-            )
-            return collection
+        return await sync_to_async(CollectionService.create_collection)(
+            name, description, user
+        )
 
     @staticmethod
     def get_collection(collection_id: uuid.UUID) -> dict:
-        collection = WorkspaceCollection.objects.get(id=collection_id)
-        return WorkspaceCollectionSerializer(collection).data
+        collection = WorkspaceCollection.objects.select_related("stats").get(
+            id=collection_id
+        )
+        return WorkspaceCollectionDetailSerializer(collection).data
 
     @staticmethod
     async def aget_collection(collection_id: uuid.UUID) -> dict:
-        collection = await WorkspaceCollection.objects.aget(id=collection_id)
-        return WorkspaceCollectionSerializer(collection).data
+        collection = await WorkspaceCollection.objects.select_related("stats").aget(
+            id=collection_id
+        )
+        return WorkspaceCollectionDetailSerializer(collection).data
 
     @staticmethod
     def get_collection_by_name(name: str) -> dict:
-        collection = WorkspaceCollection.objects.get(name=name)
-        return WorkspaceCollectionSerializer(collection).data
+        collection = WorkspaceCollection.objects.select_related("stats").get(name=name)
+        return WorkspaceCollectionDetailSerializer(collection).data
 
     @staticmethod
     async def aget_collection_by_name(name: str) -> dict:
-        collection = await WorkspaceCollection.objects.aget(name=name)
-        return WorkspaceCollectionSerializer(collection).data
+        collection = await WorkspaceCollection.objects.select_related("stats").aget(
+            name=name
+        )
+        return WorkspaceCollectionDetailSerializer(collection).data
 
     @staticmethod
     def get_all_collections(
-        workspace_id: uuid.UUID, limit: int = 10, offset: int = 0
-    ) -> dict:
-        queryset = WorkspaceCollection.objects.filter(
-            workspace_id=workspace_id
-        ).order_by("updated_at")
-        count = queryset.count()
-        collections = WorkspaceCollectionSerializer(
-            queryset[offset : offset + limit], many=True
-        ).data
-        return {"count": count, "response": collections}
+        limit: int = 10, cursor: Optional[str] = None, count: CountMode = "exact"
+    ) -> Page:
+        queryset = WorkspaceCollection.objects.select_related(
+            "created_by", "updated_by", "stats"
+        )
+        return keyset_page(
+            queryset, WorkspaceCollectionDetailSerializer, limit, cursor, count
+        )
 
     @staticmethod
     async def aget_all_collections(
-        workspace_id: uuid.UUID, limit: int = 10, offset: int = 0
-    ) -> dict:
-        queryset = WorkspaceCollection.objects.filter(
-            workspace_id=workspace_id
-        ).order_by("updated_at")
-        count = await sync_to_async(queryset.count)()
-        collections = WorkspaceCollectionSerializer(
-            await queryset[offset : offset + limit].all(), many=True
-        ).data
-        return {"count": count, "response": collections}
+        limit: int = 10, cursor: Optional[str] = None, count: CountMode = "exact"
+    ) -> Page:
+        return await sync_to_async(CollectionService.get_all_collections)(
+            limit=limit, cursor=cursor, count=count
+        )
 
     @staticmethod
     def update_collection(
@@ -98,14 +258,16 @@ class CollectionService:
         name: str,
         description: str,
         user,
-        workspace_id: uuid.UUID,
+        workspace_id: Optional[uuid.UUID] = None,
     ) -> WorkspaceCollection:
         with transaction.atomic():
             collection = WorkspaceCollection.objects.get(id=collection_id)
+            previous_name = collection.name
             collection.name = slugify(name)
             collection.description = description
             collection.updated_by = user
             collection.save()
+            invalidate_collection(previous_name, collection.name)
             return collection
 
     @staticmethod
@@ -114,41 +276,227 @@ class CollectionService:
         name: str,
         description: str,
         user,
-        workspace_id: uuid.UUID,
+        workspace_id: Optional[uuid.UUID] = None,
     ) -> WorkspaceCollection:
-        async with transaction.atomic():
-            collection = await WorkspaceCollection.objects.aget(id=collection_id)
-            collection.name = slugify(name)
-            collection.description = description
-            collection.updated_by = user
-            await collection.asave()
+        return await sync_to_async(CollectionService.update_collection)(
+            collection_id, name, description, user
+        )
+
+    @staticmethod
+    def set_vector_precision(
+        collection_id: uuid.UUID, precision: str, rerank_factor: Optional[int] = None
+    ) -> WorkspaceCollection:
+        """Switches the index a collection is searched with. Build the matching
+        index first (``build_vector_index --precision half``)."""
+        if precision not in VectorPrecision.values:
+            raise ValueError(f"Invalid vector precision: {precision}")
+        with transaction.atomic():
+            collection = WorkspaceCollection.objects.get(id=collection_id)
+            collection.vector_precision = precision
+            collection.rerank_factor = rerank_factor
+            collection.save(update_fields=["vector_precision", "rerank_factor"])
+            invalidate_collection(collection.name)
             return collection
 
+    @staticmethod
+    def set_chunking(
+        collection_id: uuid.UUID, method: Optional[str], options: Optional[dict] = None
+    ) -> WorkspaceCollection:
+        """Sets the split_document method new and updated documents are chunked
+        with (``None`` falls back to ``VECTOR_DB_CHUNK_METHOD``). Existing
+        documents are re-chunked with ``manage.py chunk_documents``."""
+        if method is not None and method not in SPLITTERS:
+            raise ValueError(f"Method {method} is not supported.")
+        with transaction.atomic():
+            collection = WorkspaceCollection.objects.get(id=collection_id)
+            collection.chunk_method = method
+            collection.chunk_options = options
+            collection.save(update_fields=["chunk_method", "chunk_options"])
+            invalidate_collection(collection.name)
+            return collection
+
+    @staticmethod
+    def reembed_collection(
+        collection_id: uuid.UUID,
+        target_model: str,
+        batch_size: Optional[int] = None,
+        requests_per_minute: Optional[int] = None,
+    ) -> ReembeddingJob:
+        """Starts moving a collection to ``target_model`` in the Celery worker.
+        Searches keep using the current model until the job swaps vectors;
+        follow it through ``ReembeddingJob.progress``/``status``."""
+        with transaction.atomic():
+            job = start_reembedding(
+                collection_id, target_model, batch_size, requests_per_minute
+            )
+            job_id = str(job.id)
+            transaction.on_commit(lambda: reembed_collection.delay(job_id=job_id))
+            return job
+
+    @staticmethod
+    def export_collection(
+        collection_name: str,
+        batch_size: Optional[int] = None,
+        compression: Optional[str] = ARCHIVE_COMPRESSION,
+    ) -> Iterator[bytes]:
+        """Streams a collection as an Arrow archive (see ``archive``).
+
+        Documents are read through a server-side cursor ``batch_size`` rows at
+        a time and each batch is encoded as soon as it is fetched, so memory
+        stays flat whatever the collection size. Vectors of a model other
+        than the collection's are exported as missing.
+
+        A database error midway is raised from the stream before its closing
+        batch, so the partial archive is rejected on import.
+        """
+        check_compression(compression)
+        collection = WorkspaceCollection.objects.get(name=collection_name)
+        batch_size = batch_size or kb_setting("VECTOR_DB_EMBEDDING_BATCH_SIZE")
+        schema = archive_schema(
+            collection, kb_setting("VECTOR_DB_EMBEDDING_DIMENSIONS")
+        )
+        model_index = ARCHIVE_FIELDS.index("embedding_model")
+        rows = (
+            WorkspaceCollectionDocument.objects.filter(collection=collection)
+            .order_by("id")
+            .values_list(*ARCHIVE_FIELDS, "embeddings")
+            .iterator(chunk_size=batch_size)
+        )
+
+        def batches():
+            batch = []
+            for row in rows:
+                if row[model_index] != collection.embedding_model:
+                    row = (*row[:-1], None)
+                batch.append(row)
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+        return write_archive(schema, batches(), compression)
+
+    @staticmethod
+    def import_collection(
+        stream: BinaryIO,
+        user,
+        collection_name: Optional[str] = None,
+        preserve_ids: bool = False,
+    ) -> ArchiveImportReport:
+        """Loads an archive written by ``export_collection`` with one ``COPY``
+        per archive batch, keeping the stored vectors.
+
+        The collection (the archive's name unless ``collection_name`` is
+        given) is created with the archive's settings, or appended to when it
+        exists. Vectors are only kept when the archive's model and dimensions
+        match the target collection; otherwise, and for documents exported
+        without one, documents are queued for embedding. Documents get new ids
+        unless ``preserve_ids`` (e.g. restoring into an empty database).
+        Chunks are not archived; rebuild them with ``manage.py chunk_documents``.
+
+        The import is one transaction, collection creation included: a
+        truncated archive or a failed batch leaves nothing behind, and the
+        import can simply be run again.
+        """
+        settings, dimensions, reader = open_archive(stream)
+        with transaction.atomic():
+            return CollectionService._import_batches(
+                settings, dimensions, reader, user, collection_name, preserve_ids
+            )
+
+    @staticmethod
+    def _import_batches(
+        settings: dict,
+        dimensions: int,
+        reader,
+        user,
+        collection_name: Optional[str],
+        preserve_ids: bool,
+    ) -> ArchiveImportReport:
+        name = slugify(collection_name or settings["name"])
+        collection = WorkspaceCollection.objects.filter(name=name).first()
+        if collection is None:
+            collection = CollectionService.create_collection(
+                name, settings["description"], user
+            )
+            collection.embedding_model = settings["embedding_model"]
+            collection.vector_precision = settings["vector_precision"]
+            collection.rerank_factor = settings["rerank_factor"]
+            collection.chunk_method = settings["chunk_method"]
+            collection.chunk_options = settings["chunk_options"]
+            collection.save()
+        keep_vectors = (
+            settings["embedding_model"] == collection.embedding_model
+            and dimensions == kb_setting("VECTOR_DB_EMBEDDING_DIMENSIONS")
+        )
+
+        report: ArchiveImportReport = {
+            "collection": collection.name,
+            "documents": 0,
+            "embedded": 0,
+            "pending": 0,
+            "batches": 0,
+        }
+        for batch in read_batches(reader):
+            documents = []
+            for row in batch_rows(batch):
+                document = WorkspaceCollectionDocument(
+                    collection=collection,
+                    title=row["title"],
+                    content=row["content"],
+                    content_hash=row["content_hash"] or content_hash(row["content"]),
+                    metadata=row["metadata"],
+                    uri=row["uri"],
+                    created_at=row["created_at"],
+                    updated_at=row["updated_at"],
+                    created_by=user,
+                    updated_by=user,
+                )
+                if preserve_ids:
+                    document.id = uuid.UUID(row["id"])
+                if keep_vectors and row["embeddings"] is not None:
+                    document.set_embeddings(
+                        row["embeddings"], collection.embedding_model
+                    )
+                    report["embedded"] += 1
+                else:
+                    document.mark_embedding_pending()
+                    report["pending"] += 1
+                documents.append(document)
+            copy_documents(documents, keep_timestamps=True)
+            report["documents"] += len(documents)
+            report["batches"] += 1
+
+        invalidate_collection(collection.name)
+        if report["pending"]:
+            collection_id = str(collection.id)
+            transaction.on_commit(
+                lambda: embed_pending_documents.delay(collection_id=collection_id)
+            )
+        return report
+
     @staticmethod
     def delete_collection(collection_id: uuid.UUID) -> None:
         with transaction.atomic():
             collection = WorkspaceCollection.objects.get(id=collection_id)
             collection.delete()
+            invalidate_collection(collection.name)
 
     @staticmethod
     async def adelete_collection(collection_id: uuid.UUID) -> None:
-        async with transaction.atomic():
-            collection = await WorkspaceCollection.objects.aget(id=collection_id)
-            await collection.adelete()
+        await sync_to_async(CollectionService.delete_collection)(collection_id)
 
     @staticmethod
     def reset_collection(collection_id: uuid.UUID) -> None:
         with transaction.atomic():
             collection = WorkspaceCollection.objects.get(id=collection_id)
             WorkspaceCollectionDocument.objects.filter(collection=collection).delete()
+            invalidate_collection(collection.name)
 
     @staticmethod
     async def areset_collection(collection_id: uuid.UUID) -> None:
-        async with transaction.atomic():
-            collection = await WorkspaceCollection.objects.aget(id=collection_id)
-            await WorkspaceCollectionDocument.objects.filter(
-                collection=collection
-            ).adelete()
+        await sync_to_async(CollectionService.reset_collection)(collection_id)
 
 
 class DocumentService:
@@ -156,55 +504,72 @@ class DocumentService:
         self,
         collection_name: str,
         embeddings: Embeddings,
-        pool: Optional[asyncpg.Pool] = None,
+        pool: Optional[Union[asyncpg.Pool, ManagedPool]] = None,
+        defer_embeddings: Optional[bool] = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        iterative_scan: Optional[str] = None,
+        filter_overfetch: Optional[int] = None,
+        query_cache: Optional[bool] = None,
     ):
         self.collection_name = collection_name
         self.embeddings = embeddings
         self.collection: WorkspaceCollection | None = None
         self.pool = pool
+        self.defer_embeddings = (
+            kb_setting("VECTOR_DB_DEFER_EMBEDDINGS")
+            if defer_embeddings is None
+            else defer_embeddings
+        )
+        self.ef_search = ef_search or kb_setting("VECTOR_DB_HNSW_EF_SEARCH")
+        self.probes = probes or kb_setting("VECTOR_DB_IVFFLAT_PROBES")
+        self.iterative_scan = iterative_scan or kb_setting(
+            "VECTOR_DB_ITERATIVE_SCAN"
+        )
+        self.filter_overfetch = filter_overfetch or kb_setting(
+            "VECTOR_DB_FILTER_OVERFETCH"
+        )
+        self.query_cache = (
+            kb_setting("VECTOR_DB_QUERY_CACHE") if query_cache is None else query_cache
+        )
 
     @classmethod
-    def from_default_settings(cls, collection_name: str):
-        embeddings = OpenAIEmbeddings(
-            model=settings.VECTOR_DB_EMBEDDING_MODEL,
-            api_key=settings.OPENAI_API_KEY,
-        )
+    def from_default_settings(cls, collection_name: str, **options):
         instance = cls(
             collection_name=collection_name,
-            embeddings=embeddings,
+            embeddings=None,
             pool=None,
+            **options,
         )
         instance.collection = instance._get_collection_by_name(
             collection_name=collection_name
         )
+        instance.embeddings = get_embeddings_service(instance.embedding_model)
         return instance
 
     @classmethod
-    async def afrom_default_settings(cls, collection_name: str):
-        pool = await asyncpg.create_pool(
-            dsn=f"postgresql://{settings.DATABASES['default']['USER']}:{settings.DATABASES['default']['PASSWORD']}@"
-            f"{settings.DATABASES['default']['HOST']}:{settings.DATABASES['default']['PORT']}/{settings.DATABASES['default']['NAME']}",
-            min_size=1,
-            max_size=10,
-            statement_cache_size=0,
-        )
+    async def afrom_default_settings(cls, collection_name: str, **options):
+        pool = await get_pool()
 
         self = cls(
             collection_name=collection_name,
             embeddings=None,
             pool=pool,
+            **options,
         )
 
         self.collection = await self._aget_collection_by_name(
             collection_name=collection_name
         )
-        self.embeddings = OpenAIEmbeddings(
-            model=settings.VECTOR_DB_EMBEDDING_MODEL,
-            api_key=settings.OPENAI_API_KEY,
-        )
+        self.embeddings = get_embeddings_service(self.embedding_model)
 
         return self
 
+    @property
+    def embedding_model(self) -> str:
+        """The model documents are embedded and searched with."""
+        return self.collection.embedding_model
+
     def _get_collection_by_name(self, collection_name: str) -> WorkspaceCollection:
         return WorkspaceCollection.objects.get(name=collection_name)
 
@@ -215,6 +580,51 @@ class DocumentService:
             name=collection_name
         )
 
+    def _invalidate(self) -> None:
+        invalidate_collection(self.collection.name)
+
+    def _prepare_chunks(
+        self, documents: list[WorkspaceCollectionDocument]
+    ) -> tuple[Optional[list[WorkspaceCollectionDocumentChunk]], set]:
+        """Splits and embeds the chunks of ``documents`` before the write
+        transaction opens, so no row lock is held during embedding calls.
+
+        Returns ``(chunks, failed ids)``; chunks are ``None`` when there is
+        nothing to write. Documents that could not be chunked are marked
+        pending, and the embedding queue retries them with its attempt count
+        and backoff rather than failing the whole write.
+        """
+        # Deferred documents are chunked by the embedding queue once embedded.
+        if self.defer_embeddings or chunking_for(self.collection) is None:
+            return None, set()
+        chunks, failures = build_chunks(self.collection, documents, self.embeddings)
+        for document in documents:
+            if document.id in failures:
+                document.mark_embedding_pending()
+        return chunks, set(failures)
+
+    def _write_chunks(
+        self,
+        documents: list[WorkspaceCollectionDocument],
+        chunks: Optional[list[WorkspaceCollectionDocumentChunk]],
+        failed: set,
+    ) -> None:
+        if chunks is None:
+            return
+        write_chunks(documents, chunks)
+        if failed:
+            self._schedule_embedding_queue()
+
+    def _schedule_embedding_queue(self) -> None:
+        collection_id = str(self.collection.id)
+        transaction.on_commit(
+            lambda: embed_pending_documents.delay(collection_id=collection_id)
+        )
+
+    def _schedule_pending_embeddings(self) -> None:
+        if self.defer_embeddings:
+            self._schedule_embedding_queue()
+
     def create_document(
         self,
         title: str,
@@ -222,16 +632,20 @@ class DocumentService:
         metadata: dict,
         user,
     ) -> WorkspaceCollectionDocument:
+        document = WorkspaceCollectionDocument(
+            collection=self.collection,
+            title=slugify(title),
+            content=content,
+            metadata=metadata,
+            created_by=user,
+            updated_by=user,
+        )
+        chunks, failed = self._prepare_chunks([document])
         with transaction.atomic():
-            document = WorkspaceCollectionDocument.objects.create(
-                collection=self.collection,
-                title=slugify(title),
-                content=content,
-                metadata=metadata,
-                created_by=user,
-                updated_by=user,
-            )
-            document.save()
+            document.save(defer_embedding=self.defer_embeddings or bool(failed))
+            self._write_chunks([document], chunks, failed)
+            self._schedule_pending_embeddings()
+            self._invalidate()
             return document
 
     async def acreate_document(
@@ -241,17 +655,9 @@ class DocumentService:
         metadata: dict,
         user,
     ) -> WorkspaceCollectionDocument:
-        async with transaction.atomic():
-            document = await WorkspaceCollectionDocument.objects.acreate(
-                collection=self.collection,
-                title=slugify(title),
-                content=content,
-                metadata=metadata,
-                created_by=user,
-                updated_by=user,
-            )
-            await document.asave()
-            return document
+        return await sync_to_async(self.create_document)(
+            title, content, metadata, user
+        )
 
     def update_document(
         self,
@@ -261,15 +667,23 @@ class DocumentService:
         metadata: dict,
         user,
     ) -> WorkspaceCollectionDocument:
+        document = WorkspaceCollectionDocument.objects.get(
+            id=document_id, collection=self.collection
+        )
+        document.title = slugify(title)
+        document.content = content
+        document.metadata = metadata
+        document.updated_by = user
+        chunks, failed = (
+            self._prepare_chunks([document])
+            if content_hash(content) != document.content_hash
+            else (None, set())
+        )
         with transaction.atomic():
-            document = WorkspaceCollectionDocument.objects.get(
-                id=document_id, collection=self.collection
-            )
-            document.title = slugify(title)
-            document.content = content
-            document.metadata = metadata
-            document.updated_by = user
-            document.save()
+            document.save(defer_embedding=self.defer_embeddings or bool(failed))
+            self._write_chunks([document], chunks, failed)
+            self._schedule_pending_embeddings()
+            self._invalidate()
             return document
 
     async def aupdate_document(
@@ -280,48 +694,89 @@ class DocumentService:
         metadata: dict,
         user,
     ) -> WorkspaceCollectionDocument:
-        async with transaction.atomic():
-            document = await WorkspaceCollectionDocument.objects.aget(
-                id=document_id, collection=self.collection
-            )
-            document.title = slugify(title)
-            document.content = content
-            document.metadata = metadata
-            document.updated_by = user
-            await document.asave()
-            return document
+        return await sync_to_async(self.update_document)(
+            document_id, title, content, metadata, user
+        )
 
-    def get_document(self, document_id: uuid.UUID) -> dict:
-        document = WorkspaceCollectionDocument.objects.get(
-            id=document_id, collection=self.collection
+    def _documents(self):
+        return WorkspaceCollectionDocument.objects.filter(collection=self.collection)
+
+    def _documents_queryset(self, full: bool = False):
+        """Documents of this collection with their users and collection joined
+        in. The lean form only selects what the list serializer emits."""
+        queryset = self._documents()
+        if full:
+            return queryset.select_related(
+                "created_by",
+                "updated_by",
+                "collection__created_by",
+                "collection__updated_by",
+            ).defer("search_vector")
+        return queryset.select_related(
+            "collection", "created_by", "updated_by"
+        ).only(*LIST_FIELDS)
+
+    @staticmethod
+    def _serializer_class(full: bool):
+        return (
+            WorkspaceCollectionDocumentSerializer
+            if full
+            else WorkspaceCollectionDocumentListSerializer
         )
-        return WorkspaceCollectionDocumentSerializer(document).data
 
-    async def aget_document(self, document_id: uuid.UUID) -> dict:
-        document = await WorkspaceCollectionDocument.objects.aget(
-            id=document_id, collection=self.collection
+    def serialize_documents(
+        self, documents: list[WorkspaceCollectionDocument], full: bool = False
+    ) -> list[dict]:
+        """Serializes documents of this collection (e.g. search results) with
+        one query per user relation instead of three per document."""
+        for document in documents:
+            document.collection = self.collection
+        prefetch_related_objects(documents, "created_by", "updated_by")
+        return self._serializer_class(full)(documents, many=True).data
+
+    def document_count(self) -> int:
+        return (
+            WorkspaceCollectionStats.objects.filter(collection=self.collection)
+            .values_list("document_count", flat=True)
+            .first()
+            or 0
+        )
+
+    def get_document(self, document_id: uuid.UUID, full: bool = True) -> dict:
+        document = self._documents_queryset(full).get(id=document_id)
+        return self._serializer_class(full)(document).data
+
+    async def aget_document(self, document_id: uuid.UUID, full: bool = True) -> dict:
+        return await sync_to_async(self.get_document)(document_id, full)
+
+    def get_all_documents(
+        self,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        full: bool = False,
+        count: CountMode = "estimated",
+    ) -> Page:
+        """``exact`` and ``estimated`` counts both read the collection's
+        stats row, which is exact and costs one primary-key lookup."""
+        return keyset_page(
+            self._documents_queryset(full),
+            self._serializer_class(full),
+            limit,
+            cursor,
+            count,
+            known_count=(
+                self.document_count() if count in ("exact", "estimated") else None
+            ),
         )
-        return WorkspaceCollectionDocumentSerializer(document).data
-
-    def get_all_documents(self, limit: int = 10, offset: int = 0) -> dict:
-        queryset = WorkspaceCollectionDocument.objects.filter(
-            collection=self.collection
-        ).order_by("updated_at")
-        count = queryset.count()
-        documents = WorkspaceCollectionDocumentSerializer(
-            queryset[offset : offset + limit], many=True
-        ).data
-        return {"count": count, "response": documents}
-
-    async def aget_all_documents(self, limit: int = 10, offset: int = 0) -> dict:
-        queryset = WorkspaceCollectionDocument.objects.filter(
-            collection=self.collection
-        ).order_by("updated_at")
-        count = await sync_to_async(queryset.count)()
-        documents = WorkspaceCollectionDocumentSerializer(
-            await queryset[offset : offset + limit].all(), many=True
-        ).data
-        return {"count": count, "response": documents}
+
+    async def aget_all_documents(
+        self,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        full: bool = False,
+        count: CountMode = "estimated",
+    ) -> Page:
+        return await sync_to_async(self.get_all_documents)(limit, cursor, full, count)
 
     def delete_document(self, document_id: uuid.UUID) -> None:
         with transaction.atomic():
@@ -329,235 +784,1350 @@ class DocumentService:
                 id=document_id, collection=self.collection
             )
             document.delete()
+            self._invalidate()
 
     async def adelete_document(self, document_id: uuid.UUID) -> None:
-        async with transaction.atomic():
-            document = await WorkspaceCollectionDocument.objects.aget(
-                id=document_id, collection=self.collection
+        await sync_to_async(self.delete_document)(document_id)
+
+    def _build_documents(
+        self, documents: list[dict], vectors: Optional[list[list[float]]], user
+    ) -> list[WorkspaceCollectionDocument]:
+        built = []
+        for index, doc in enumerate(documents):
+            document = WorkspaceCollectionDocument(
+                collection=self.collection,
+                title=slugify(doc["title"]),
+                content=doc["content"],
+                content_hash=content_hash(doc["content"]),
+                metadata=doc.get("metadata", {}),
+                uri=doc.get("uri"),
+                created_by=user,
+                updated_by=user,
             )
-            await document.adelete()
+            if vectors is None:
+                document.mark_embedding_pending()
+            else:
+                document.set_embeddings(vectors[index], self.embedding_model)
+            built.append(document)
+        return built
 
-    def bulk_create_documents(
+    def _write_batch(
+        self, documents: list[WorkspaceCollectionDocument]
+    ) -> list[WorkspaceCollectionDocument]:
+        chunks, failed = self._prepare_chunks(documents)
+        with transaction.atomic():
+            created = WorkspaceCollectionDocument.objects.bulk_create(documents)
+            self._write_chunks(created, chunks, failed)
+            self._invalidate()
+            return created
+
+    def _embedding_batches(
+        self,
+        documents: list[dict],
+        batch_size: Optional[int],
+        max_batch_tokens: Optional[int],
+    ):
+        return iter_embedding_batches(
+            documents,
+            text=lambda doc: doc["content"],
+            batch_size=batch_size,
+            max_batch_tokens=max_batch_tokens,
+            model=getattr(self.embeddings, "model", None),
+        )
+
+    def bulk_ingest_documents(
         self,
         documents: list[dict],
         user,
+        batch_size: Optional[int] = None,
+        max_batch_tokens: Optional[int] = None,
+        atomic: bool = False,
+    ) -> BulkIngestReport:
+        """Embeds and inserts ``documents`` one batch at a time.
+
+        Each batch is a single ``embed_documents`` call followed by a single
+        ``bulk_create``. With ``atomic=False`` every batch commits on its own,
+        so a failure part way through keeps the batches already written.
+        """
+        started = time.perf_counter()
+        created_documents = []
+        timings: list[BatchTiming] = []
+
+        with transaction.atomic() if atomic else nullcontext():
+            batches = self._embedding_batches(documents, batch_size, max_batch_tokens)
+            for index, (batch, tokens) in enumerate(batches):
+                embed_started = time.perf_counter()
+                vectors = (
+                    None
+                    if self.defer_embeddings
+                    else self.embeddings.embed_documents(
+                        [doc["content"] for doc in batch]
+                    )
+                )
+                write_started = time.perf_counter()
+                created_documents.extend(
+                    self._write_batch(self._build_documents(batch, vectors, user))
+                )
+                timings.append(
+                    {
+                        "batch": index,
+                        "size": len(batch),
+                        "tokens": tokens,
+                        "embed_seconds": write_started - embed_started,
+                        "write_seconds": time.perf_counter() - write_started,
+                    }
+                )
+            self._schedule_pending_embeddings()
+
+        return {
+            "documents": created_documents,
+            "batches": timings,
+            "total_seconds": time.perf_counter() - started,
+        }
+
+    def _timed_write(
+        self, timing: BatchTiming, documents: list[WorkspaceCollectionDocument]
+    ) -> list[WorkspaceCollectionDocument]:
+        write_started = time.perf_counter()
+        created = self._write_batch(documents)
+        timing["write_seconds"] = time.perf_counter() - write_started
+        return created
+
+    def _write_batches_atomically(
+        self, batches: list[tuple[BatchTiming, list[WorkspaceCollectionDocument]]]
     ) -> list[WorkspaceCollectionDocument]:
         with transaction.atomic():
-            created_documents = []
-            for doc in documents:
-                document = WorkspaceCollectionDocument(
-                    collection=self.collection,
-                    title=doc["title"],
-                    content=doc["content"],
-                    metadata=doc.get("metadata", {}),
-                    created_by=user,
-                    updated_by=user,
+            created = []
+            for timing, documents in batches:
+                created.extend(self._timed_write(timing, documents))
+            self._schedule_pending_embeddings()
+            return created
+
+    async def abulk_ingest_documents(
+        self,
+        documents: list[dict],
+        user,
+        batch_size: Optional[int] = None,
+        max_batch_tokens: Optional[int] = None,
+        atomic: bool = False,
+    ) -> BulkIngestReport:
+        """Async ``bulk_ingest_documents``. With ``atomic=True`` every batch is
+        embedded first, then all of them are written in one transaction, which
+        cannot span several ``sync_to_async`` calls."""
+        started = time.perf_counter()
+        created_documents = []
+        timings: list[BatchTiming] = []
+        built = []
+
+        batches = self._embedding_batches(documents, batch_size, max_batch_tokens)
+        for index, (batch, tokens) in enumerate(batches):
+            embed_started = time.perf_counter()
+            vectors = (
+                None
+                if self.defer_embeddings
+                else await self.embeddings.aembed_documents(
+                    [doc["content"] for doc in batch]
                 )
-                document.save()
-                created_documents.append(document)
-            return created_documents
+            )
+            timing: BatchTiming = {
+                "batch": index,
+                "size": len(batch),
+                "tokens": tokens,
+                "embed_seconds": time.perf_counter() - embed_started,
+                "write_seconds": 0.0,
+            }
+            timings.append(timing)
+            batch_documents = self._build_documents(batch, vectors, user)
+            if atomic:
+                built.append((timing, batch_documents))
+            else:
+                created_documents.extend(
+                    await sync_to_async(self._timed_write)(timing, batch_documents)
+                )
+
+        if atomic:
+            created_documents = await sync_to_async(self._write_batches_atomically)(
+                built
+            )
+        else:
+            await sync_to_async(self._schedule_pending_embeddings)()
+
+        return {
+            "documents": created_documents,
+            "batches": timings,
+            "total_seconds": time.perf_counter() - started,
+        }
+
+    def bulk_create_documents(
+        self,
+        documents: list[dict],
+        user,
+        batch_size: Optional[int] = None,
+        max_batch_tokens: Optional[int] = None,
+    ) -> list[WorkspaceCollectionDocument]:
+        report = self.bulk_ingest_documents(
+            documents,
+            user,
+            batch_size=batch_size,
+            max_batch_tokens=max_batch_tokens,
+            atomic=True,
+        )
+        return report["documents"]
 
     async def abulk_create_documents(
         self,
         documents: list[dict],
         user,
+        batch_size: Optional[int] = None,
+        max_batch_tokens: Optional[int] = None,
     ) -> list[WorkspaceCollectionDocument]:
-        async with transaction.atomic():
-            created_documents = []
-            for doc in documents:
-                document = WorkspaceCollectionDocument(
-                    collection=self.collection,
-                    title=doc["title"],
-                    content=doc["content"],
-                    metadata=doc.get("metadata", {}),
-                    created_by=user,
-                    updated_by=user,
+        report = await self.abulk_ingest_documents(
+            documents,
+            user,
+            batch_size=batch_size,
+            max_batch_tokens=max_batch_tokens,
+            atomic=True,
+        )
+        return report["documents"]
+
+    def _ingest_lines(
+        self,
+        lines: list[tuple[int, dict]],
+        user,
+        max_batch_tokens: Optional[int],
+        report: StreamIngestReport,
+        errors_only: bool,
+    ) -> None:
+        batches = iter_embedding_batches(
+            lines,
+            text=lambda line: line[1]["content"],
+            max_batch_tokens=max_batch_tokens,
+            model=getattr(self.embeddings, "model", None),
+        )
+        for batch, _ in batches:
+            documents = [document for _, document in batch]
+            try:
+                vectors = (
+                    None
+                    if self.defer_embeddings
+                    else self.embeddings.embed_documents(
+                        [document["content"] for document in documents]
+                    )
+                )
+                built = self._build_documents(documents, vectors, user)
+                chunks, failed = self._prepare_chunks(built)
+                with transaction.atomic():
+                    created = copy_documents(built)
+                    self._write_chunks(created, chunks, failed)
+                    self._invalidate()
+            except Exception as e:
+                report["failed"] += len(batch)
+                report["results"].extend(
+                    {"line": number, "error": str(e)} for number, _ in batch
+                )
+                continue
+            report["batches"] += 1
+            report["created"] += len(created)
+            if not errors_only:
+                report["results"].extend(
+                    {"line": number, "id": str(document.id)}
+                    for (number, _), document in zip(batch, created)
                 )
-                await document.asave()
-                created_documents.append(document)
-            return created_documents
+
+    def ingest_ndjson(
+        self,
+        stream: BinaryIO,
+        user,
+        gzipped: bool = False,
+        batch_size: Optional[int] = None,
+        max_batch_tokens: Optional[int] = None,
+        errors_only: bool = False,
+    ) -> StreamIngestReport:
+        """Loads ``{title, content, metadata?, uri?}`` lines from an NDJSON
+        stream of any size.
+
+        The stream is parsed as it is read; at most ``batch_size`` lines are
+        held at once, embedded together and written with one ``COPY``. Every
+        batch commits on its own, and a failing batch is reported per line
+        without stopping the load.
+        """
+        batch_size = batch_size or kb_setting("VECTOR_DB_EMBEDDING_BATCH_SIZE")
+        report: StreamIngestReport = {
+            "created": 0,
+            "failed": 0,
+            "batches": 0,
+            "results": [],
+        }
+        lines = []
+        for number, document in iter_ndjson(stream, gzipped=gzipped):
+            if isinstance(document, Exception):
+                report["failed"] += 1
+                report["results"].append({"line": number, "error": str(document)})
+                continue
+            lines.append((number, document))
+            if len(lines) >= batch_size:
+                self._ingest_lines(lines, user, max_batch_tokens, report, errors_only)
+                lines = []
+        if lines:
+            self._ingest_lines(lines, user, max_batch_tokens, report, errors_only)
+        if report["created"]:
+            self._schedule_pending_embeddings()
+        report["results"].sort(key=lambda result: result["line"])
+        return report
+
+    def apply_document_updates(
+        self,
+        documents: list[dict],
+        user,
+        batch_size: Optional[int] = None,
+        max_batch_tokens: Optional[int] = None,
+    ) -> BulkUpdateReport:
+        """Updates many documents with one read and one write per group.
+
+        Only documents whose content hash changed are re-embedded (in batches,
+        before the write transaction opens); the rest are metadata-only
+        updates. Fields missing from an update keep their stored value.
+        """
+        updates = {uuid.UUID(str(doc["id"])): doc for doc in documents}
+        stored = {
+            document.id: document
+            for document in WorkspaceCollectionDocument.objects.filter(
+                id__in=list(updates), collection=self.collection
+            ).defer("embeddings", "search_vector")
+        }
+        missing = set(updates) - set(stored)
+        if missing:
+            raise WorkspaceCollectionDocument.DoesNotExist(
+                f"Documents not found: {', '.join(sorted(map(str, missing)))}"
+            )
+
+        now = timezone.now()
+        changed, unchanged = [], []
+        for document_id, doc in updates.items():
+            document = stored[document_id]
+            document.title = slugify(doc.get("title", document.title))
+            document.content = doc.get("content", document.content)
+            document.metadata = doc.get("metadata", document.metadata)
+            document.uri = doc.get("uri", document.uri)
+            document.updated_by = user
+            document.updated_at = now
+            digest = content_hash(document.content)
+            if digest != document.content_hash:
+                document.content_hash = digest
+                changed.append(document)
+            else:
+                unchanged.append(document)
+
+        if self.defer_embeddings:
+            for document in changed:
+                document.mark_embedding_pending()
+        else:
+            batches = iter_embedding_batches(
+                changed,
+                text=lambda document: document.content,
+                batch_size=batch_size,
+                max_batch_tokens=max_batch_tokens,
+                model=getattr(self.embeddings, "model", None),
+            )
+            for batch, _ in batches:
+                vectors = self.embeddings.embed_documents(
+                    [document.content for document in batch]
+                )
+                for document, vector in zip(batch, vectors):
+                    document.set_embeddings(vector, self.embedding_model)
+                    document.embedding_status = EmbeddingStatus.READY
+                    document.embedding_attempts = 0
+                    document.embedding_error = None
+                    document.embedding_retry_at = None
+
+        chunks, failed = self._prepare_chunks(changed)
+        common_fields = ["title", "metadata", "uri", "updated_by", "updated_at"]
+        with transaction.atomic():
+            WorkspaceCollectionDocument.objects.bulk_update(unchanged, common_fields)
+            WorkspaceCollectionDocument.objects.bulk_update(
+                changed,
+                common_fields
+                + [
+                    "content",
+                    "content_hash",
+                    "embeddings",
+                    "embedding_model",
+                    "embedding_dimensions",
+                    "staged_embeddings",
+                    "staged_embedding_model",
+                    "embedding_status",
+                    "embedding_attempts",
+                    "embedding_error",
+                    "embedding_retry_at",
+                ],
+            )
+            if changed:
+                self._write_chunks(changed, chunks, failed)
+                self._schedule_pending_embeddings()
+            self._invalidate()
+
+        return {
+            "documents": [stored[document_id] for document_id in updates],
+            "reembedded": len(changed),
+            "metadata_only": len(unchanged),
+        }
+
+    async def aapply_document_updates(
+        self,
+        documents: list[dict],
+        user,
+        batch_size: Optional[int] = None,
+        max_batch_tokens: Optional[int] = None,
+    ) -> BulkUpdateReport:
+        return await sync_to_async(self.apply_document_updates)(
+            documents, user, batch_size, max_batch_tokens
+        )
 
     def bulk_update_documents(
         self,
         documents: list[dict],
         user,
     ) -> list[WorkspaceCollectionDocument]:
-        with transaction.atomic():
-            updated_documents = []
-            for doc in documents:
-                document = WorkspaceCollectionDocument.objects.get(
-                    id=doc["id"], collection=self.collection
-                )
-                document.title = doc["title"]
-                document.content = doc["content"]
-                document.metadata = doc.get("metadata", {})
-                document.updated_by = user
-                document.save()
-                updated_documents.append(document)
-            return updated_documents
+        return self.apply_document_updates(documents, user)["documents"]
 
     async def abulk_update_documents(
         self,
         documents: list[dict],
         user,
     ) -> list[WorkspaceCollectionDocument]:
-        async with transaction.atomic():
-            updated_documents = []
-            for doc in documents:
-                document = await WorkspaceCollectionDocument.objects.aget(
-                    id=doc["id"], collection=self.collection
-                )
-                document.title = doc["title"]
-                document.content = doc["content"]
-                document.metadata = doc.get("metadata", {})
-                document.updated_by = user
-                await document.asave()
-                updated_documents.append(document)
-            return updated_documents
+        return await sync_to_async(self.bulk_update_documents)(documents, user)
 
     def bulk_delete_documents(self, document_ids: list[str]) -> None:
         with transaction.atomic():
             WorkspaceCollectionDocument.objects.filter(
                 id__in=document_ids, collection=self.collection
             ).delete()
+            self._invalidate()
 
     async def abulk_delete_documents(self, document_ids: list[str]) -> None:
-        async with transaction.atomic():
-            await WorkspaceCollectionDocument.objects.filter(
-                id__in=document_ids, collection=self.collection
-            ).adelete()
+        await sync_to_async(self.bulk_delete_documents)(document_ids)
 
-    def similarity_search(
-        self, query: str, top_k: int = 10
-    ) -> list[WorkspaceCollectionDocument]:
-        query_embedding = self.embeddings.embed_query(query)
-
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT id, 
-                    embeddings <-> %s::vector AS distance 
-                FROM knowledge_base_workspacecollectiondocument 
-                WHERE collection_id = %s 
-                ORDER BY distance 
-                LIMIT %s
-                """,
-                [query_embedding, self.collection.id, top_k],
-            )
-            results = cursor.fetchall()
-
-        document_ids = [result[0] for result in results]
-        documents = list(
-            WorkspaceCollectionDocument.objects.filter(id__in=document_ids).order_by(
-                Case(
-                    *[
-                        When(id=doc_id, then=pos)
-                        for pos, doc_id in enumerate(document_ids)
-                    ]
-                )
+    def _embed_query(self, query: str) -> list[float]:
+        if not self.query_cache:
+            return self.embeddings.embed_query(query)
+        return query_embedding_cache.get(
+            embedding_model_name(self.embeddings), query, self.embeddings.embed_query
+        )
+
+    async def _aembed_query(self, query: str) -> list[float]:
+        if not self.query_cache:
+            return await self.embeddings.aembed_query(query)
+        return await query_embedding_cache.aget(
+            embedding_model_name(self.embeddings), query, self.embeddings.aembed_query
+        )
+
+    def _embed_queries(self, queries: list[str]) -> list[list[float]]:
+        """Query vectors with one embedding request for the cache misses."""
+        if not self.query_cache:
+            return embed_queries(self.embeddings, queries)
+        return query_embedding_cache.get_many(
+            embedding_model_name(self.embeddings),
+            queries,
+            lambda texts: embed_queries(self.embeddings, texts),
+        )
+
+    async def _aembed_queries(self, queries: list[str]) -> list[list[float]]:
+        if not self.query_cache:
+            return await aembed_queries(self.embeddings, queries)
+        return await query_embedding_cache.aget_many(
+            embedding_model_name(self.embeddings),
+            queries,
+            lambda texts: aembed_queries(self.embeddings, texts),
+        )
+
+    def _collection_clause(
+        self, params: SqlParams, column: str = "collection_id"
+    ) -> str:
+        return f"{column} = {params.add(self.collection.id)}"
+
+    def _where(
+        self,
+        params: SqlParams,
+        include_pending: bool,
+        metadata_filter: Optional[dict] = None,
+    ) -> str:
+        clauses = [self._collection_clause(params)]
+        # Only vectors of the active model are comparable with the query's.
+        model = params.add(self.embedding_model)
+        if include_pending:
+            # Pending rows have no vector yet; they sort last.
+            clauses.append(f"(embedding_model = {model} OR embeddings IS NULL)")
+        else:
+            clauses.append(f"embedding_model = {model}")
+        if metadata_filter:
+            clauses.append(compile_metadata_filter(metadata_filter, params))
+        return " AND ".join(clauses)
+
+    def _precision(self) -> tuple[str, int]:
+        """The collection's index precision and its rerank factor (0: none)."""
+        if self.collection.vector_precision != VectorPrecision.HALF:
+            return VectorPrecision.FULL, 0
+        rerank_factor = self.collection.rerank_factor
+        if rerank_factor is None:
+            rerank_factor = kb_setting("VECTOR_DB_HALF_RERANK_FACTOR")
+        return VectorPrecision.HALF, rerank_factor
+
+    def _tuning(
+        self,
+        top_k: int,
+        rerank_factor: Optional[int] = None,
+    ) -> list[str]:
+        if rerank_factor is None:
+            _, rerank_factor = self._precision()
+        # An HNSW scan yields at most ef_search rows.
+        candidates = top_k * max(rerank_factor, 1)
+        # The ANN indexes span every collection and model, so the collection
+        # and model predicates, like a metadata filter, only apply to the
+        # candidates the index yields: widen the candidate list and let
+        # pgvector keep scanning (iterative_scan) when it runs short.
+        # IVFFlat lists are widened by the same factor. tuning_statements clamps
+        # both to pgvector's bounds.
+        ef_search = max(self.ef_search or 40, candidates * self.filter_overfetch)
+        probes = (self.probes or 1) * self.filter_overfetch
+        return tuning_statements(ef_search, probes, self.iterative_scan)
+
+    def _execute(self, build: Callable[[SqlParams], str], tuning: list[str]) -> list:
+        params = SqlParams("format")
+        sql = build(params)
+        with transaction.atomic(), connection.cursor() as cursor:
+            for statement in tuning:
+                cursor.execute(statement)
+            cursor.execute(sql, params.values)
+            return cursor.fetchall()
+
+    async def _aexecute(
+        self, build: Callable[[SqlParams], str], tuning: list[str]
+    ) -> list:
+        params = SqlParams("numeric")
+        sql = build(params)
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                for statement in tuning:
+                    await conn.execute(statement)
+                rows = await conn.fetch(sql, *params.values)
+        return [tuple(row) for row in rows]
+
+    def _knn_sql(
+        self,
+        params: SqlParams,
+        columns: list[str],
+        vector: Callable[[], str],
+        top_k: int,
+        include_pending: bool,
+        metadata_filter: Optional[dict] = None,
+        precision: Optional[str] = None,
+        rerank_factor: Optional[int] = None,
+    ) -> str:
+        """``columns`` plus ``distance`` of the ``top_k`` nearest documents,
+        searched at the collection's precision unless one is given.
+
+        ``vector`` returns the SQL for the query vector each time it is used
+        (a new placeholder, or a column of an enclosing query).
+        """
+        if precision is None:
+            precision, rerank_factor = self._precision()
+        if precision == VectorPrecision.FULL or not rerank_factor:
+            distance = distance_sql(vector(), precision=precision)
+            return f"""
+                SELECT {", ".join(columns)}, {distance} AS distance
+                FROM {DOCUMENT_TABLE}
+                WHERE {self._where(params, include_pending, metadata_filter)}
+                ORDER BY distance
+                LIMIT {params.add(top_k)}
+            """
+        # Approximate (halfvec or binary) candidates, reordered by their exact
+        # distance.
+        distance = distance_sql(vector())
+        candidate_columns = ", ".join(dict.fromkeys([*columns, "embeddings"]))
+        where = self._where(params, include_pending, metadata_filter)
+        approximate_distance = distance_sql(vector(), precision=precision)
+        return f"""
+            SELECT {", ".join(columns)}, {distance} AS distance
+            FROM (
+                SELECT {candidate_columns}
+                FROM {DOCUMENT_TABLE}
+                WHERE {where}
+                ORDER BY {approximate_distance}
+                LIMIT {params.add(top_k * rerank_factor)}
+            ) candidates
+            ORDER BY distance
+            LIMIT {params.add(top_k)}
+        """
+
+    def _nearest_sql(
+        self,
+        params: SqlParams,
+        columns: list[str],
+        query_embedding: list[float],
+        top_k: int,
+        include_pending: bool,
+        metadata_filter: Optional[dict] = None,
+    ) -> str:
+        return self._knn_sql(
+            params,
+            columns,
+            lambda: params.add(vector_literal(query_embedding)),
+            top_k,
+            include_pending,
+            metadata_filter,
+        )
+
+    def _batch_nearest_sql(
+        self,
+        params: SqlParams,
+        columns: list[str],
+        query_embeddings: list[list[float]],
+        top_k: int,
+        include_pending: bool,
+        metadata_filter: Optional[dict] = None,
+    ) -> str:
+        """One statement for many queries: a LATERAL top-k per query vector."""
+        vectors = params.add([vector_literal(vector) for vector in query_embeddings])
+        return f"""
+            SELECT q.ordinality - 1 AS query_index,
+                {", ".join(f"d.{column}" for column in columns)},
+                d.distance
+            FROM unnest({vectors}::text[]) WITH ORDINALITY AS q(vector, ordinality)
+            CROSS JOIN LATERAL (
+                {self._knn_sql(
+                    params,
+                    columns,
+                    lambda: "q.vector",
+                    top_k,
+                    include_pending,
+                    metadata_filter,
+                )}
+            ) d
+            ORDER BY q.ordinality, d.distance
+        """
+
+    def _hybrid_sql(
+        self,
+        params: SqlParams,
+        columns: list[str],
+        query: str,
+        query_embedding: list[float],
+        top_k: int,
+        include_pending: bool,
+        metadata_filter: Optional[dict],
+        candidates: int,
+        rrf_k: int,
+    ) -> str:
+        """Vector and full-text candidates fused with reciprocal rank fusion:
+        ``score = sum(1 / (rrf_k + rank))`` over the lists a document is in."""
+        # Placeholders are handed out in the order they appear in the SQL.
+        vector_candidates = self._knn_sql(
+            params,
+            ["id"],
+            lambda: params.add(vector_literal(query_embedding)),
+            candidates,
+            include_pending,
+            metadata_filter,
+        )
+        text_query = params.add(query)
+        text_where = self._where(params, include_pending, metadata_filter)
+        text_limit = params.add(candidates)
+        return f"""
+            WITH vector_hits AS (
+                SELECT id, row_number() OVER (ORDER BY distance) AS rank
+                FROM ({vector_candidates}) ranked
+            ),
+            text_hits AS (
+                SELECT id, row_number() OVER (ORDER BY score DESC) AS rank
+                FROM (
+                    SELECT id, ts_rank_cd(search_vector, text_query) AS score
+                    FROM {DOCUMENT_TABLE},
+                        websearch_to_tsquery('{TEXT_SEARCH_CONFIG}', {text_query}) text_query
+                    WHERE {text_where} AND search_vector @@ text_query
+                    ORDER BY score DESC
+                    LIMIT {text_limit}
+                ) ranked
+            ),
+            fused AS (
+                SELECT coalesce(v.id, t.id) AS id,
+                    coalesce(1.0 / ({int(rrf_k)} + v.rank), 0)
+                    + coalesce(1.0 / ({int(rrf_k)} + t.rank), 0) AS score
+                FROM vector_hits v
+                FULL OUTER JOIN text_hits t ON v.id = t.id
             )
+            SELECT {", ".join(f"d.{column}" for column in columns)},
+                fused.score::float8
+            FROM fused
+            JOIN {DOCUMENT_TABLE} d ON d.id = fused.id
+            ORDER BY fused.score DESC
+            LIMIT {params.add(top_k)}
+        """
+
+    def _hybrid_options(self, top_k: int, candidates, rrf_k) -> tuple[int, int]:
+        return (
+            candidates or max(top_k * kb_setting("VECTOR_DB_HYBRID_CANDIDATES"), 50),
+            rrf_k or kb_setting("VECTOR_DB_RRF_K"),
         )
-        return documents
 
-    def similarity_search_with_relevance_scores(
-        self, query: str, top_k: int = 10
+    def _quantized_options(self, overfetch: Optional[int]) -> int:
+        return max(overfetch or kb_setting("VECTOR_DB_BINARY_OVERFETCH"), 1)
+
+    def quantized_search_with_relevance_scores(
+        self,
+        query: str,
+        top_k: int = 10,
+        include_pending: bool = False,
+        fields: Optional[Sequence[str]] = None,
+        include_embeddings: bool = False,
+        metadata_filter: Optional[dict] = None,
+        overfetch: Optional[int] = None,
+    ) -> list[tuple[WorkspaceCollectionDocument, float]]:
+        """Two-stage search: ``top_k * overfetch`` candidates by Hamming
+        distance over binary-quantized embeddings (``build_vector_index
+        --precision binary``), reranked by exact distance."""
+        query_embedding = self._embed_query(query)
+        columns = search_columns(fields, include_embeddings)
+        overfetch = self._quantized_options(overfetch)
+        rows = self._execute(
+            lambda params: self._knn_sql(
+                params,
+                columns,
+                lambda: params.add(vector_literal(query_embedding)),
+                top_k,
+                include_pending,
+                metadata_filter,
+                precision="binary",
+                rerank_factor=overfetch,
+            ),
+            self._tuning(top_k, rerank_factor=overfetch),
+        )
+        return [documents_from_row(columns, row) for row in rows]
+
+    def quantized_search(self, query: str, top_k: int = 10, **options):
+        results = self.quantized_search_with_relevance_scores(query, top_k, **options)
+        return [document for document, _ in results]
+
+    async def aquantized_search_with_relevance_scores(
+        self,
+        query: str,
+        top_k: int = 10,
+        include_pending: bool = False,
+        fields: Optional[Sequence[str]] = None,
+        include_embeddings: bool = False,
+        metadata_filter: Optional[dict] = None,
+        overfetch: Optional[int] = None,
+    ) -> list[tuple[WorkspaceCollectionDocument, float]]:
+        query_embedding = await self._aembed_query(query)
+        columns = search_columns(fields, include_embeddings)
+        overfetch = self._quantized_options(overfetch)
+        rows = await self._aexecute(
+            lambda params: self._knn_sql(
+                params,
+                columns,
+                lambda: params.add(vector_literal(query_embedding)),
+                top_k,
+                include_pending,
+                metadata_filter,
+                precision="binary",
+                rerank_factor=overfetch,
+            ),
+            self._tuning(top_k, rerank_factor=overfetch),
+        )
+        return [documents_from_row(columns, row) for row in rows]
+
+    async def aquantized_search(self, query: str, top_k: int = 10, **options):
+        results = await self.aquantized_search_with_relevance_scores(
+            query, top_k, **options
+        )
+        return [document for document, _ in results]
+
+    def _chunk_sql(
+        self,
+        params: SqlParams,
+        query_embedding: list[float],
+        limit: int,
+        metadata_filter: Optional[dict] = None,
+    ) -> str:
+        """The ``limit`` nearest chunks; a metadata filter applies to their
+        parent documents."""
+        distance = distance_sql(
+            params.add(vector_literal(query_embedding)), column="c.embeddings"
+        )
+        clauses = [
+            self._collection_clause(params, "c.collection_id"),
+            f"c.embedding_model = {params.add(self.embedding_model)}",
+        ]
+        join = ""
+        if metadata_filter:
+            join = f"JOIN {DOCUMENT_TABLE} d ON d.id = c.document_id"
+            clauses.append(compile_metadata_filter(metadata_filter, params))
+        return f"""
+            SELECT {", ".join(f"c.{column}" for column in CHUNK_COLUMNS)},
+                {distance} AS distance
+            FROM {CHUNK_TABLE} c {join}
+            WHERE {" AND ".join(clauses)}
+            ORDER BY distance
+            LIMIT {params.add(limit)}
+        """
+
+    def _parent_sql(
+        self,
+        params: SqlParams,
+        columns: list[str],
+        query_embedding: list[float],
+        top_k: int,
+        candidates: int,
+        metadata_filter: Optional[dict] = None,
+    ) -> str:
+        """Documents ranked by their best chunk among the ``candidates``
+        nearest chunks."""
+        chunks = self._chunk_sql(params, query_embedding, candidates, metadata_filter)
+        return f"""
+            SELECT {", ".join(f"d.{column}" for column in columns)}, best.distance
+            FROM (
+                SELECT document_id, min(distance) AS distance
+                FROM ({chunks}) hits
+                GROUP BY document_id
+            ) best
+            JOIN {DOCUMENT_TABLE} d ON d.id = best.document_id
+            ORDER BY best.distance
+            LIMIT {params.add(top_k)}
+        """
+
+    def _chunk_candidates(self, top_k: int, candidates: Optional[int]) -> int:
+        return candidates or max(top_k * kb_setting("VECTOR_DB_CHUNK_CANDIDATES"), 50)
+
+    def chunk_search_with_relevance_scores(
+        self,
+        query: str,
+        top_k: int = 10,
+        metadata_filter: Optional[dict] = None,
+    ) -> list[tuple[WorkspaceCollectionDocumentChunk, float]]:
+        """The ``top_k`` nearest chunks (``id``, ``document_id``, ``position``,
+        ``content``) of chunked documents."""
+        query_embedding = self._embed_query(query)
+        rows = self._execute(
+            lambda params: self._chunk_sql(
+                params, query_embedding, top_k, metadata_filter
+            ),
+            self._tuning(top_k, rerank_factor=0),
+        )
+        return [chunk_from_row(row) for row in rows]
+
+    async def achunk_search_with_relevance_scores(
+        self,
+        query: str,
+        top_k: int = 10,
+        metadata_filter: Optional[dict] = None,
+    ) -> list[tuple[WorkspaceCollectionDocumentChunk, float]]:
+        query_embedding = await self._aembed_query(query)
+        rows = await self._aexecute(
+            lambda params: self._chunk_sql(
+                params, query_embedding, top_k, metadata_filter
+            ),
+            self._tuning(top_k, rerank_factor=0),
+        )
+        return [chunk_from_row(row) for row in rows]
+
+    def parent_document_search_with_relevance_scores(
+        self,
+        query: str,
+        top_k: int = 10,
+        fields: Optional[Sequence[str]] = None,
+        include_embeddings: bool = False,
+        metadata_filter: Optional[dict] = None,
+        candidates: Optional[int] = None,
+    ) -> list[tuple[WorkspaceCollectionDocument, float]]:
+        """Ranks chunks and collapses them to their parent documents, each
+        scored by the distance of its best chunk."""
+        query_embedding = self._embed_query(query)
+        columns = search_columns(fields, include_embeddings)
+        candidates = self._chunk_candidates(top_k, candidates)
+        rows = self._execute(
+            lambda params: self._parent_sql(
+                params, columns, query_embedding, top_k, candidates, metadata_filter
+            ),
+            self._tuning(candidates, rerank_factor=0),
+        )
+        return [documents_from_row(columns, row) for row in rows]
+
+    async def aparent_document_search_with_relevance_scores(
+        self,
+        query: str,
+        top_k: int = 10,
+        fields: Optional[Sequence[str]] = None,
+        include_embeddings: bool = False,
+        metadata_filter: Optional[dict] = None,
+        candidates: Optional[int] = None,
     ) -> list[tuple[WorkspaceCollectionDocument, float]]:
-        query_embedding = self.embeddings.embed_query(query)
-
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT id, 
-                       embeddings <-> %s::vector AS distance
-                FROM knowledge_base_workspacecollectiondocument 
-                WHERE collection_id = %s 
-                ORDER BY distance 
-                LIMIT %s
-                """,
-                [query_embedding, self.collection.id, top_k],
+        query_embedding = await self._aembed_query(query)
+        columns = search_columns(fields, include_embeddings)
+        candidates = self._chunk_candidates(top_k, candidates)
+        rows = await self._aexecute(
+            lambda params: self._parent_sql(
+                params, columns, query_embedding, top_k, candidates, metadata_filter
+            ),
+            self._tuning(candidates, rerank_factor=0),
+        )
+        return [documents_from_row(columns, row) for row in rows]
+
+    def _mmr_options(self, top_k: int, fetch_k, lambda_mult) -> tuple[int, float]:
+        fetch_k = fetch_k or kb_setting("VECTOR_DB_MMR_FETCH_K")
+        if lambda_mult is None:
+            lambda_mult = kb_setting("VECTOR_DB_MMR_LAMBDA")
+        return max(fetch_k, top_k), lambda_mult
+
+    @staticmethod
+    def _mmr_select(
+        columns: list[str],
+        rows: list[tuple],
+        query_embedding: list[float],
+        top_k: int,
+        lambda_mult: float,
+        include_embeddings: bool,
+    ) -> list[tuple[WorkspaceCollectionDocument, float]]:
+        """Picks ``top_k`` of the candidate ``rows`` (selected with their
+        embeddings) by maximal marginal relevance. Pending rows, which have
+        no vector, only fill the remaining places."""
+        index = columns.index("embeddings")
+        field = WorkspaceCollectionDocument._meta.get_field("embeddings")
+        vectors = [field.from_db_value(row[index], None, connection) for row in rows]
+        embedded = [i for i, vector in enumerate(vectors) if vector is not None]
+        chosen = [
+            embedded[i]
+            for i in maximal_marginal_relevance(
+                query_embedding, [vectors[i] for i in embedded], top_k, lambda_mult
             )
-            results = cursor.fetchall()
+        ]
+        chosen += [i for i, vector in enumerate(vectors) if vector is None]
+        if include_embeddings:
+            return [documents_from_row(columns, rows[i]) for i in chosen[:top_k]]
+        columns = columns[:index] + columns[index + 1 :]
+        return [
+            documents_from_row(columns, rows[i][:index] + rows[i][index + 1 :])
+            for i in chosen[:top_k]
+        ]
 
-        documents_with_relevance = []
-        for result in results:
-            document_id, distance = result
-            document = WorkspaceCollectionDocument.objects.get(id=document_id)
-            documents_with_relevance.append((document, distance))
+    def mmr_search_with_relevance_scores(
+        self,
+        query: str,
+        top_k: int = 10,
+        fetch_k: Optional[int] = None,
+        lambda_mult: Optional[float] = None,
+        include_pending: bool = False,
+        fields: Optional[Sequence[str]] = None,
+        include_embeddings: bool = False,
+        metadata_filter: Optional[dict] = None,
+    ) -> list[tuple[WorkspaceCollectionDocument, float]]:
+        """Max marginal relevance: the ``fetch_k`` nearest documents (with
+        their embeddings, in one query) are narrowed to ``top_k`` that are
+        relevant to the query but not to each other. Scores are distances."""
+        query_embedding = self._embed_query(query)
+        fetch_k, lambda_mult = self._mmr_options(top_k, fetch_k, lambda_mult)
+        columns = search_columns(fields, include_embeddings=True)
+        rows = self._execute(
+            lambda params: self._nearest_sql(
+                params, columns, query_embedding, fetch_k, include_pending, metadata_filter
+            ),
+            self._tuning(fetch_k),
+        )
+        return self._mmr_select(
+            columns, rows, query_embedding, top_k, lambda_mult, include_embeddings
+        )
 
-        return documents_with_relevance
+    def mmr_search(self, query: str, top_k: int = 10, **options):
+        results = self.mmr_search_with_relevance_scores(query, top_k, **options)
+        return [document for document, _ in results]
 
-    async def asimilarity_search(
-        self, query: str, top_k: int = 10
-    ) -> list[WorkspaceCollectionDocument]:
-        query_embedding = await self.embeddings.aembed_query(query)
-        query_embedding_str = "[" + ",".join(map(str, query_embedding)) + "]"
+    async def ammr_search_with_relevance_scores(
+        self,
+        query: str,
+        top_k: int = 10,
+        fetch_k: Optional[int] = None,
+        lambda_mult: Optional[float] = None,
+        include_pending: bool = False,
+        fields: Optional[Sequence[str]] = None,
+        include_embeddings: bool = False,
+        metadata_filter: Optional[dict] = None,
+    ) -> list[tuple[WorkspaceCollectionDocument, float]]:
+        query_embedding = await self._aembed_query(query)
+        fetch_k, lambda_mult = self._mmr_options(top_k, fetch_k, lambda_mult)
+        columns = search_columns(fields, include_embeddings=True)
+        rows = await self._aexecute(
+            lambda params: self._nearest_sql(
+                params, columns, query_embedding, fetch_k, include_pending, metadata_filter
+            ),
+            self._tuning(fetch_k),
+        )
+        return self._mmr_select(
+            columns, rows, query_embedding, top_k, lambda_mult, include_embeddings
+        )
 
-        async with self.pool.acquire() as conn:
-            results = await conn.fetch(
-                """
-                SELECT id, 
-                    embeddings <-> $1::vector AS distance 
-                FROM knowledge_base_workspacecollectiondocument 
-                WHERE collection_id = $2 
-                ORDER BY distance 
-                LIMIT $3
-                """,
-                query_embedding_str,
-                self.collection.id,
+    async def ammr_search(self, query: str, top_k: int = 10, **options):
+        results = await self.ammr_search_with_relevance_scores(query, top_k, **options)
+        return [document for document, _ in results]
+
+    def hybrid_search_with_relevance_scores(
+        self,
+        query: str,
+        top_k: int = 10,
+        include_pending: bool = False,
+        fields: Optional[Sequence[str]] = None,
+        include_embeddings: bool = False,
+        metadata_filter: Optional[dict] = None,
+        candidates: Optional[int] = None,
+        rrf_k: Optional[int] = None,
+    ) -> list[tuple[WorkspaceCollectionDocument, float]]:
+        """Lexical + vector search. Scores are fused RRF scores (higher is
+        better), not distances."""
+        query_embedding = self._embed_query(query)
+        columns = search_columns(fields, include_embeddings)
+        candidates, rrf_k = self._hybrid_options(top_k, candidates, rrf_k)
+        rows = self._execute(
+            lambda params: self._hybrid_sql(
+                params,
+                columns,
+                query,
+                query_embedding,
                 top_k,
-            )
+                include_pending,
+                metadata_filter,
+                candidates,
+                rrf_k,
+            ),
+            self._tuning(candidates),
+        )
+        return [documents_from_row(columns, row) for row in rows]
 
-        document_ids = [result["id"] for result in results]
-        queryset = WorkspaceCollectionDocument.objects.filter(id__in=document_ids)
-        documents = await sync_to_async(list)(
-            queryset.order_by(
-                Case(
-                    *[
-                        When(id=doc_id, then=pos)
-                        for pos, doc_id in enumerate(document_ids)
-                    ]
-                )
-            )
+    def hybrid_search(self, query: str, top_k: int = 10, **options):
+        results = self.hybrid_search_with_relevance_scores(query, top_k, **options)
+        return [document for document, _ in results]
+
+    async def ahybrid_search_with_relevance_scores(
+        self,
+        query: str,
+        top_k: int = 10,
+        include_pending: bool = False,
+        fields: Optional[Sequence[str]] = None,
+        include_embeddings: bool = False,
+        metadata_filter: Optional[dict] = None,
+        candidates: Optional[int] = None,
+        rrf_k: Optional[int] = None,
+    ) -> list[tuple[WorkspaceCollectionDocument, float]]:
+        query_embedding = await self._aembed_query(query)
+        columns = search_columns(fields, include_embeddings)
+        candidates, rrf_k = self._hybrid_options(top_k, candidates, rrf_k)
+        rows = await self._aexecute(
+            lambda params: self._hybrid_sql(
+                params,
+                columns,
+                query,
+                query_embedding,
+                top_k,
+                include_pending,
+                metadata_filter,
+                candidates,
+                rrf_k,
+            ),
+            self._tuning(candidates),
+        )
+        return [documents_from_row(columns, row) for row in rows]
+
+    async def ahybrid_search(self, query: str, top_k: int = 10, **options):
+        results = await self.ahybrid_search_with_relevance_scores(
+            query, top_k, **options
+        )
+        return [document for document, _ in results]
+
+    @staticmethod
+    def _group_by_query(
+        columns: list[str], rows: list[tuple], query_count: int
+    ) -> list[list[tuple[WorkspaceCollectionDocument, float]]]:
+        grouped = [[] for _ in range(query_count)]
+        for row in rows:
+            grouped[row[0]].append(documents_from_row(columns, tuple(row[1:])))
+        return grouped
+
+    def similarity_search_with_relevance_scores(
+        self,
+        query: str,
+        top_k: int = 10,
+        include_pending: bool = False,
+        fields: Optional[Sequence[str]] = None,
+        include_embeddings: bool = False,
+        metadata_filter: Optional[dict] = None,
+    ) -> list[tuple[WorkspaceCollectionDocument, float]]:
+        query_embedding = self._embed_query(query)
+        columns = search_columns(fields, include_embeddings)
+        rows = self._execute(
+            lambda params: self._nearest_sql(
+                params, columns, query_embedding, top_k, include_pending, metadata_filter
+            ),
+            self._tuning(top_k),
         )
+        return [documents_from_row(columns, row) for row in rows]
 
-        return documents
+    def similarity_search(
+        self,
+        query: str,
+        top_k: int = 10,
+        include_pending: bool = False,
+        fields: Optional[Sequence[str]] = None,
+        include_embeddings: bool = False,
+        metadata_filter: Optional[dict] = None,
+    ) -> list[WorkspaceCollectionDocument]:
+        results = self.similarity_search_with_relevance_scores(
+            query, top_k, include_pending, fields, include_embeddings, metadata_filter
+        )
+        return [document for document, _ in results]
 
     async def asimilarity_search_with_relevance_scores(
-        self, query: str, top_k: int = 10
+        self,
+        query: str,
+        top_k: int = 10,
+        include_pending: bool = False,
+        fields: Optional[Sequence[str]] = None,
+        include_embeddings: bool = False,
+        metadata_filter: Optional[dict] = None,
     ) -> list[tuple[WorkspaceCollectionDocument, float]]:
-        query_embedding = await self.embeddings.aembed_query(query)
-        query_embedding_str = "[" + ",".join(map(str, query_embedding)) + "]"
+        query_embedding = await self._aembed_query(query)
+        columns = search_columns(fields, include_embeddings)
+        rows = await self._aexecute(
+            lambda params: self._nearest_sql(
+                params, columns, query_embedding, top_k, include_pending, metadata_filter
+            ),
+            self._tuning(top_k),
+        )
+        return [documents_from_row(columns, row) for row in rows]
 
-        async with self.pool.acquire() as conn:
-            results = await conn.fetch(
-                """
-                SELECT id, 
-                    embeddings <-> $1::vector AS distance
-                FROM knowledge_base_workspacecollectiondocument 
-                WHERE collection_id = $2 
-                ORDER BY distance 
-                LIMIT $3
-                """,
-                query_embedding_str,
-                self.collection.id,
+    async def asimilarity_search(
+        self,
+        query: str,
+        top_k: int = 10,
+        include_pending: bool = False,
+        fields: Optional[Sequence[str]] = None,
+        include_embeddings: bool = False,
+        metadata_filter: Optional[dict] = None,
+    ) -> list[WorkspaceCollectionDocument]:
+        results = await self.asimilarity_search_with_relevance_scores(
+            query, top_k, include_pending, fields, include_embeddings, metadata_filter
+        )
+        return [document for document, _ in results]
+
+    def batch_similarity_search_with_relevance_scores(
+        self,
+        queries: list[str],
+        top_k: int = 10,
+        include_pending: bool = False,
+        fields: Optional[Sequence[str]] = None,
+        include_embeddings: bool = False,
+        metadata_filter: Optional[dict] = None,
+    ) -> list[list[tuple[WorkspaceCollectionDocument, float]]]:
+        """Searches for every query with one embedding request and one SQL
+        statement. Results are returned in the order of ``queries``."""
+        if not queries:
+            return []
+        query_embeddings = self._embed_queries(queries)
+        columns = search_columns(fields, include_embeddings)
+        rows = self._execute(
+            lambda params: self._batch_nearest_sql(
+                params,
+                columns,
+                query_embeddings,
                 top_k,
-            )
+                include_pending,
+                metadata_filter,
+            ),
+            self._tuning(top_k),
+        )
+        return self._group_by_query(columns, rows, len(queries))
 
-        document_ids = [result["id"] for result in results]
-        distances = [result["distance"] for result in results]
-        queryset = WorkspaceCollectionDocument.objects.filter(id__in=document_ids)
-        documents = await sync_to_async(list)(
-            queryset.order_by(
-                Case(
-                    *[
-                        When(id=doc_id, then=pos)
-                        for pos, doc_id in enumerate(document_ids)
-                    ]
-                )
+    def batch_similarity_search(
+        self,
+        queries: list[str],
+        top_k: int = 10,
+        include_pending: bool = False,
+        fields: Optional[Sequence[str]] = None,
+        include_embeddings: bool = False,
+        metadata_filter: Optional[dict] = None,
+    ) -> list[list[WorkspaceCollectionDocument]]:
+        results = self.batch_similarity_search_with_relevance_scores(
+            queries, top_k, include_pending, fields, include_embeddings, metadata_filter
+        )
+        return [[document for document, _ in hits] for hits in results]
+
+    async def abatch_similarity_search_with_relevance_scores(
+        self,
+        queries: list[str],
+        top_k: int = 10,
+        include_pending: bool = False,
+        fields: Optional[Sequence[str]] = None,
+        include_embeddings: bool = False,
+        metadata_filter: Optional[dict] = None,
+    ) -> list[list[tuple[WorkspaceCollectionDocument, float]]]:
+        if not queries:
+            return []
+        query_embeddings = await self._aembed_queries(queries)
+        columns = search_columns(fields, include_embeddings)
+        rows = await self._aexecute(
+            lambda params: self._batch_nearest_sql(
+                params,
+                columns,
+                query_embeddings,
+                top_k,
+                include_pending,
+                metadata_filter,
+            ),
+            self._tuning(top_k),
+        )
+        return self._group_by_query(columns, rows, len(queries))
+
+    async def abatch_similarity_search(
+        self,
+        queries: list[str],
+        top_k: int = 10,
+        include_pending: bool = False,
+        fields: Optional[Sequence[str]] = None,
+        include_embeddings: bool = False,
+        metadata_filter: Optional[dict] = None,
+    ) -> list[list[WorkspaceCollectionDocument]]:
+        results = await self.abatch_similarity_search_with_relevance_scores(
+            queries, top_k, include_pending, fields, include_embeddings, metadata_filter
+        )
+        return [[document for document, _ in hits] for hits in results]
+
+
+class MultiCollectionDocumentService(DocumentService):
+    """Searches several collections at once.
+
+    The query is embedded once and every search method of ``DocumentService``
+    (similarity, batch, hybrid, MMR, quantized) runs as a single statement
+    over ``collection_id = ANY(...)``, so results are ranked globally. Each
+    result carries its ``collection_id`` (keep it in ``fields``), and
+    ``serialize_documents`` nests the matching collection. Document reads
+    and listing span all the collections too. Write methods
+    raise ``ValueError``: writes go through the ``DocumentService`` of one
+    collection.
+    """
+
+    def __init__(self, collection_names: Sequence[str], embeddings, **options):
+        super().__init__(
+            collection_name=",".join(collection_names),
+            embeddings=embeddings,
+            **options,
+        )
+        self.collection_names = list(collection_names)
+        self.collections: dict[uuid.UUID, WorkspaceCollection] = {}
+
+    def _load_collections(self) -> None:
+        collections = WorkspaceCollection.objects.in_bulk(
+            self.collection_names, field_name="name"
+        )
+        missing = set(self.collection_names) - set(collections)
+        if not collections:
+            raise ValueError("No collections to search.")
+        if missing:
+            raise WorkspaceCollection.DoesNotExist(
+                f"Unknown collections: {', '.join(sorted(missing))}"
+            )
+        models = {collection.embedding_model for collection in collections.values()}
+        if len(models) > 1:
+            raise ValueError(
+                "Collections embedded with different models cannot be searched "
+                f"together: {', '.join(sorted(models))}"
             )
+        self.collections = {
+            collection.id: collection for collection in collections.values()
+        }
+
+    @property
+    def embedding_model(self) -> str:
+        return next(iter(self.collections.values())).embedding_model
+
+    @classmethod
+    def from_default_settings(cls, collection_names: Sequence[str], **options):
+        instance = cls(
+            collection_names=collection_names,
+            embeddings=None,
+            pool=None,
+            **options,
+        )
+        instance._load_collections()
+        instance.embeddings = get_embeddings_service(instance.embedding_model)
+        return instance
+
+    @classmethod
+    async def afrom_default_settings(
+        cls, collection_names: Sequence[str], **options
+    ):
+        instance = cls(
+            collection_names=collection_names,
+            embeddings=None,
+            pool=await get_pool(),
+            **options,
         )
-        documents_with_relevance = [
-            (document, distance) for document, distance in zip(documents, distances)
+        await sync_to_async(instance._load_collections)()
+        instance.embeddings = get_embeddings_service(instance.embedding_model)
+        return instance
+
+    def _collection_clause(
+        self, params: SqlParams, column: str = "collection_id"
+    ) -> str:
+        return f"{column} = ANY({params.add(list(self.collections))}::uuid[])"
+
+    def _precision(self) -> tuple[str, int]:
+        """The shared index precision of the collections; full precision when
+        they differ, since one statement can only order by one expression."""
+        precisions = {
+            collection.vector_precision for collection in self.collections.values()
+        }
+        if precisions != {VectorPrecision.HALF}:
+            return VectorPrecision.FULL, 0
+        rerank_factors = [
+            collection.rerank_factor
+            for collection in self.collections.values()
+            if collection.rerank_factor is not None
         ]
+        return VectorPrecision.HALF, (
+            max(rerank_factors)
+            if rerank_factors
+            else kb_setting("VECTOR_DB_HALF_RERANK_FACTOR")
+        )
+
+    def serialize_documents(
+        self, documents: list[WorkspaceCollectionDocument], full: bool = False
+    ) -> list[dict]:
+        for document in documents:
+            document.collection = self.collections[document.collection_id]
+        prefetch_related_objects(documents, "created_by", "updated_by")
+        return self._serializer_class(full)(documents, many=True).data
+
+    def _documents(self):
+        return WorkspaceCollectionDocument.objects.filter(
+            collection_id__in=list(self.collections)
+        )
+
+    def document_count(self) -> int:
+        return (
+            WorkspaceCollectionStats.objects.filter(
+                collection_id__in=list(self.collections)
+            ).aggregate(total=Sum("document_count"))["total"]
+            or 0
+        )
+
+    def _read_only(self, *args, **kwargs):
+        raise ValueError(
+            "A multi-collection service is read-only; write through the "
+            "DocumentService of the document's collection."
+        )
+
+    create_document = _read_only
+    update_document = _read_only
+    delete_document = _read_only
+    bulk_ingest_documents = _read_only
+    ingest_ndjson = _read_only
+    apply_document_updates = _read_only
+    bulk_delete_documents = _read_only
 
-        return documents_with_relevance
+    async def abulk_ingest_documents(self, *args, **kwargs):
+        self._read_only()
@@ -0,0 +1,97 @@
+from typing import List, Optional, Sequence, TypedDict
+from django.db import transaction
+from django.db.models import BigIntegerField, Count, F, Func, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import WorkspaceCollection, WorkspaceCollectionStats
+
+STATS_FIELDS = ("document_count", "content_bytes", "embedded_count")
+
+
+class StatsDrift(TypedDict):
+    collection: str
+    field: str
+    stored: Optional[int]
+    actual: int
+
+
+def _actual_totals(collection_ids: Sequence) -> dict:
+    documents = "workspace_collection_documents"
+    rows = (
+        WorkspaceCollection.objects.filter(id__in=collection_ids)
+        .annotate(
+            document_count=Count(documents),
+            content_bytes=Coalesce(
+                Sum(
+                    Func(
+                        F(f"{documents}__content"),
+                        function="octet_length",
+                        output_field=BigIntegerField(),
+                    )
+                ),
+                0,
+            ),
+            embedded_count=Count(f"{documents}__embeddings"),
+        )
+        .values("id", "name", *STATS_FIELDS)
+    )
+    return {row["id"]: row for row in rows}
+
+
+def reconcile_collection_stats(
+    collection_names: Optional[Sequence[str]] = None, fix: bool = True
+) -> List[StatsDrift]:
+    """Recounts the documents of the given collections (all when ``None``),
+    returns where the stored stats disagree and, with ``fix``, overwrites them.
+
+    The stats rows are locked before counting, so writers committing
+    meanwhile wait for the fix instead of having their deltas overwritten.
+    """
+    collections = WorkspaceCollection.objects.order_by("id")
+    if collection_names is not None:
+        collections = collections.filter(name__in=collection_names)
+
+    with transaction.atomic():
+        collection_ids = list(collections.values_list("id", flat=True))
+        stored = {
+            stats.collection_id: stats
+            for stats in WorkspaceCollectionStats.objects.select_for_update()
+            .filter(collection_id__in=collection_ids)
+            .order_by("collection_id")
+        }
+        actual = _actual_totals(collection_ids)
+
+        drift: List[StatsDrift] = []
+        fixed = []
+        for collection_id, totals in actual.items():
+            stats = stored.get(collection_id)
+            drifted = False
+            for field in STATS_FIELDS:
+                stored_value = getattr(stats, field) if stats is not None else None
+                if stored_value != totals[field]:
+                    drift.append(
+                        {
+                            "collection": totals["name"],
+                            "field": field,
+                            "stored": stored_value,
+                            "actual": totals[field],
+                        }
+                    )
+                    drifted = True
+            if drifted:
+                fixed.append(
+                    WorkspaceCollectionStats(
+                        collection_id=collection_id,
+                        updated_at=timezone.now(),
+                        **{field: totals[field] for field in STATS_FIELDS},
+                    )
+                )
+
+        if fix and fixed:
+            WorkspaceCollectionStats.objects.bulk_create(
+                fixed,
+                update_conflicts=True,
+                unique_fields=["collection"],
+                update_fields=[*STATS_FIELDS, "updated_at"],
+            )
+    return drift
@@ -0,0 +1,60 @@
+from celery import shared_task
+from .embeddings import evict_embedding_cache
+from .embedding_queue import drain_pending_embeddings
+from .models import ReembeddingStatus
+from .reembedding import run_reembedding_job
+
+
+@shared_task
+def evict_embedding_cache_task(
+    max_age_days: int | None = None, max_entries: int | None = None
+) -> int:
+    return evict_embedding_cache(max_age_days=max_age_days, max_entries=max_entries)
+
+
+@shared_task(bind=True, max_retries=20)
+def embed_pending_documents(
+    self,
+    collection_id: str | None = None,
+    batch_size: int | None = None,
+    max_batches: int | None = 20,
+):
+    try:
+        report = drain_pending_embeddings(
+            batch_size=batch_size,
+            max_batches=max_batches,
+            collection_id=collection_id,
+        )
+    except Exception as exc:
+        countdown = 2 ** self.request.retries
+        raise self.retry(exc=exc, countdown=countdown)
+
+    if max_batches is not None and report["batches"] >= max_batches:
+        # Queue is deeper than one run; hand the rest to a fresh task so a
+        # single worker slot is never held indefinitely.
+        self.apply_async(
+            kwargs={
+                "collection_id": collection_id,
+                "batch_size": batch_size,
+                "max_batches": max_batches,
+            }
+        )
+    return report
+
+
+@shared_task(bind=True, max_retries=20)
+def reembed_collection(self, job_id: str, max_batches: int | None = 50):
+    try:
+        job = run_reembedding_job(job_id, max_batches=max_batches)
+    except Exception as exc:
+        countdown = 2 ** self.request.retries
+        raise self.retry(exc=exc, countdown=countdown)
+
+    if job.status == ReembeddingStatus.RUNNING:
+        # Continue in a fresh task; the job resumes from its stored cursor.
+        self.apply_async(kwargs={"job_id": job_id, "max_batches": max_batches})
+    elif job.status == ReembeddingStatus.COMPLETED:
+        # Documents written with the old model during the swap were reset to
+        # pending; embed them with the new one.
+        embed_pending_documents.delay(collection_id=str(job.collection_id))
+    return {"status": job.status, "processed": job.processed, "total": job.total}
@@ -0,0 +1,125 @@
+import io
+import uuid
+from datetime import datetime, timezone
+import numpy as np
+from django.test import SimpleTestCase
+from ..archive import (
+    ARCHIVE_FIELDS,
+    archive_schema,
+    batch_rows,
+    check_compression,
+    open_archive,
+    read_batches,
+    write_archive,
+)
+from ..models import WorkspaceCollection
+
+DIMENSIONS = 3
+CREATED_AT = datetime(2026, 10, 1, 8, 0, tzinfo=timezone.utc)
+UPDATED_AT = datetime(2026, 10, 17, 9, 30, 15, 250000, tzinfo=timezone.utc)
+
+
+def _collection() -> WorkspaceCollection:
+    return WorkspaceCollection(
+        name="handbook",
+        description="Employee handbook",
+        embedding_model="text-embedding-3-small",
+        vector_precision="half",
+        rerank_factor=4,
+        chunk_method="recursive",
+        chunk_options={"chunk_size": 800},
+    )
+
+
+def _row(index: int, embeddings) -> tuple:
+    return (
+        uuid.uuid4(),
+        f"document-{index}",
+        f"Content of document {index}",
+        f"hash-{index}",
+        {"index": index, "tags": ["a", "b"]} if index % 2 else None,
+        f"https://example.com/{index}" if index % 2 else None,
+        "text-embedding-3-small",
+        CREATED_AT,
+        UPDATED_AT,
+        embeddings,
+    )
+
+
+class ArchiveRoundTripTests(SimpleTestCase):
+    def setUp(self):
+        self.schema = archive_schema(_collection(), DIMENSIONS)
+        self.rows = [
+            _row(0, np.array([0.1, 0.2, 0.3], dtype=np.float32)),
+            _row(1, None),
+            _row(2, [1.0, -2.5, 3.25]),
+            # Another model's dimensions: exported as missing.
+            _row(3, [1.0, 2.0]),
+            _row(4, np.array([1e-8, 0.0, -1.0], dtype=np.float32)),
+        ]
+
+    def _read(self, data: bytes) -> tuple[dict, int, list[dict]]:
+        settings, dimensions, reader = open_archive(io.BytesIO(data))
+        documents = [
+            row for batch in read_batches(reader) for row in batch_rows(batch)
+        ]
+        return settings, dimensions, documents
+
+    def _archive(self, compression="zstd") -> list[bytes]:
+        return list(
+            write_archive(
+                self.schema, iter([self.rows[:2], self.rows[2:]]), compression
+            )
+        )
+
+    def test_round_trip(self):
+        for compression in ("zstd", "lz4", None):
+            with self.subTest(compression=compression):
+                settings, dimensions, documents = self._read(
+                    b"".join(self._archive(compression))
+                )
+                self.assertEqual(dimensions, DIMENSIONS)
+                self.assertEqual(
+                    settings,
+                    {
+                        "name": "handbook",
+                        "description": "Employee handbook",
+                        "embedding_model": "text-embedding-3-small",
+                        "vector_precision": "half",
+                        "rerank_factor": 4,
+                        "chunk_method": "recursive",
+                        "chunk_options": {"chunk_size": 800},
+                    },
+                )
+                self.assertEqual(len(documents), len(self.rows))
+                for row, document in zip(self.rows, documents):
+                    expected = dict(zip(ARCHIVE_FIELDS, row))
+                    expected["id"] = str(expected["id"])
+                    self.assertEqual(
+                        {field: document[field] for field in ARCHIVE_FIELDS}, expected
+                    )
+
+                vectors = [document["embeddings"] for document in documents]
+                self.assertIsNone(vectors[1])
+                self.assertIsNone(vectors[3])
+                for index in (0, 2, 4):
+                    self.assertEqual(vectors[index].dtype, np.float32)
+                    np.testing.assert_array_equal(
+                        vectors[index], np.asarray(self.rows[index][-1], np.float32)
+                    )
+
+    def test_empty_collection(self):
+        data = b"".join(write_archive(self.schema, iter([])))
+        self.assertEqual(self._read(data)[2], [])
+
+    def test_rejects_truncated_archive(self):
+        # Everything but the closing batch, as left by an export that failed.
+        data = b"".join(self._archive()[:-1])
+        with self.assertRaisesMessage(ValueError, "truncated"):
+            self._read(data)
+
+    def test_rejects_unknown_compression(self):
+        with self.assertRaises(ValueError):
+            check_compression("brotli-9000")
+        check_compression(None)
+        check_compression("zstd")
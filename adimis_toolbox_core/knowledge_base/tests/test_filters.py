@@ -0,0 +1,173 @@
+from django.test import SimpleTestCase, TestCase
+from ..embeddings import DeterministicEmbeddings
+from ..filters import compile_metadata_filter
+from ..models import WorkspaceCollectionDocument
+from ..services import CollectionService, DocumentService
+from ..vector_sql import SqlParams
+
+NUMBER_RANGE = (
+    "CASE WHEN jsonb_typeof(metadata -> %s) = 'number' "
+    "THEN (metadata ->> %s)::float8 END {} %s::float8"
+)
+
+# (filter, SQL, params) with psycopg placeholders.
+CASES = [
+    ({}, "(TRUE)", []),
+    ({"topic": "faq"}, "(metadata @> %s::jsonb)", ['{"topic": "faq"}']),
+    (
+        {"source": {"kind": "web"}},
+        "(metadata @> %s::jsonb)",
+        ['{"source": {"kind": "web"}}'],
+    ),
+    ({"topic": {"$eq": "faq"}}, "(metadata @> %s::jsonb)", ['{"topic": "faq"}']),
+    (
+        {"topic": {"$ne": "faq"}},
+        "((metadata IS NULL OR NOT (metadata ? %s) OR NOT (metadata @> %s::jsonb)))",
+        ["topic", '{"topic": "faq"}'],
+    ),
+    (
+        {"tag": {"$in": ["a", "b"]}},
+        "((metadata @> %s::jsonb OR metadata @> %s::jsonb))",
+        ['{"tag": "a"}', '{"tag": "b"}'],
+    ),
+    (
+        {"tag": {"$nin": ["a", "b"]}},
+        "((metadata IS NULL OR NOT (metadata ? %s) "
+        "OR NOT (metadata @> %s::jsonb OR metadata @> %s::jsonb)))",
+        ["tag", '{"tag": "a"}', '{"tag": "b"}'],
+    ),
+    ({"tag": {"$in": []}}, "(FALSE)", []),
+    ({"tag": {"$nin": []}}, "(TRUE)", []),
+    ({"tag": {"$exists": True}}, "(metadata ? %s)", ["tag"]),
+    (
+        {"tag": {"$exists": False}},
+        "((metadata IS NULL OR NOT (metadata ? %s)))",
+        ["tag"],
+    ),
+    (
+        {"year": {"$gte": 2020}},
+        "(" + NUMBER_RANGE.format(">=") + ")",
+        ["year", "year", 2020.0],
+    ),
+    (
+        {"year": {"$gt": 2000, "$lt": 2010.5}},
+        "(" + NUMBER_RANGE.format(">") + " AND " + NUMBER_RANGE.format("<") + ")",
+        ["year", "year", 2000.0, "year", "year", 2010.5],
+    ),
+    ({"name": {"$lte": "m"}}, "(metadata ->> %s <= %s)", ["name", "m"]),
+    (
+        {"topic": "faq", "tag": {"$exists": True}},
+        "(metadata @> %s::jsonb AND metadata ? %s)",
+        ['{"topic": "faq"}', "tag"],
+    ),
+    (
+        {"$or": [{"topic": "faq"}, {"topic": "howto"}]},
+        "(((metadata @> %s::jsonb) OR (metadata @> %s::jsonb)))",
+        ['{"topic": "faq"}', '{"topic": "howto"}'],
+    ),
+    (
+        {"$and": [{"tag": {"$exists": True}}, {"$or": [{"a": 1}, {"b": 2}]}]},
+        "(((metadata ? %s) AND (((metadata @> %s::jsonb) OR "
+        "(metadata @> %s::jsonb)))))",
+        ["tag", '{"a": 1}', '{"b": 2}'],
+    ),
+]
+
+
+class CompileMetadataFilterTests(SimpleTestCase):
+    def test_compiles_filters(self):
+        for metadata_filter, sql, values in CASES:
+            with self.subTest(metadata_filter=metadata_filter):
+                params = SqlParams("format")
+                self.assertEqual(compile_metadata_filter(metadata_filter, params), sql)
+                self.assertEqual(params.values, values)
+                # psycopg binds "%s" placeholders positionally.
+                self.assertEqual(sql.count("%s"), len(params.values))
+
+    def test_numbers_placeholders_in_order(self):
+        params = SqlParams("numeric")
+        params.add("collection")
+        sql = compile_metadata_filter(
+            {"tag": {"$exists": True}, "topic": "faq"}, params
+        )
+        self.assertEqual(sql, "(metadata ? $2 AND metadata @> $3::jsonb)")
+        self.assertEqual(params.values, ["collection", "tag", '{"topic": "faq"}'])
+
+    def test_rejects_invalid_filters(self):
+        for metadata_filter in [
+            {"tag": {"$in": "a"}},
+            {"tag": {"$nin": "a"}},
+            {"year": {"$gt": True}},
+            {"year": {"$gt": [2020]}},
+            {"tag": {"$regex": "a.*"}},
+            {"tag": {}},
+            {"$and": []},
+            {"$or": []},
+        ]:
+            with self.subTest(metadata_filter=metadata_filter):
+                with self.assertRaises(ValueError):
+                    compile_metadata_filter(metadata_filter, SqlParams("format"))
+
+
+# Documents of the search test, by title, and the titles each filter keeps.
+SEARCH_METADATA = {
+    "faq-2019": {"topic": "faq", "year": 2019, "tag": "a"},
+    "howto-2021": {"topic": "howto", "year": 2021, "tag": "b"},
+    "faq-undated": {"topic": "faq", "year": "unknown"},
+    "no-metadata": None,
+}
+SEARCH_CASES = [
+    ({"topic": "faq"}, {"faq-2019", "faq-undated"}),
+    ({"topic": {"$ne": "faq"}}, {"howto-2021", "no-metadata"}),
+    ({"topic": {"$in": ["howto", "news"]}}, {"howto-2021"}),
+    ({"tag": {"$nin": ["a"]}}, {"howto-2021", "faq-undated", "no-metadata"}),
+    ({"tag": {"$exists": True}}, {"faq-2019", "howto-2021"}),
+    ({"tag": {"$exists": False}}, {"faq-undated", "no-metadata"}),
+    ({"year": {"$gt": 2020}}, {"howto-2021"}),
+    ({"year": {"$gte": 2019}}, {"faq-2019", "howto-2021"}),
+    ({"year": {"$lt": 2020}}, {"faq-2019"}),
+    ({"year": {"$lte": 2021.0}}, {"faq-2019", "howto-2021"}),
+    ({"topic": {"$lt": "g"}}, {"faq-2019", "faq-undated"}),
+    ({"$or": [{"tag": "a"}, {"tag": "b"}]}, {"faq-2019", "howto-2021"}),
+    (
+        {"$and": [{"topic": "faq"}, {"year": {"$exists": True}}]},
+        {"faq-2019", "faq-undated"},
+    ),
+]
+
+
+class MetadataFilterSearchTests(TestCase):
+    """Runs every operator through a sync search, which binds ``%s``
+    placeholders positionally."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.embeddings = DeterministicEmbeddings()
+        collection = CollectionService.create_collection("filter-search", "", None)
+        collection.embedding_model = cls.embeddings.model
+        collection.save(update_fields=["embedding_model"])
+        documents = []
+        for title, metadata in SEARCH_METADATA.items():
+            document = WorkspaceCollectionDocument(
+                collection=collection,
+                title=title,
+                content=f"{title} content",
+                metadata=metadata,
+            )
+            document.set_embeddings(
+                cls.embeddings.embed_query(document.content), cls.embeddings.model
+            )
+            documents.append(document)
+        WorkspaceCollectionDocument.objects.bulk_create(documents)
+
+    def test_search_with_each_operator(self):
+        service = DocumentService(
+            "filter-search", self.embeddings, query_cache=False
+        )
+        service.collection = service._get_collection_by_name("filter-search")
+        for metadata_filter, titles in SEARCH_CASES:
+            with self.subTest(metadata_filter=metadata_filter):
+                hits = service.similarity_search_with_relevance_scores(
+                    "content", top_k=10, metadata_filter=metadata_filter
+                )
+                self.assertEqual({document.title for document, _ in hits}, titles)
@@ -0,0 +1,36 @@
+import base64
+import json
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from django.test import SimpleTestCase
+from ..pagination import decode_cursor, encode_cursor
+
+
+def _cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        document = SimpleNamespace(
+            updated_at=datetime(2026, 10, 17, 9, 30, 15, 123456, tzinfo=timezone.utc),
+            id=uuid.uuid4(),
+        )
+        cursor = encode_cursor(document)
+        self.assertNotIn("=", cursor)
+        self.assertEqual(decode_cursor(cursor), (document.updated_at, document.id))
+
+    def test_rejects_invalid_cursors(self):
+        for cursor in [
+            "",
+            "not-a-cursor",
+            _cursor({"updated_at": "2026-10-17T09:30:00+00:00"}),
+            _cursor(["2026-10-17T09:30:00+00:00"]),
+            _cursor(["yesterday", str(uuid.uuid4())]),
+            _cursor([1, str(uuid.uuid4())]),
+            _cursor(["2026-10-17T09:30:00+00:00", "not-a-uuid"]),
+        ]:
+            with self.subTest(cursor=cursor):
+                with self.assertRaisesMessage(ValueError, "Invalid cursor"):
+                    decode_cursor(cursor)
@@ -0,0 +1,49 @@
+import asyncio
+from django.test import SimpleTestCase
+from ..query_cache import QueryEmbeddingCache
+
+VECTOR = [0.6, 0.8]
+
+
+class SingleFlightTests(SimpleTestCase):
+    async def _start(self, cache: QueryEmbeddingCache, calls: list, waiters: int):
+        """A leader stuck in its embedding request and ``waiters`` tasks
+        coalesced onto it."""
+        started = asyncio.Event()
+
+        async def embed(text):
+            calls.append(text)
+            if len(calls) == 1:
+                started.set()
+                await asyncio.sleep(3600)
+            return VECTOR
+
+        leader = asyncio.create_task(cache.aget("model", "query", embed))
+        await started.wait()
+        followers = [
+            asyncio.create_task(cache.aget("model", "query", embed))
+            for _ in range(waiters)
+        ]
+        await asyncio.sleep(0)
+        return leader, followers
+
+    async def test_waiters_take_over_from_a_cancelled_leader(self):
+        cache, calls = QueryEmbeddingCache(), []
+        leader, followers = await self._start(cache, calls, 3)
+
+        leader.cancel()
+        self.assertEqual(await asyncio.gather(*followers), [VECTOR] * 3)
+        self.assertTrue(leader.cancelled())
+        # One waiter repeated the request; the others shared its result.
+        self.assertEqual(calls, ["query", "query"])
+
+    async def test_cancelled_waiter_leaves_the_leader_running(self):
+        cache, calls = QueryEmbeddingCache(), []
+        leader, followers = await self._start(cache, calls, 2)
+
+        followers[0].cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await followers[0]
+        self.assertFalse(leader.done())
+        leader.cancel()
+        self.assertEqual(await followers[1], VECTOR)
@@ -0,0 +1,30 @@
+from django.test import SimpleTestCase
+from ..ranking import maximal_marginal_relevance
+
+QUERY = [1.0, 0.0]
+# Two copies of the best match and a less relevant, different one.
+EMBEDDINGS = [[1.0, 0.0], [2.0, 0.0], [0.6, 0.8]]
+
+
+class MaximalMarginalRelevanceTests(SimpleTestCase):
+    def test_relevance_only(self):
+        self.assertEqual(maximal_marginal_relevance(QUERY, EMBEDDINGS, 3, 1.0), [0, 1, 2])
+
+    def test_diversity_skips_duplicates(self):
+        self.assertEqual(maximal_marginal_relevance(QUERY, EMBEDDINGS, 2, 0.3), [0, 2])
+
+    def test_k_bounds(self):
+        self.assertEqual(len(maximal_marginal_relevance(QUERY, EMBEDDINGS, 10)), 3)
+        self.assertEqual(maximal_marginal_relevance(QUERY, EMBEDDINGS, 0), [])
+        self.assertEqual(maximal_marginal_relevance(QUERY, [], 5), [])
+
+    def test_zero_vectors(self):
+        self.assertEqual(
+            maximal_marginal_relevance(QUERY, [[0.0, 0.0], [1.0, 0.0]], 2, 1.0), [1, 0]
+        )
+
+    def test_rejects_lambda_out_of_range(self):
+        for lambda_mult in (-0.1, 1.5):
+            with self.subTest(lambda_mult=lambda_mult):
+                with self.assertRaises(ValueError):
+                    maximal_marginal_relevance(QUERY, EMBEDDINGS, 2, lambda_mult)
@@ -2,9 +2,13 @@ from django.urls import path
 from .views import (
     CollectionListCreateView,
     CollectionDetailView,
+    CollectionExportView,
+    CollectionImportView,
     DocumentListCreateView,
     DocumentDetailView,
+    DocumentBulkIngestView,
     ResetCollectionView,
+    VectorPoolStatsView,
 )
 
 urlpatterns = [
@@ -13,6 +17,12 @@ urlpatterns = [
         CollectionListCreateView.as_view(),
         name="collection-list-create",
     ),
+    # Before collection-detail, which would otherwise take "import" as a name.
+    path(
+        "collections/import/",
+        CollectionImportView.as_view(),
+        name="collection-import",
+    ),
     path(
         "collections/<str:collection_name>/",
         CollectionDetailView.as_view(),
@@ -23,14 +33,29 @@ urlpatterns = [
         ResetCollectionView.as_view(),
         name="collection-reset",
     ),
+    path(
+        "collections/<str:collection_name>/export/",
+        CollectionExportView.as_view(),
+        name="collection-export",
+    ),
     path(
         "documents/<str:collection_name>/",
         DocumentListCreateView.as_view(),
         name="document-list-create",
     ),
+    path(
+        "documents/<str:collection_name>/ingest/",
+        DocumentBulkIngestView.as_view(),
+        name="document-bulk-ingest",
+    ),
     path(
         "documents/<str:collection_name>/<uuid:document_id>/",
         DocumentDetailView.as_view(),
         name="document-detail",
     ),
+    path(
+        "knowledge-base/pool-stats/",
+        VectorPoolStatsView.as_view(),
+        name="knowledge-base-pool-stats",
+    ),
 ]
@@ -0,0 +1,158 @@
+from typing import Any, List, Literal, Optional
+from .conf import kb_setting
+
+DOCUMENT_TABLE = "knowledge_base_workspacecollectiondocument"
+CHUNK_TABLE = "knowledge_base_workspacecollectiondocumentchunk"
+
+# Fixed (not a setting): it is baked into the generated ``search_vector``
+# column and every full-text query has to use the same configuration.
+TEXT_SEARCH_CONFIG = "english"
+
+IndexMethod = Literal["hnsw", "ivfflat"]
+
+# "half" indexes and searches ``embeddings::halfvec(N)`` (pgvector >= 0.7.0):
+# half the index memory, and up to 4000 indexable dimensions instead of 2000.
+# "binary" uses ``binary_quantize(embeddings)::bit(N)`` with Hamming distance:
+# one bit per dimension, only useful as a first stage before an exact rerank.
+Precision = Literal["full", "half", "binary"]
+
+VECTOR_TYPES = {"full": "vector", "half": "halfvec", "binary": "bit"}
+
+OPERATOR_CLASSES = {
+    "full": "vector_l2_ops",
+    "half": "halfvec_l2_ops",
+    "binary": "bit_hamming_ops",
+}
+
+INDEX_NAMES = {
+    "hnsw": "idx_ws_coll_doc_embed_hnsw",
+    "ivfflat": "idx_ws_coll_doc_embed_ivfflat",
+}
+
+HALF_INDEX_NAMES = {
+    "hnsw": "idx_ws_coll_doc_embed_hnsw_half",
+    "ivfflat": "idx_ws_coll_doc_embed_ivfflat_half",
+}
+
+BINARY_INDEX_NAMES = {
+    "hnsw": "idx_ws_coll_doc_embed_hnsw_bit",
+    "ivfflat": "idx_ws_coll_doc_embed_ivfflat_bit",
+}
+
+# Chunk embeddings are indexed at full precision only.
+CHUNK_INDEX_NAMES = {
+    "hnsw": "idx_ws_coll_chunk_embed_hnsw",
+    "ivfflat": "idx_ws_coll_chunk_embed_ivfflat",
+}
+
+PRECISION_INDEX_NAMES = {
+    "full": INDEX_NAMES,
+    "half": HALF_INDEX_NAMES,
+    "binary": BINARY_INDEX_NAMES,
+}
+
+
+def index_name(method: IndexMethod, precision: Precision = "full") -> str:
+    return PRECISION_INDEX_NAMES[precision][method]
+
+
+class SqlParams:
+    """Collects query parameters and hands out placeholders in the style of
+    the driver: ``%s`` for psycopg (Django cursors), ``$n`` for asyncpg."""
+
+    def __init__(self, style: Literal["format", "numeric"]) -> None:
+        self.style = style
+        self.values: List[Any] = []
+
+    def add(self, value: Any) -> str:
+        self.values.append(value)
+        return "%s" if self.style == "format" else f"${len(self.values)}"
+
+
+def dimensions() -> int:
+    return int(kb_setting("VECTOR_DB_EMBEDDING_DIMENSIONS"))
+
+
+def vector_literal(vector: List[float]) -> str:
+    return "[" + ",".join(map(str, vector)) + "]"
+
+
+def embedding_expression(
+    column: str = "embeddings", precision: Precision = "full"
+) -> str:
+    """The indexed expression. ANN indexes need a fixed dimension, so the column
+    is cast to ``vector(N)`` (or ``halfvec(N)``) both in the index and in every
+    query using it."""
+    if precision == "binary":
+        return f"binary_quantize({column})::bit({dimensions()})"
+    return f"{column}::{VECTOR_TYPES[precision]}({dimensions()})"
+
+
+def distance_sql(
+    placeholder: str, column: str = "embeddings", precision: Precision = "full"
+) -> str:
+    if precision == "binary":
+        return (
+            f"{embedding_expression(column, precision)} <~> "
+            f"{embedding_expression(f'{placeholder}::vector({dimensions()})', precision)}"
+        )
+    return (
+        f"{embedding_expression(column, precision)} <-> "
+        f"{placeholder}::{VECTOR_TYPES[precision]}({dimensions()})"
+    )
+
+
+def create_index_sql(
+    method: IndexMethod,
+    name: Optional[str] = None,
+    m: int = 16,
+    ef_construction: int = 64,
+    lists: int = 100,
+    concurrently: bool = True,
+    precision: Precision = "full",
+    table: str = DOCUMENT_TABLE,
+) -> str:
+    if method == "hnsw":
+        options = f"m = {int(m)}, ef_construction = {int(ef_construction)}"
+    elif method == "ivfflat":
+        options = f"lists = {int(lists)}"
+    else:
+        raise ValueError(f"Unsupported index method: {method}")
+    return (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}"
+        f"IF NOT EXISTS {name or index_name(method, precision)} ON {table} "
+        f"USING {method} (({embedding_expression(precision=precision)}) "
+        f"{OPERATOR_CLASSES[precision]}) "
+        f"WITH ({options})"
+    )
+
+
+ITERATIVE_SCAN_MODES = ("off", "relaxed_order", "strict_order")
+# pgvector's bounds for the GUCs; SET fails outside them.
+HNSW_MAX_EF_SEARCH = 1000
+IVFFLAT_MAX_PROBES = 32768
+
+
+def tuning_statements(
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    iterative_scan: Optional[str] = None,
+) -> List[str]:
+    """``SET LOCAL`` statements for per-query ANN tuning. They only last until
+    the end of the surrounding transaction. Values beyond pgvector's bounds
+    are clamped; an iterative scan covers what a capped ef_search misses."""
+    statements = []
+    if ef_search:
+        ef_search = min(int(ef_search), HNSW_MAX_EF_SEARCH)
+        statements.append(f"SET LOCAL hnsw.ef_search = {ef_search}")
+    if probes:
+        probes = min(int(probes), IVFFLAT_MAX_PROBES)
+        statements.append(f"SET LOCAL ivfflat.probes = {probes}")
+    if iterative_scan:
+        # Requires pgvector >= 0.8.0.
+        if iterative_scan not in ITERATIVE_SCAN_MODES:
+            raise ValueError(f"Invalid iterative scan mode: {iterative_scan}")
+        statements.append(f"SET LOCAL hnsw.iterative_scan = {iterative_scan}")
+        if iterative_scan != "strict_order":
+            statements.append(f"SET LOCAL ivfflat.iterative_scan = {iterative_scan}")
+    return statements
@@ -6,14 +6,42 @@ from drf_yasg.utils import swagger_auto_schema
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.core.exceptions import ObjectDoesNotExist
-from django.http import JsonResponse, HttpResponseNotFound, HttpResponseBadRequest
+from django.http import (
+    JsonResponse,
+    HttpResponseNotFound,
+    HttpResponseBadRequest,
+    StreamingHttpResponse,
+)
+from asgiref.sync import async_to_sync
 from .services import CollectionService, DocumentService
+from .archive import ARCHIVE_COMPRESSION, ARCHIVE_CONTENT_TYPE
+from .ingest import wants_gzip
+from .pagination import reject_offset
+from .pool import check_database, pool_stats
+from .query_cache import query_embedding_cache
 from .serializers import (
     WorkspaceCollectionSerializer,
     WorkspaceCollectionDocumentSerializer,
 )
 
 
+def _request_body(request):
+    """The body of a streamed upload, or None if the request has none.
+
+    DRF's ``request.stream`` is None without a Content-Length, as with a
+    chunked upload. The WSGI server has then de-chunked the body into
+    ``wsgi.input``; an ASGI request reads its spooled body itself.
+    """
+    if request.stream is not None:
+        return request.stream
+    wsgi_input = request.META.get("wsgi.input")
+    if wsgi_input is None:
+        return request._request
+    if request.headers.get("Transfer-Encoding", "").lower() == "chunked":
+        return wsgi_input
+    return None
+
+
 @method_decorator(csrf_exempt, name="dispatch")
 class CollectionListCreateView(APIView):
     @swagger_auto_schema(
@@ -59,7 +87,8 @@ class CollectionListCreateView(APIView):
                     type=openapi.TYPE_OBJECT,
                     properties={
                         "count": openapi.Schema(type=openapi.TYPE_INTEGER),
-                        "data": openapi.Schema(
+                        "next_cursor": openapi.Schema(type=openapi.TYPE_STRING),
+                        "response": openapi.Schema(
                             type=openapi.TYPE_ARRAY,
                             items=openapi.Items(
                                 type=openapi.TYPE_OBJECT,
@@ -87,34 +116,38 @@ class CollectionListCreateView(APIView):
                 default=100,
             ),
             openapi.Parameter(
-                "offset",
+                "cursor",
                 openapi.IN_QUERY,
-                description="Number of collections to skip",
-                type=openapi.TYPE_INTEGER,
+                description="next_cursor of the previous page",
+                type=openapi.TYPE_STRING,
                 required=False,
-                default=0,
+            ),
+            openapi.Parameter(
+                "count",
+                openapi.IN_QUERY,
+                description="How to count the collections: exact, estimated or none",
+                type=openapi.TYPE_STRING,
+                enum=["exact", "estimated", "none"],
+                required=False,
+                default="exact",
             ),
         ],
     )
     def get(self, request):
         try:
+            reject_offset(request.GET)
             limit = int(request.GET.get("limit", 100))
-            offset = int(request.GET.get("offset", 0))
 
             collections_data = CollectionService.get_all_collections(
-                limit=limit, offset=offset
+                limit=limit,
+                cursor=request.GET.get("cursor"),
+                count=request.GET.get("count", "exact"),
             )
 
-            response_data = {
-                "count": collections_data["count"],
-                "response": WorkspaceCollectionSerializer(
-                    collections_data["response"], many=True
-                ).data,
-            }
-            return JsonResponse(response_data)
+            return JsonResponse(collections_data)
 
-        except ValueError:
-            return HttpResponseBadRequest("Invalid limit or offset value.")
+        except ValueError as e:
+            return HttpResponseBadRequest(f"Invalid pagination parameters: {e}")
         except Exception as e:
             return HttpResponseBadRequest(str(e))
 
@@ -141,8 +174,7 @@ class CollectionDetailView(APIView):
         try:
             collection_name = request.GET.get("collection_name")
             collection = CollectionService.get_collection_by_name(collection_name)
-            serializer = WorkspaceCollectionSerializer(collection)
-            return JsonResponse(serializer.data)
+            return JsonResponse(collection)
 
         except ObjectDoesNotExist:
             return HttpResponseNotFound("Collection not found")
@@ -280,6 +312,15 @@ class DocumentListCreateView(APIView):
             201: openapi.Response("Document created successfully"),
             400: "Bad request",
         },
+        manual_parameters=[
+            openapi.Parameter(
+                "defer_embedding",
+                openapi.IN_QUERY,
+                description="Store the document immediately and embed it in the background",
+                type=openapi.TYPE_BOOLEAN,
+                required=False,
+            ),
+        ],
     )
     def post(self, request, collection_name):
         try:
@@ -289,7 +330,13 @@ class DocumentListCreateView(APIView):
             metadata = data.get("metadata", {})
             user = request.user
 
-            document_service = DocumentService.from_default_settings(collection_name)
+            defer_embedding = request.GET.get("defer_embedding")
+            document_service = DocumentService.from_default_settings(
+                collection_name,
+                defer_embeddings=(
+                    defer_embedding.lower() == "true" if defer_embedding else None
+                ),
+            )
             document = document_service.create_document(title, content, metadata, user)
             serializer = WorkspaceCollectionDocumentSerializer(document)
             return JsonResponse(serializer.data, status=201)
@@ -308,9 +355,8 @@ class DocumentListCreateView(APIView):
                     type=openapi.TYPE_OBJECT,
                     properties={
                         "count": openapi.Schema(type=openapi.TYPE_INTEGER),
-                        "page": openapi.Schema(type=openapi.TYPE_INTEGER),
-                        "page_size": openapi.Schema(type=openapi.TYPE_INTEGER),
-                        "data": openapi.Schema(
+                        "next_cursor": openapi.Schema(type=openapi.TYPE_STRING),
+                        "response": openapi.Schema(
                             type=openapi.TYPE_ARRAY,
                             items=openapi.Items(
                                 type=openapi.TYPE_OBJECT,
@@ -358,33 +404,49 @@ class DocumentListCreateView(APIView):
                 default=100,
             ),
             openapi.Parameter(
-                "offset",
+                "cursor",
                 openapi.IN_QUERY,
-                description="Number of documents to skip",
-                type=openapi.TYPE_INTEGER,
+                description="next_cursor of the previous page",
+                type=openapi.TYPE_STRING,
+                required=False,
+            ),
+            openapi.Parameter(
+                "count",
+                openapi.IN_QUERY,
+                description=(
+                    "How to count the documents: exact or estimated (both read the "
+                    "collection's stats), or none"
+                ),
+                type=openapi.TYPE_STRING,
+                enum=["exact", "estimated", "none"],
+                required=False,
+                default="estimated",
+            ),
+            openapi.Parameter(
+                "full",
+                openapi.IN_QUERY,
+                description="Include embeddings and the full collection",
+                type=openapi.TYPE_BOOLEAN,
                 required=False,
-                default=0,
+                default=False,
             ),
         ],
     )
     def get(self, request, collection_name):
         try:
+            reject_offset(request.GET)
             limit = int(request.GET.get("limit", 100))
-            offset = int(request.GET.get("offset", 0))
+            full = request.GET.get("full", "false").lower() == "true"
 
             document_service = DocumentService.from_default_settings(collection_name)
             documents_data = document_service.get_all_documents(
-                limit=limit, offset=offset
+                limit=limit,
+                cursor=request.GET.get("cursor"),
+                full=full,
+                count=request.GET.get("count", "estimated"),
             )
 
-            response_data = {
-                "count": documents_data["count"],
-                "response": WorkspaceCollectionDocumentSerializer(
-                    documents_data["response"], many=True
-                ).data,
-            }
-
-            return JsonResponse(response_data)
+            return JsonResponse(documents_data)
 
         except Exception as e:
             return HttpResponseBadRequest(str(e))
@@ -398,14 +460,23 @@ class DocumentDetailView(APIView):
             200: openapi.Response("Document retrieved successfully"),
             404: "Document not found",
         },
-        manual_parameters=[],
+        manual_parameters=[
+            openapi.Parameter(
+                "full",
+                openapi.IN_QUERY,
+                description="Include embeddings and the full collection",
+                type=openapi.TYPE_BOOLEAN,
+                required=False,
+                default=True,
+            ),
+        ],
     )
     def get(self, request, collection_name, document_id):
         try:
+            full = request.GET.get("full", "true").lower() == "true"
             document_service = DocumentService.from_default_settings(collection_name)
-            document = document_service.get_document(uuid.UUID(document_id))
-            serializer = WorkspaceCollectionDocumentSerializer(document)
-            return JsonResponse(serializer.data)
+            document = document_service.get_document(uuid.UUID(document_id), full=full)
+            return JsonResponse(document)
 
         except ObjectDoesNotExist:
             return HttpResponseNotFound("Document not found")
@@ -476,3 +547,239 @@ class DocumentDetailView(APIView):
             return HttpResponseNotFound("Document not found")
         except Exception as e:
             return HttpResponseBadRequest(str(e))
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class DocumentBulkIngestView(APIView):
+    @swagger_auto_schema(
+        operation_description=(
+            "Stream documents into a collection as NDJSON (one "
+            '{"title", "content", "metadata", "uri"} object per line), '
+            "optionally gzipped (Content-Encoding: gzip)"
+        ),
+        request_body=openapi.Schema(type=openapi.TYPE_STRING, format="binary"),
+        responses={
+            200: openapi.Response(
+                "Ingest finished; per-line results",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "created": openapi.Schema(type=openapi.TYPE_INTEGER),
+                        "failed": openapi.Schema(type=openapi.TYPE_INTEGER),
+                        "batches": openapi.Schema(type=openapi.TYPE_INTEGER),
+                        "results": openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Items(type=openapi.TYPE_OBJECT),
+                        ),
+                    },
+                ),
+            ),
+            404: "Collection not found",
+            400: "Bad request",
+        },
+        manual_parameters=[
+            openapi.Parameter(
+                "defer_embedding",
+                openapi.IN_QUERY,
+                description="Store the documents immediately and embed them in the background",
+                type=openapi.TYPE_BOOLEAN,
+                required=False,
+            ),
+            openapi.Parameter(
+                "batch_size",
+                openapi.IN_QUERY,
+                description="Lines embedded and written per batch",
+                type=openapi.TYPE_INTEGER,
+                required=False,
+            ),
+            openapi.Parameter(
+                "errors_only",
+                openapi.IN_QUERY,
+                description="Only report lines that failed",
+                type=openapi.TYPE_BOOLEAN,
+                required=False,
+                default=False,
+            ),
+        ],
+    )
+    def post(self, request, collection_name):
+        try:
+            defer_embedding = request.GET.get("defer_embedding")
+            batch_size = request.GET.get("batch_size")
+            document_service = DocumentService.from_default_settings(
+                collection_name,
+                defer_embeddings=(
+                    defer_embedding.lower() == "true" if defer_embedding else None
+                ),
+            )
+            body = _request_body(request)
+            if body is None:
+                return HttpResponseBadRequest("Empty request body")
+            report = document_service.ingest_ndjson(
+                body,
+                request.user,
+                gzipped=wants_gzip(
+                    request.content_type, request.headers.get("Content-Encoding")
+                ),
+                batch_size=int(batch_size) if batch_size else None,
+                errors_only=request.GET.get("errors_only", "false").lower() == "true",
+            )
+            return JsonResponse(report)
+
+        except ObjectDoesNotExist:
+            return HttpResponseNotFound("Collection not found")
+        except Exception as e:
+            return HttpResponseBadRequest(str(e))
+
+
+class CollectionExportView(APIView):
+    @swagger_auto_schema(
+        operation_description=(
+            "Stream a collection, stored vectors included, as an Arrow IPC "
+            "archive that the import endpoint loads without re-embedding"
+        ),
+        responses={
+            200: openapi.Response(
+                "Archive stream",
+                schema=openapi.Schema(type=openapi.TYPE_STRING, format="binary"),
+            ),
+            404: "Collection not found",
+            400: "Bad request",
+        },
+        manual_parameters=[
+            openapi.Parameter(
+                "batch_size",
+                openapi.IN_QUERY,
+                description="Documents per archive batch",
+                type=openapi.TYPE_INTEGER,
+                required=False,
+            ),
+            openapi.Parameter(
+                "compression",
+                openapi.IN_QUERY,
+                description="Batch compression: zstd, lz4 or none",
+                type=openapi.TYPE_STRING,
+                enum=["zstd", "lz4", "none"],
+                required=False,
+                default=ARCHIVE_COMPRESSION,
+            ),
+        ],
+    )
+    def get(self, request, collection_name):
+        try:
+            batch_size = request.GET.get("batch_size")
+            compression = request.GET.get("compression", ARCHIVE_COMPRESSION)
+            archive = CollectionService.export_collection(
+                collection_name,
+                batch_size=int(batch_size) if batch_size else None,
+                compression=None if compression == "none" else compression,
+            )
+            response = StreamingHttpResponse(
+                archive, content_type=ARCHIVE_CONTENT_TYPE
+            )
+            response["Content-Disposition"] = (
+                f'attachment; filename="{collection_name}.arrows"'
+            )
+            return response
+
+        except ObjectDoesNotExist:
+            return HttpResponseNotFound("Collection not found")
+        except Exception as e:
+            return HttpResponseBadRequest(str(e))
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class CollectionImportView(APIView):
+    @swagger_auto_schema(
+        operation_description=(
+            "Load a collection archive from the export endpoint with COPY, "
+            "keeping its vectors; creates the collection if needed"
+        ),
+        request_body=openapi.Schema(type=openapi.TYPE_STRING, format="binary"),
+        responses={
+            200: openapi.Response(
+                "Import finished",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "collection": openapi.Schema(type=openapi.TYPE_STRING),
+                        "documents": openapi.Schema(type=openapi.TYPE_INTEGER),
+                        "embedded": openapi.Schema(type=openapi.TYPE_INTEGER),
+                        "pending": openapi.Schema(type=openapi.TYPE_INTEGER),
+                        "batches": openapi.Schema(type=openapi.TYPE_INTEGER),
+                    },
+                ),
+            ),
+            400: "Bad request",
+        },
+        manual_parameters=[
+            openapi.Parameter(
+                "collection_name",
+                openapi.IN_QUERY,
+                description="Target collection (default: the archived one's name)",
+                type=openapi.TYPE_STRING,
+                required=False,
+            ),
+            openapi.Parameter(
+                "preserve_ids",
+                openapi.IN_QUERY,
+                description="Keep the archived document ids",
+                type=openapi.TYPE_BOOLEAN,
+                required=False,
+                default=False,
+            ),
+        ],
+    )
+    def post(self, request):
+        try:
+            body = _request_body(request)
+            if body is None:
+                return HttpResponseBadRequest("Empty request body")
+            report = CollectionService.import_collection(
+                body,
+                request.user,
+                collection_name=request.GET.get("collection_name"),
+                preserve_ids=request.GET.get("preserve_ids", "false").lower() == "true",
+            )
+            return JsonResponse(report)
+
+        except Exception as e:
+            return HttpResponseBadRequest(str(e))
+
+
+class VectorPoolStatsView(APIView):
+    @swagger_auto_schema(
+        operation_description="Report asyncpg pool usage for the knowledge base",
+        responses={
+            200: openapi.Response(
+                "Pool statistics",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "healthy": openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                        "pools": openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Items(type=openapi.TYPE_OBJECT),
+                        ),
+                        "query_embedding_cache": openapi.Schema(
+                            type=openapi.TYPE_OBJECT
+                        ),
+                    },
+                ),
+            ),
+        },
+    )
+    def get(self, request):
+        # Existing pools are only reported: creating one here (on the loop
+        # async_to_sync makes under WSGI) would leak its connections.
+        try:
+            healthy = async_to_sync(check_database)()
+        except Exception:
+            healthy = False
+        return JsonResponse(
+            {
+                "healthy": healthy,
+                "pools": pool_stats(),
+                "query_embedding_cache": query_embedding_cache.stats(),
+            }
+        )